@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידת ביצועים של סריקת instaloader מול שרת מקומי שמחקה את אינסטגרם - בלי בקשות לאינסטגרם ובלי חשבונות
+מדווח פוסטים לשנייה, בקשות API לפוסט, בתים שהועברו, שיא זיכרון וזמן לכל שלב
+
+דוגמאות:
+    python3 scripts/instaloader-bench.py --profiles 4 --posts 120 --workers 2
+    python3 scripts/instaloader-bench.py --login --latency-ms 80 --rate-limit-ratio 0.05 --rate-limits real
+    python3 scripts/instaloader-bench.py --serve 8765      # רק השרת המדומה, לבדיקות ידניות
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+
+from instaloader_scan import ScanOptions
+from instaloader_scan.bench import RATE_LIMIT_MODES, run_benchmark
+from instaloader_scan.standin import StandinConfig, StandinServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="מדידת ביצועים של הסריקה מול אינסטגרם מדומה")
+    parser.add_argument("usernames", nargs="*", help="שמות הפרופילים הסינתטיים (ברירת מחדל: bench_creator_1..N)")
+    parser.add_argument("--profiles", type=int, default=2, help="מספר פרופילים כשלא ניתנו שמות")
+    parser.add_argument("--output", help="תיקיית הפלט (ברירת מחדל: תיקייה זמנית חדשה)")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="רק להפעיל את השרת המדומה על הפורט הזה")
+
+    standin = parser.add_argument_group("הפרופילים המדומים")
+    standin.add_argument("--posts", type=int, default=36, help="פוסטים לכל פרופיל")
+    standin.add_argument("--stories", type=int, default=3)
+    standin.add_argument("--highlights", type=int, default=2)
+    standin.add_argument("--highlight-items", type=int, default=4)
+    standin.add_argument("--preview-comments", type=int, default=3, help="תגובות בתצוגה המקדימה של כל פוסט")
+    standin.add_argument("--video-ratio", type=float, default=0.2)
+    standin.add_argument("--sidecar-ratio", type=float, default=0.2)
+    standin.add_argument("--image-kb", type=int, default=64)
+    standin.add_argument("--video-kb", type=int, default=512)
+    standin.add_argument("--latency-ms", type=float, default=0.0, help="השהיה לכל תשובת API")
+    standin.add_argument("--media-latency-ms", type=float, default=0.0, help="השהיה לכל קובץ מדיה")
+    standin.add_argument("--rate-limit-ratio", type=float, default=0.0, help="החלק מבקשות ה-API שייענו ב-429")
+    standin.add_argument("--seed", type=int, default=0)
+
+    scan = parser.add_argument_group("הסריקה")
+    scan.add_argument("--login", action="store_true", help="סריקה מחוברת (סטוריז, היילייטס, פיד האייפון)")
+    scan.add_argument("--workers", type=int, default=1)
+    scan.add_argument("--media-workers", type=int, default=4)
+    scan.add_argument("--max-posts", type=int, default=150)
+    scan.add_argument("--max-comments", type=int, default=3)
+    scan.add_argument("--comments", choices=["preview", "full"], default="preview")
+    scan.add_argument("--rate-limits", choices=RATE_LIMIT_MODES, default="off",
+                      help="real: עם תקציבי הבקשות וההאטות האמיתיים; off: בלי המתנות (ברירת מחדל)")
+    scan.add_argument("--sleep", action="store_true", help="עם ההמתנה האקראית של instaloader לפני כל בקשה")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = StandinConfig(
+        posts=args.posts, stories=args.stories, highlights=args.highlights, highlight_items=args.highlight_items,
+        preview_comments=args.preview_comments, video_ratio=args.video_ratio, sidecar_ratio=args.sidecar_ratio,
+        image_bytes=args.image_kb * 1024, video_bytes=args.video_kb * 1024, latency_ms=args.latency_ms,
+        media_latency_ms=args.media_latency_ms, rate_limit_ratio=args.rate_limit_ratio, seed=args.seed,
+    )
+
+    if args.serve is not None:
+        server = StandinServer(config, port=args.serve)
+        print(f"🧪 שרת מדומה פועל על {server.url} (Ctrl+C לעצירה)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+        return
+
+    usernames = args.usernames or [f"bench_creator_{index}" for index in range(1, args.profiles + 1)]
+    output = args.output or tempfile.mkdtemp(prefix="instaloader-bench-")
+    options = ScanOptions(max_posts=args.max_posts, max_comments_per_post=args.max_comments, incremental=False,
+                          comments_mode=args.comments)
+
+    print("="*60)
+    print(f"🧪 מודד סריקה של {len(usernames)} פרופילים מדומים ({'מחובר' if args.login else 'אנונימי'}) "
+          f"עם {args.workers} workers")
+    print(f"📁 תיקיית פלט: {output}")
+    print("="*60)
+
+    report = run_benchmark(usernames, output, config, options, logged_in=args.login, workers=args.workers,
+                           media_workers=args.media_workers, rate_limits=args.rate_limits, sleep=args.sleep)
+
+    print("\n" + "="*60)
+    print("📊 תוצאות:")
+    print("="*60)
+    print(f"✅ פרופילים: {report['succeeded']}/{report['profiles']} | 📸 פוסטים: {report['posts']}")
+    print(f"⚡ {report['posts_per_sec']} פוסטים לשנייה | ⏱️  {report['duration_sec']} שניות")
+    print(f"📡 בקשות API: {report['api_requests']} ({report['requests_per_post']} לפוסט) | "
+          f"🚦 429 שהוזרקו: {report['rate_limited']}")
+    print(f"🖼️  בקשות מדיה: {report['media_requests']} | 📦 בתים: {report['bytes']['total']:,} "
+          f"(API {report['bytes']['api']:,}, מדיה {report['bytes']['media']:,})")
+    print(f"🧠 שיא זיכרון: {report['peak_rss_mb']} MB")
+    print(f"⏱️  שלבים: {json.dumps(report['phase_seconds'], ensure_ascii=False)}")
+    print(f"🔎 לפי endpoint: {json.dumps(report['requests_by_endpoint'], ensure_ascii=False)}")
+    for entry in report["results"]:
+        if entry["status"] != "ok":
+            print(f"❌ @{entry['username']}: {entry['error']}")
+    print(f"📄 דוח: {report['report_file']}")
+    print("="*60)
+    sys.exit(0 if report["succeeded"] == report["profiles"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+coordinator לסריקה מבוזרת: מחלק את הפרופילים שבתור בין כמה nodes ב-consistent hashing
+כל node הוא instaloader-worker.py run --coordinator URL על מכונה אחרת, עם החשבונות וה-proxy שלו. node חסום או
+שאבד יוצא מהטבעת והפרופילים שלו עוברים ל-nodes אחרים; הרשומות של כל ה-nodes נכתבות לעץ פלט אחד.
+משימות נוספות כרגיל לקובץ התור (instaloader-worker.py enqueue / instaloader-schedule.py run על אותו --db).
+
+דוגמאות:
+    python3 scripts/instaloader-cluster.py serve --port 8700 --output instaloader_scans
+    python3 scripts/instaloader-worker.py enqueue influencers.txt
+    python3 scripts/instaloader-worker.py run --coordinator http://10.0.0.5:8700 --login scraper1   # על כל node
+    python3 scripts/instaloader-cluster.py status http://10.0.0.5:8700
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from datetime import datetime
+
+import requests
+
+from instaloader_scan.cluster import COORDINATOR_PORT, NODE_TIMEOUT, CoordinatorServer, MergedStore, ShardCoordinator
+from instaloader_scan.jobs import JOBS_DB, JobQueue
+from instaloader_scan.ragprep import RAG_BATCH, RAG_DB_FILE, RagPreprocessor
+from instaloader_scan.sink import BATCH_SIZE, combine_sinks, open_sink
+from instaloader_scan.tagindex import TAG_INDEX_FILE, TagIndex
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="coordinator לסריקה מבוזרת על כמה nodes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="הפעלת ה-coordinator")
+    serve.add_argument("--db", default=JOBS_DB, help="קובץ התור (SQLite)")
+    serve.add_argument("--output", default="instaloader_scans", help="עץ הפלט המאוחד של כל ה-nodes")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=COORDINATOR_PORT)
+    serve.add_argument("--node-timeout", type=float, default=NODE_TIMEOUT, help="שניות בלי heartbeat עד ש-node נחשב אבוד")
+    serve.add_argument("--sink", metavar="URL", help="כתיבת הרשומות המאוחדות גם ל-Postgres (postgresql://...)")
+    serve.add_argument("--sink-batch", type=int, default=BATCH_SIZE)
+    serve.add_argument("--tag-index", nargs="?", const="", metavar="PATH",
+                       help=f"עדכון אינדקס האשטאגים ואזכורים מהעץ המאוחד (ברירת מחדל: {{output}}/{TAG_INDEX_FILE})")
+    serve.add_argument("--rag", nargs="?", const="", metavar="PATH",
+                       help=f"הכנת chunks לחיפוש ול-embeddings מהעץ המאוחד (ברירת מחדל: {{output}}/{RAG_DB_FILE})")
+    serve.add_argument("--rag-batch", type=int, default=RAG_BATCH)
+
+    status = commands.add_parser("status", help="מצב ה-nodes והחלוקה")
+    status.add_argument("url", nargs="?", default=f"http://127.0.0.1:{COORDINATOR_PORT}")
+    status.add_argument("--json", action="store_true", help="פלט JSON")
+    return parser.parse_args()
+
+
+def _serve(args):
+    queue = JobQueue(args.db)
+    coordinator = ShardCoordinator(queue, args.node_timeout)
+    sink = combine_sinks(open_sink(args.sink, args.sink_batch) if args.sink else None,
+                         None if args.tag_index is None else TagIndex(
+                             args.tag_index or os.path.join(args.output, TAG_INDEX_FILE)),
+                         None if args.rag is None else RagPreprocessor(
+                             args.rag or os.path.join(args.output, RAG_DB_FILE), args.rag_batch))
+    server = CoordinatorServer(coordinator, MergedStore(args.output), sink, args.host, args.port).start()
+    print(f"🛰️  coordinator על {args.host}:{args.port} | תור: {args.db} | פלט מאוחד: {args.output}", flush=True)
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        while not stop_event.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        print("\n⚠️  ה-coordinator הופסק על ידי המשתמש")
+    finally:
+        server.stop()
+        coordinator.close()
+        queue.close()
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S") if timestamp else "-"
+
+
+def _status(args):
+    status = requests.get(args.url.rstrip("/") + "/status", timeout=30).json()
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+        return
+    print(f"📊 {status['counts']} | 🗂️  {status['store'].get('records', 0)} רשומות בעץ המאוחד")
+    for node in status["nodes"]:
+        state = "🐢 חסום" if node["alive"] and node["throttled"] else ("🟢" if node["alive"] else f"⚫ {node['status']}")
+        identity = node["identity"]
+        print(f"🛰️  {node['id']} {state} | חשבונות: {', '.join(identity.get('accounts') or []) or '-'} | "
+              f"proxy: {identity.get('proxy') or '-'} | נראה לאחרונה {_format_time(node['last_seen'])} | "
+              f"✅ {node['jobs_done']} ❌ {node['jobs_failed']} | ממתינות לו: {status['assignments'].get(node['id'], 0)} | "
+              f"כרגע: {', '.join(node['current_jobs']) or '-'}")
+
+
+def main():
+    args = parse_args()
+    {"serve": _serve, "status": _status}[args.command](args)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ייצוא עמודתי (Parquet / Arrow) של כל הפרופילים שנסרקו, וניתוח מעורבות על כולם יחד
+posts ו-profiles נכתבים לתיקייה אחת; --report מדפיס מעורבות, קצב פרסום, וידאו מול תמונה ו-lift של האשטאגים.
+
+דוגמאות:
+    python3 scripts/instaloader-export.py instaloader_scans
+    python3 scripts/instaloader-export.py instaloader_scans --format arrow --dest dashboards/data
+    python3 scripts/instaloader-export.py instaloader_scans --report --top 15
+"""
+
+import argparse
+import os
+import sys
+
+from instaloader_scan.columnar import EXPORT_FORMATS, export_columnar
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ייצוא עמודתי וניתוח מעורבות של כל הפרופילים")
+    parser.add_argument("output_root", help="תיקיית הפלט של הסריקות (תיקייה לכל פרופיל)")
+    parser.add_argument("--dest", help="תיקיית הייצוא (ברירת מחדל: {output_root}/columnar)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="parquet")
+    parser.add_argument("--report", action="store_true", help="ניתוח מעורבות על הקבצים שיוצאו (דורש pandas)")
+    parser.add_argument("--top", type=int, default=10, help="כמה שורות להציג בכל טבלה בדוח")
+    return parser.parse_args()
+
+
+def _report(dest, export_format, top):
+    from instaloader_scan.analytics import hashtag_lift, load_tables, profile_report, with_engagement
+
+    posts, profiles = load_tables(dest, export_format)
+    report = profile_report(posts, profiles)
+    report.to_csv(os.path.join(dest, "profile_report.csv"))
+    tags = hashtag_lift(with_engagement(posts, profiles))
+    tags.to_csv(os.path.join(dest, "hashtag_lift.csv"))
+
+    print("\n📈 מעורבות לפי פרופיל:")
+    for username, row in report.head(top).iterrows():
+        video = f"וידאו x{row['video_lift']:.2f}" if row["video_lift"] == row["video_lift"] else "וידאו -"
+        cadence = f"{row['posts_per_week']:.1f} בשבוע" if row["posts_per_week"] == row["posts_per_week"] else "-"
+        print(f"   @{username}: {row['engagement_rate'] * 100:.2f}% | {cadence} | {video} | {int(row['posts'])} פוסטים")
+    print("\n#️⃣  האשטאגים עם ה-lift הגבוה ביותר:")
+    for tag, row in tags.head(top).iterrows():
+        print(f"   #{tag}: x{row['lift']:.2f} | {int(row['posts'])} פוסטים אצל {int(row['profiles'])} פרופילים")
+    print(f"\n📄 {os.path.join(dest, 'profile_report.csv')} | {os.path.join(dest, 'hashtag_lift.csv')}")
+
+
+def main():
+    args = parse_args()
+    if not os.path.isdir(args.output_root):
+        print(f"❌ התיקייה {args.output_root} לא קיימת")
+        sys.exit(1)
+
+    written = export_columnar(args.output_root, args.dest, args.format)
+    for name, (path, rows) in written.items():
+        print(f"🧱 {name}: {rows:,} שורות -> {path}")
+    if args.report:
+        _report(os.path.dirname(written["posts"][0]), args.format, args.top)
+
+
+if __name__ == "__main__":
+    main()
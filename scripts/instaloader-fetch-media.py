@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+הורדת מדיה לפי דרישה לפרופיל שנסרק עם --metadata-only
+ההורדות כבר מתוכננות ברשומות; כתובות שפגו מתחדשות מאינסטגרם (פריטי סטורי והיילייט דורשים --login).
+
+דוגמאות:
+    python3 scripts/instaloader-fetch-media.py instaloader_scans/miranbuzaglo C1a2B3c4D5e C9z8Y7x6W5v
+    python3 scripts/instaloader-fetch-media.py instaloader_scans/miranbuzaglo --all --login MY_SCRAPER_ACCOUNT
+"""
+
+import argparse
+import sys
+
+from instaloader_scan.fetch import fetch_media
+from instaloader_scan.loader import SESSION_FILE, build_loader, load_session
+from instaloader_scan.media import MediaPipeline
+from instaloader_scan.postprocess import PostProcessor
+from instaloader_scan.store import MEDIA_STORE_DIR, MediaStore
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="הורדת מדיה לפי shortcode מתוך רשומות של סריקה")
+    parser.add_argument("profile_dir", help="תיקיית הפרופיל שנסרק (למשל instaloader_scans/USERNAME)")
+    parser.add_argument("shortcodes", nargs="*", help="shortcodes של פוסטים / פריטי סטורי להורדה")
+    parser.add_argument("--all", action="store_true", help="כל המדיה של הפרופיל שעוד לא ירדה")
+    parser.add_argument("--login", help="חשבון לחידוש כתובות שפגו")
+    parser.add_argument("--session-file", default=SESSION_FILE)
+    parser.add_argument("--no-refresh", action="store_true", help="בלי בקשות לאינסטגרם - רק כתובות שעוד בתוקף")
+    parser.add_argument("--media-workers", type=int, default=4)
+    parser.add_argument("--media-store", default=MEDIA_STORE_DIR, help="מאגר המדיה לפי תוכן (משותף עם הסריקות)")
+    parser.add_argument("--no-media-store", action="store_true")
+    parser.add_argument("--postprocess", action="store_true", help="תמונות ממוזערות, פס קול ו-keyframes לקבצים שירדו")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.shortcodes and not args.all:
+        print("❌ צריך לציין shortcodes או --all")
+        sys.exit(1)
+
+    L = None
+    if not args.no_refresh:
+        L = build_loader()
+        if args.login:
+            load_session(L, args.login, args.session_file)
+    media = MediaPipeline(workers=args.media_workers,
+                          store=None if args.no_media_store else MediaStore(args.media_store),
+                          postprocess=PostProcessor() if args.postprocess else None)
+    try:
+        stats = fetch_media(L, args.profile_dir, args.shortcodes or None, media=media)
+    finally:
+        media.close()
+        if L is not None:
+            L.close()
+
+    print(f"🖼️  {stats['found']}/{stats['requested']} פריטים נמצאו ברשומות | {stats['complete']} כבר הורדו | "
+          f"{stats['queued']} קבצים בתור")
+    print(f"🔄 כתובות שחודשו: {stats['refreshed']} | ⌛ פגו בלי חידוש: {stats['expired']} | ❌ נכשלו: {stats['failed']}")
+    print(f"📦 {stats['media'].get('files_downloaded', 0)} קבצים, {stats['media'].get('bytes_downloaded', 0):,} בתים")
+    for shortcode in stats["missing"]:
+        print(f"⚠️  {shortcode} לא נמצא ברשומות של {args.profile_dir}")
+    sys.exit(0 if stats["failed"] == 0 and not stats["missing"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ה-chunks שהסריקה מכינה ל-RAG: ייצוא ל-embeddings, אישור מה שכבר קיבל embedding וחיפוש טקסט מלא
+ה-chunks מתעדכנים בזמן instaloader-scan.py / instaloader-worker.py עם --rag; build מכין אותם מסריקות שכבר קיימות.
+export מוציא רק chunks שה-hash שלהם עוד לא סומן ב-ack, כך שפוסט שלא השתנה לא נשלח שוב ל-embedding.
+
+דוגמאות:
+    python3 scripts/instaloader-rag.py build
+    python3 scripts/instaloader-rag.py export --out pending_chunks.jsonl
+    python3 scripts/instaloader-rag.py ack pending_chunks.jsonl --model text-embedding-3-small
+    python3 scripts/instaloader-rag.py search 'בגדי ים' --user brand
+    python3 scripts/instaloader-rag.py stats
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from instaloader_scan.columnar import profile_dirs
+from instaloader_scan.ragprep import RAG_DB_FILE, RagPreprocessor, prepare_records
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="chunks מוכנים לחיפוש ול-embeddings מהפוסטים שנסרקו")
+    parser.add_argument("--output", default="instaloader_scans", help="תיקיית הפלט של הסריקות")
+    parser.add_argument("--db", help=f"קובץ ה-chunks (ברירת מחדל: {{output}}/{RAG_DB_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("build", help="הכנת ה-chunks מקבצי הרשומות של כל הפרופילים")
+    export = commands.add_parser("export", help="chunks שעוד לא קיבלו embedding, כ-JSONL")
+    export.add_argument("--out", help="קובץ הפלט (ברירת מחדל: stdout)")
+    export.add_argument("--limit", type=int)
+    export.add_argument("--user", dest="usernames", action="append", help="רק הפרופיל הזה (אפשר לחזור)")
+    ack = commands.add_parser("ack", help="סימון ה-chunks שבקובץ JSONL (מ-export) כאלה שקיבלו embedding")
+    ack.add_argument("file")
+    ack.add_argument("--model", help="מודל ה-embeddings")
+    search = commands.add_parser("search", help="חיפוש טקסט מלא ב-chunks")
+    search.add_argument("query")
+    search.add_argument("--user", dest="usernames", action="append", help="רק הפרופיל הזה (אפשר לחזור)")
+    search.add_argument("--limit", type=int, default=20)
+    commands.add_parser("stats", help="פוסטים, chunks, ממתינים ל-embedding ושפות")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rag = RagPreprocessor(args.db or os.path.join(args.output, RAG_DB_FILE))
+
+    if args.command == "build":
+        if not os.path.isdir(args.output):
+            print(f"❌ התיקייה {args.output} לא קיימת")
+            sys.exit(1)
+        records = prepare_records(rag, profile_dirs(args.output))
+        stats = rag.stats()
+        print(f"🧩 {records} רשומות נקראו | {stats.get('chunks', 0)} chunks חדשים, {stats.get('unchanged', 0)} ללא שינוי, "
+              f"{stats.get('near_duplicates', 0)} כיתובים כמעט כפולים -> {rag.path}")
+    elif args.command == "export":
+        chunks = rag.pending(args.limit, args.usernames)
+        f = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+        try:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        finally:
+            if args.out:
+                f.close()
+        if args.out:
+            print(f"📤 {len(chunks)} chunks ממתינים ל-embedding -> {args.out}")
+    elif args.command == "ack":
+        with open(args.file, encoding="utf-8") as f:
+            hashes = [json.loads(line)["chunk_hash"] for line in f if line.strip()]
+        print(f"✅ {rag.mark_embedded(hashes, args.model)} chunks סומנו כבעלי embedding")
+    elif args.command == "search":
+        rows = rag.search(args.query, limit=args.limit, usernames=args.usernames)
+        print(f"🔎 {len(rows)} תוצאות ל-{args.query}")
+        for row in rows:
+            print(f"   @{row['username']} https://www.instagram.com/p/{row['shortcode']}/ | {row['snippet']}")
+    elif args.command == "stats":
+        summary = rag.summary()
+        print(f"🧩 {summary['posts']} פוסטים ({summary['near_duplicates']} כמעט כפולים) | {summary['chunks']} chunks, "
+              f"{summary['distinct_hashes']} ייחודיים | ⏳ ממתינים ל-embedding: {summary['pending_embedding']}")
+        print(f"🌐 שפות: {', '.join(f'{language}: {count}' for language, count in summary['languages'].items()) or '-'}")
+    rag.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+סריקה מקבילית של רשימת פרופילי אינסטגרם עם instaloader
+שמות המשתמש נקראים מקובץ (שורה לכל פרופיל) או מ-stdin עם '-'
+
+דוגמאות:
+    python3 scripts/instaloader-scan.py influencers.txt --workers 4 --login MY_SCRAPER_ACCOUNT
+    python3 scripts/instaloader-scan.py influencers.txt --workers 8 --login scraper1 --login scraper2=sessions/scraper2
+    echo miranbuzaglo | python3 scripts/instaloader-scan.py -
+"""
+
+import argparse
+import os
+import sys
+
+from instaloader_scan import ScanOptions, read_usernames, run_batch
+from instaloader_scan.cache import CACHE_DIR, CACHE_MODES, ResponseCache
+from instaloader_scan.loader import SESSION_FILE
+from instaloader_scan.postprocess import PostProcessor
+from instaloader_scan.profilecache import PROFILE_CACHE_FILE, ProfileCache
+from instaloader_scan.ragprep import RAG_BATCH, RAG_DB_FILE, RagPreprocessor
+from instaloader_scan.ratecontrol import RATE_STATE_FILE
+from instaloader_scan.sessions import parse_account
+from instaloader_scan.sink import BATCH_SIZE, open_sink
+from instaloader_scan.store import MEDIA_STORE_DIR, MediaStore
+from instaloader_scan.tagindex import TAG_INDEX_FILE, TagIndex
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="סריקה מקבילית של פרופילי אינסטגרם")
+    parser.add_argument("source", help="קובץ עם שמות משתמש, או '-' לקריאה מ-stdin")
+    parser.add_argument("--workers", type=int, default=4, help="מספר סריקות במקביל (ברירת מחדל: 4)")
+    parser.add_argument("--output", default="instaloader_scans", help="תיקיית הפלט של הריצה")
+    parser.add_argument("--login", dest="logins", action="append", default=[], metavar="USER[=SESSION_FILE]",
+                        help="חשבון שה-session שלו נטען (לסטוריז והיילייטס); אפשר לחזור כמה פעמים למאגר חשבונות")
+    parser.add_argument("--session-file", default=SESSION_FILE,
+                        help="קובץ ה-session כשיש חשבון אחד; עם כמה חשבונות ברירת המחדל היא {session-file}-{user}")
+    parser.add_argument("--rate-state", default=RATE_STATE_FILE,
+                        help="קובץ תקציב הבקשות המשותף לכל התהליכים שסורקים עם אותו חשבון")
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off",
+                        help="מטמון תשובות (כבוי כברירת מחדל): cache (לפי TTL), record (הקלטת הסריקה), "
+                             "replay (רק מההקלטה, בלי רשת)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="תיקיית המטמון / ההקלטה")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="גודל מקסימלי למטמון במצב cache")
+    parser.add_argument("--media-workers", type=int, default=8, help="workers להורדת תמונות וסרטונים")
+    parser.add_argument("--media-queue", type=int, default=64, help="מקסימום הורדות שממתינות בתור")
+    parser.add_argument("--media-store", default=MEDIA_STORE_DIR,
+                        help="מאגר המדיה לפי תוכן: כל קובץ נשמר פעם אחת, והתיקיות של הפרופילים מקבלות links אליו")
+    parser.add_argument("--no-media-store", action="store_true", help="בלי מאגר - כל פרופיל מוריד ושומר לבד")
+    parser.add_argument("--postprocess", action="store_true",
+                        help="תמונות ממוזערות ב-WebP, פס קול ו-keyframes לכל קובץ שירד (Pillow / ffmpeg)")
+    parser.add_argument("--postprocess-workers", type=int, help="תהליכים לעיבוד (ברירת מחדל: מספר המעבדים)")
+    parser.add_argument("--max-posts", type=int, default=150)
+    parser.add_argument("--max-comments", type=int, default=3)
+    parser.add_argument("--comments", choices=["preview", "full"], default="preview",
+                        help="preview: תגובות מתוך נתוני הפוסט בלי בקשות נוספות (ברירת מחדל); full: תמיד get_comments()")
+    parser.add_argument("--full", action="store_true", help="סריקה מלאה עד max-posts, גם אחרי פוסטים שכבר נאספו")
+    parser.add_argument("--metadata-only", action="store_true",
+                        help="רק metadata ותיאור המדיה, בלי להוריד קבצים (אחר כך: instaloader-fetch-media.py)")
+    parser.add_argument("--refresh-engagement", type=int, default=0, metavar="N",
+                        help="בסריקה חוזרת: לעדכן את היסטוריית המעורבות של עוד N פוסטים מוכרים (רק שינויים נרשמים)")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS",
+                        help="סריקה מדורגת בתקציב זמן לפרופיל: פרופיל, 12 הפוסטים האחרונים, היילייטס ואז היסטוריה ומדיה")
+    parser.add_argument("--request-budget", type=int, metavar="N", help="תקציב בקשות ל-API לכל פרופיל (סריקה מדורגת)")
+    parser.add_argument("--sink", metavar="URL",
+                        help="כתיבת הרשומות ישירות ל-Postgres באצוות (postgresql://...), במקביל לקבצים")
+    parser.add_argument("--sink-batch", type=int, default=BATCH_SIZE, help="רשומות בכל אצווה של ה-sink")
+    parser.add_argument("--tag-index", nargs="?", const="", metavar="PATH",
+                        help=f"עדכון אינדקס האשטאגים ואזכורים בזמן הסריקה (ברירת מחדל: {{output}}/{TAG_INDEX_FILE})")
+    parser.add_argument("--profile-cache", help=f"מטמון הפרופילים (ברירת מחדל: {{output}}/{PROFILE_CACHE_FILE})")
+    parser.add_argument("--no-profile-cache", action="store_true")
+    parser.add_argument("--profile-max-age", type=float, default=0, metavar="HOURS",
+                        help="פרופיל שנטען בשעות האחרונות נלקח מהמטמון בלי בקשה (מונים וביו עד הגיל הזה)")
+    parser.add_argument("--rag", nargs="?", const="", metavar="PATH",
+                        help=f"הכנת chunks לחיפוש ול-embeddings בזמן הסריקה (ברירת מחדל: {{output}}/{RAG_DB_FILE})")
+    parser.add_argument("--rag-batch", type=int, default=RAG_BATCH, help="פוסטים בכל אצווה של הכנת ה-chunks")
+    parser.add_argument("--metrics", help="קובץ JSONL למדידות הריצה (ברירת מחדל: metrics_{זמן}.jsonl בתיקיית הפלט)")
+    parser.add_argument("--progress", action="store_true", help="שורת התקדמות חיה (פרופילים, פוסטים, בקשות)")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], help="דחיסת קובץ הרשומות (zstd דורש pip3 install zstandard)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    usernames = read_usernames(args.source)
+    if not usernames:
+        print("❌ לא התקבלו שמות משתמש לסריקה")
+        sys.exit(1)
+
+    print("="*60)
+    print(f"🚀 סורק {len(usernames)} פרופילים עם {args.workers} workers")
+    print(f"📁 תיקיית פלט: {args.output}")
+    print("="*60)
+
+    options = ScanOptions(max_posts=args.max_posts, max_comments_per_post=args.max_comments,
+                          incremental=not args.full, compression=args.compress, comments_mode=args.comments,
+                          metadata_only=args.metadata_only, refresh_engagement=args.refresh_engagement,
+                          deadline=args.deadline, request_budget=args.request_budget,
+                          profile_max_age=args.profile_max_age * 3600)
+    accounts = []
+    for spec in args.logins:
+        username, session_file = parse_account(spec, args.session_file)
+        if len(args.logins) > 1 and "=" not in spec:
+            session_file = f"{args.session_file}-{username}"
+        accounts.append((username, session_file))
+
+    cache = None
+    if args.cache != "off":
+        cache = ResponseCache(args.cache_dir, args.cache, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    media_store = None if args.no_media_store else MediaStore(args.media_store)
+    postprocess = PostProcessor(workers=args.postprocess_workers) if args.postprocess else None
+    sink = open_sink(args.sink, args.sink_batch) if args.sink else None
+    tag_index = None if args.tag_index is None else TagIndex(
+        args.tag_index or os.path.join(args.output, TAG_INDEX_FILE))
+    profile_cache = None if args.no_profile_cache else ProfileCache(
+        args.profile_cache or os.path.join(args.output, PROFILE_CACHE_FILE))
+    rag = None if args.rag is None else RagPreprocessor(args.rag or os.path.join(args.output, RAG_DB_FILE),
+                                                        args.rag_batch)
+
+    report = run_batch(usernames, args.output, workers=args.workers, accounts=accounts, options=options, cache=cache,
+                       media_workers=args.media_workers, media_queue=args.media_queue,
+                       rate_state_file=args.rate_state, metrics_file=args.metrics, progress=args.progress,
+                       media_store=media_store, postprocess=postprocess, sink=sink, tag_index=tag_index,
+                       profile_cache=profile_cache, rag=rag)
+    if report["interrupted"]:
+        print("\n\n⚠️  הסריקה הופסקה על ידי המשתמש")
+        print("💡 הרצה חוזרת של אותה פקודה תמשיך מה-checkpoint של כל פרופיל")
+        sys.exit(0)
+
+    print("\n" + "="*60)
+    print("📊 סיכום הריצה:")
+    print("="*60)
+    print(f"✅ הצליחו: {report['succeeded']}/{report['total_profiles']}")
+    for entry in report["profiles"]:
+        if entry["status"] != "ok":
+            print(f"❌ @{entry['username']}: {entry['status']} - {entry.get('error', '')}")
+    for account in report["sessions"]:
+        state = f"🚫 {account['disabled_reason']}" if account["disabled_reason"] else "✅"
+        print(f"🔑 {account['username']}: {state} | ציון {account['score']} | {account['scans']} סריקות | "
+              f"{account['recent_throttles']} חסימות אחרונות")
+    print(f"🖼️  קבצי מדיה: {report['media'].get('files_downloaded', 0)} הורדו, "
+          f"{report['media'].get('failed', 0)} נכשלו")
+    if report["media_store"]:
+        print(f"♻️  {report['media'].get('deduplicated', 0)} קבצים כבר היו במאגר "
+              f"({report['media'].get('bytes_saved', 0):,} בתים נחסכו) | "
+              f"במאגר: {report['media_store']['blobs']} קבצים, {report['media_store']['bytes']:,} בתים")
+    if report["postprocess"]:
+        processed = report["postprocess"]
+        print(f"🎞️  עיבוד מדיה: {processed.get('thumbnails', 0)} תמונות ממוזערות, "
+              f"{processed.get('audio_tracks', 0)} פסי קול, {processed.get('keyframes', 0)} keyframes, "
+              f"{processed.get('failed', 0)} נכשלו")
+    if report["sink"]:
+        print(f"🗃️  sink: {report['sink'].get('rows', 0)} שורות ב-{report['sink'].get('batches', 0)} אצוות | "
+              f"❌ אצוות שנכשלו: {report['sink'].get('failed_batches', 0)}")
+    if report["tag_index"]:
+        print(f"🏷️  אינדקס תגים: {report['tag_index'].get('posts', 0)} פוסטים עודכנו, "
+              f"{report['tag_index'].get('tags', 0)} תגים")
+    if report["profile_cache"]:
+        cached = report["profile_cache"]
+        print(f"🪪 מטמון פרופילים: {cached.get('hits', 0)} מהמטמון, {cached.get('fetches', 0)} נטענו, "
+              f"{cached.get('renames', 0)} שינויי שם")
+    if report["rag"]:
+        prepared = report["rag"]
+        print(f"🧩 RAG: {prepared.get('posts', 0)} פוסטים, {prepared.get('chunks', 0)} chunks חדשים, "
+              f"{prepared.get('unchanged', 0)} ללא שינוי, {prepared.get('near_duplicates', 0)} כיתובים כמעט כפולים")
+    rate = report["rate"]
+    print(f"📡 בקשות לאינסטגרם: {rate.get('requests', 0)} | ⏳ המתנה: {rate.get('wait_seconds', 0)} שניות | "
+          f"🚦 חסימות: {rate.get('throttle_events', 0)}")
+    if report["cache"]:
+        print(f"🗄️  מטמון ({report['cache']['mode']}): {report['cache']['hits']} תשובות מהדיסק, "
+              f"{report['cache']['misses']} מהרשת")
+    print(f"💬 בקשות תגובות שנחסכו: {report['comment_requests_saved']}")
+    counters = report["metrics"]["counters"]
+    print(f"🔁 ניסיונות חוזרים: {counters.get('retries', 0)} | ⚠️  שגיאות: {counters.get('errors', 0)} | "
+          f"📦 {counters.get('bytes', 0):,} בתים מה-API")
+    for entry in report["metrics"]["slowest_profiles"][:3]:
+        print(f"🐢 @{entry['username']}: {entry['duration_sec']} שניות (בעיקר {entry['heaviest_phase']}), "
+              f"{entry['requests']} בקשות")
+    print(f"⏱️  משך: {report['duration_sec']} שניות")
+    print(f"📄 דוח ריצה: {report['report_file']}")
+    print(f"📈 מדידות: {report['metrics_file']}")
+    print("="*60)
+    sys.exit(0 if report["failed"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מתזמן רענון אדפטיבי: כל פרופיל נבדק לפי קצב הפרסום שלו, בתוך תקציב בקשות לשעה
+run שולח לתור של instaloader-worker.py סריקות אינקרמנטליות לפרופילים שהגיע זמנם, עם max_posts לפי מה שצפוי
+להתפרסם מאז הבדיקה הקודמת. סטוריז מתוזמנים באותו לוח ובאותו תקציב: instaloader-stories.py --adaptive.
+
+דוגמאות:
+    python3 scripts/instaloader-schedule.py plan influencers.txt
+    python3 scripts/instaloader-schedule.py run influencers.txt --budget 300
+    python3 scripts/instaloader-schedule.py run influencers.txt --once   # למשל מ-cron
+"""
+
+import argparse
+import sys
+import threading
+from datetime import datetime
+
+from instaloader_scan import read_usernames
+from instaloader_scan.jobs import JOBS_DB, JobQueue
+from instaloader_scan.schedule import HOURLY_BUDGET, RefreshScheduler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="רענון אדפטיבי של פרופילים לפי קצב הפרסום")
+    parser.add_argument("--output", default="instaloader_scans", help="תיקיית הפלט של הסריקות")
+    parser.add_argument("--budget", type=float, default=HOURLY_BUDGET, help="בקשות לשעה לכל הצי (פוסטים + סטוריז)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="הקצב שנלמד, המרווח ומועד הבדיקה הבא לכל פרופיל")
+    plan.add_argument("source", help="קובץ עם שמות משתמש, או '-' לקריאה מ-stdin")
+
+    run = commands.add_parser("run", help="שליחת הסריקות שהגיע זמנן לתור המשימות")
+    run.add_argument("source", help="קובץ עם שמות משתמש, או '-' לקריאה מ-stdin")
+    run.add_argument("--db", default=JOBS_DB, help="קובץ התור של instaloader-worker.py")
+    run.add_argument("--tick", type=float, default=5, help="דקות בין סבבים")
+    run.add_argument("--once", action="store_true", help="סבב אחד ויציאה")
+    return parser.parse_args()
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp else "-"
+
+
+def _plan(scheduler, usernames):
+    entries, stretch, demand = scheduler.plan(usernames)
+    print(f"📅 {len(usernames)} פרופילים | ~{demand:g} בקשות לשעה מתוך {scheduler.hourly_budget:g}"
+          + (f" | המרווחים נמתחו פי {stretch:g}" if stretch > 1 else ""))
+    for entry in sorted(entries, key=lambda entry: (entry["content_type"], entry["next_check"])):
+        print(f"   @{entry['username']} [{entry['content_type']}]: {entry['rate_per_hour'] * 24:.2f} ביום | "
+              f"כל {entry['interval_hours']:.1f} שעות | בדיקה הבאה: {_format_time(entry['next_check'])}")
+
+
+def _tick(scheduler, queue, usernames):
+    due = scheduler.due(usernames, "posts")
+    dispatched = []
+    for entry in due:
+        options = {"max_posts": entry["max_posts"]} if entry["max_posts"] else None
+        # יוצרים פעילים קודמים בתור
+        priority = min(9, int(entry["rate_per_hour"] * 24))
+        if queue.enqueue([entry["username"]], priority=priority, options=options):
+            dispatched.append(entry)
+    scheduler.mark_checked(dispatched)
+    spent = scheduler.spent()
+    print(f"⏰ {datetime.now():%H:%M} | {len(dispatched)} סריקות נשלחו לתור | "
+          f"📡 {spent:.1f}/{scheduler.hourly_budget:g} בקשות בשעה האחרונה", flush=True)
+
+
+def main():
+    args = parse_args()
+    usernames = read_usernames(args.source)
+    if not usernames:
+        print("❌ לא התקבלו שמות משתמש")
+        sys.exit(1)
+    scheduler = RefreshScheduler(args.output, args.budget)
+
+    if args.command == "plan":
+        _plan(scheduler, usernames)
+        return
+
+    queue = JobQueue(args.db)
+    stop_event = threading.Event()
+    try:
+        while True:
+            _tick(scheduler, queue, usernames)
+            if args.once or stop_event.wait(args.tick * 60):
+                break
+    except KeyboardInterrupt:
+        print("\n⚠️  המתזמן הופסק על ידי המשתמש")
+    finally:
+        queue.close()
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+טעינת רשומות של סריקות קיימות ל-Postgres (backfill), או השלמה של מה שלא נכתב בזמן הסריקה
+כל קובץ רשומות ממשיך מה-checkpoint שלו במסד, כך שהרצה חוזרת שולחת רק רשומות חדשות.
+
+דוגמאות:
+    python3 scripts/instaloader-sink.py instaloader_scans --db-url postgresql://localhost/influencers
+    DATABASE_URL=postgresql://localhost/influencers python3 scripts/instaloader-sink.py instaloader_scans/miranbuzaglo
+"""
+
+import argparse
+import os
+import sys
+
+from instaloader_scan.sink import BATCH_SIZE, DB_URL_ENV, load_records, open_sink
+from instaloader_scan.stream import RECORDS_DIR
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="טעינת רשומות סריקה ל-Postgres")
+    parser.add_argument("paths", nargs="+", help="תיקיית פרופיל, או תיקיית פלט שלמה (כל הפרופילים שבה)")
+    parser.add_argument("--db-url", default=os.environ.get(DB_URL_ENV), help=f"ברירת מחדל: משתנה הסביבה {DB_URL_ENV}")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    return parser.parse_args()
+
+
+def _profile_dirs(path):
+    if os.path.isdir(os.path.join(path, RECORDS_DIR)):
+        return [path]
+    return sorted(os.path.join(path, name) for name in os.listdir(path)
+                  if os.path.isdir(os.path.join(path, name, RECORDS_DIR)))
+
+
+def main():
+    args = parse_args()
+    if not args.db_url:
+        print(f"❌ צריך --db-url או משתנה סביבה {DB_URL_ENV}")
+        sys.exit(1)
+
+    output_dirs = [output_dir for path in args.paths for output_dir in _profile_dirs(path)]
+    sink = open_sink(args.db_url, args.batch_size)
+    try:
+        sent = load_records(sink, output_dirs)
+    finally:
+        sink.close()
+    stats = sink.stats()
+    print(f"🗃️  {len(output_dirs)} פרופילים | {sent} רשומות נשלחו | {stats.get('rows', 0)} שורות ב-"
+          f"{stats.get('batches', 0)} אצוות | ❌ אצוות שנכשלו: {stats.get('failed_batches', 0)}")
+    sys.exit(0 if not stats.get("failed_batches") else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+איסוף סטוריז של כל הפרופילים שבמעקב במחזורים קבועים - כמה בקשות לכל מחזור במקום סריקה מלאה לכל פרופיל
+שמות המשתמש נקראים מקובץ (שורה לכל פרופיל) או מ-stdin עם '-'; סטוריז דורשים חשבון מחובר.
+
+דוגמאות:
+    python3 scripts/instaloader-stories.py influencers.txt --login MY_SCRAPER_ACCOUNT
+    python3 scripts/instaloader-stories.py influencers.txt --login scraper1 --interval 30 --output instaloader_scans
+    python3 scripts/instaloader-stories.py influencers.txt --login scraper1 --once
+"""
+
+import argparse
+import os
+import sys
+import threading
+
+from instaloader_scan import read_usernames
+from instaloader_scan.cache import CACHE_DIR, CACHE_MODES, ResponseCache
+from instaloader_scan.loader import SESSION_FILE
+from instaloader_scan.media import MediaPipeline
+from instaloader_scan.profilecache import PROFILE_CACHE_FILE, ProfileCache
+from instaloader_scan.ratecontrol import RATE_STATE_FILE
+from instaloader_scan.sessions import SessionPool, parse_account
+from instaloader_scan.schedule import HOURLY_BUDGET, RefreshScheduler
+from instaloader_scan.sink import BATCH_SIZE, open_sink
+from instaloader_scan.store import MEDIA_STORE_DIR, MediaStore
+from instaloader_scan.stories import USERIDS_PER_QUERY, StoriesPoller
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="איסוף סטוריז מרוכז לכל הפרופילים שבמעקב")
+    parser.add_argument("source", help="קובץ עם שמות משתמש, או '-' לקריאה מ-stdin")
+    parser.add_argument("--output", default="instaloader_scans", help="תיקיית הפלט (אותה תיקייה של instaloader-scan.py)")
+    parser.add_argument("--login", dest="logins", action="append", default=[], metavar="USER[=SESSION_FILE]",
+                        help="חשבון מחובר; אפשר לחזור כמה פעמים - כל מחזור רץ על החשבון הבריא ביותר")
+    parser.add_argument("--session-file", default=SESSION_FILE)
+    parser.add_argument("--rate-state", default=RATE_STATE_FILE)
+    parser.add_argument("--cache", choices=CACHE_MODES, default="off",
+                        help="מטמון תשובות (כבוי כברירת מחדל - כל מחזור צריך תשובה טרייה)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--interval", type=float, default=15, help="דקות בין תחילת מחזור לתחילת המחזור הבא")
+    parser.add_argument("--batch-size", type=int, default=USERIDS_PER_QUERY, help="משתמשים בכל בקשת סטוריז")
+    parser.add_argument("--media-workers", type=int, default=4)
+    parser.add_argument("--media-store", default=MEDIA_STORE_DIR, help="מאגר המדיה לפי תוכן (משותף עם הסריקות)")
+    parser.add_argument("--no-media-store", action="store_true")
+    parser.add_argument("--sink", metavar="URL", help="כתיבת רשומות הסטוריז גם ל-Postgres (postgresql://...)")
+    parser.add_argument("--sink-batch", type=int, default=BATCH_SIZE)
+    parser.add_argument("--profile-cache", help=f"מטמון הפרופילים (ברירת מחדל: {{output}}/{PROFILE_CACHE_FILE})")
+    parser.add_argument("--no-profile-cache", action="store_true")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="כל מחזור בודק רק פרופילים שהגיע זמנם לפי קצב הסטוריז שלהם (instaloader-schedule.py)")
+    parser.add_argument("--budget", type=float, default=HOURLY_BUDGET, help="בקשות לשעה לכל הצי במצב --adaptive")
+    parser.add_argument("--once", action="store_true", help="מחזור אחד ויציאה (למשל מ-cron)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    usernames = read_usernames(args.source)
+    if not usernames or not args.logins:
+        print("❌ נדרשים שמות משתמש וחשבון מחובר אחד לפחות (--login)")
+        sys.exit(1)
+
+    accounts = []
+    for spec in args.logins:
+        username, session_file = parse_account(spec, args.session_file)
+        if len(args.logins) > 1 and "=" not in spec:
+            session_file = f"{args.session_file}-{username}"
+        accounts.append((username, session_file))
+    cache = ResponseCache(args.cache_dir, args.cache) if args.cache != "off" else None
+    sessions = SessionPool(accounts, args.rate_state, cache)
+    if not sessions.available():
+        print("❌ אף session לא נטען - סטוריז זמינים רק עם התחברות")
+        sys.exit(1)
+
+    media = MediaPipeline(workers=args.media_workers,
+                          store=None if args.no_media_store else MediaStore(args.media_store))
+    sink = open_sink(args.sink, args.sink_batch) if args.sink else None
+    schedule = RefreshScheduler(args.output, args.budget) if args.adaptive else None
+    profile_cache = None if args.no_profile_cache else ProfileCache(
+        args.profile_cache or os.path.join(args.output, PROFILE_CACHE_FILE))
+    poller = StoriesPoller(sessions, args.output, media=media, batch_size=args.batch_size, sink=sink,
+                           schedule=schedule, profile_cache=profile_cache)
+    stop_event = threading.Event()
+    try:
+        added = poller.track(usernames)
+        print(f"👀 {len(poller.state['users'])} פרופילים במעקב ({added} חדשים) | מחזור כל {args.interval:g} דקות")
+        poller.run(args.interval * 60, cycles=1 if args.once else None, stop_event=stop_event)
+    except KeyboardInterrupt:
+        print("\n⚠️  האיסוף הופסק על ידי המשתמש")
+        stop_event.set()
+    finally:
+        media.close()
+        sessions.close()
+        if sink is not None:
+            sink.close()
+        stats = media.stats()
+        print(f"🖼️  קבצי מדיה: {stats.get('files_downloaded', 0)} הורדו, {stats.get('failed', 0)} נכשלו")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שאילתות על אינדקס האשטאגים ואזכורים של כל הפרופילים שנסרקו
+האינדקס מתעדכן בזמן instaloader-scan.py / instaloader-worker.py עם --tag-index; build בונה אותו מסריקות שכבר קיימות.
+
+דוגמאות:
+    python3 scripts/instaloader-tags.py build instaloader_scans
+    python3 scripts/instaloader-tags.py profiles @brand --days 90
+    python3 scripts/instaloader-tags.py posts '#summer' @brand --since 2024-06-01 --until 2024-09-01
+    python3 scripts/instaloader-tags.py related '#skincare' --days 30
+    python3 scripts/instaloader-tags.py top --mentions --days 7
+"""
+
+import argparse
+import os
+import sys
+
+from instaloader_scan.columnar import profile_dirs
+from instaloader_scan.tagindex import TAG_INDEX_FILE, TagIndex, days_ago, index_records
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="שאילתות על אינדקס האשטאגים ואזכורים")
+    parser.add_argument("--output", default="instaloader_scans", help="תיקיית הפלט של הסריקות")
+    parser.add_argument("--index", help=f"קובץ האינדקס (ברירת מחדל: {{output}}/{TAG_INDEX_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("build", help="בניית האינדקס מקבצי הרשומות של כל הפרופילים")
+
+    def _query(name, help_text):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--days", type=int, help="רק N הימים האחרונים")
+        command.add_argument("--since", help="מתאריך (YYYY-MM-DD)")
+        command.add_argument("--until", help="עד תאריך, לא כולל (YYYY-MM-DD)")
+        command.add_argument("--limit", type=int, default=20)
+        return command
+
+    posts = _query("posts", "פוסטים שיש בהם את כל התגים")
+    posts.add_argument("tags", nargs="+", metavar="TAG", help="'#hashtag' או '@mention'")
+    posts.add_argument("--user", dest="usernames", action="append", help="רק הפרופיל הזה (אפשר לחזור)")
+    profiles = _query("profiles", "אילו פרופילים השתמשו בתג")
+    profiles.add_argument("tag", metavar="TAG")
+    related = _query("related", "התגים שמופיעים יחד עם תג")
+    related.add_argument("tag", metavar="TAG")
+    top = _query("top", "התגים הנפוצים ביותר")
+    top.add_argument("--mentions", action="store_true", help="אזכורים במקום האשטאגים")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    index = TagIndex(args.index or os.path.join(args.output, TAG_INDEX_FILE))
+
+    if args.command == "build":
+        if not os.path.isdir(args.output):
+            print(f"❌ התיקייה {args.output} לא קיימת")
+            sys.exit(1)
+        records = index_records(index, profile_dirs(args.output))
+        stats = index.stats()
+        print(f"🏷️  {records} רשומות נקראו | {stats.get('posts', 0)} פוסטים, {stats.get('profiles', 0)} פרופילים, "
+              f"{stats.get('tags', 0)} תגים -> {index.path}")
+        return
+
+    since = days_ago(args.days) if args.days else args.since
+    if args.command == "posts":
+        rows = index.posts(*args.tags, since=since, until=args.until, usernames=args.usernames)
+        print(f"📸 {len(rows)} פוסטים עם {' + '.join(args.tags)}")
+        for row in rows[:args.limit]:
+            print(f"   {row['date']} @{row['username']} https://www.instagram.com/p/{row['shortcode']}/")
+    elif args.command == "profiles":
+        rows = index.profiles(args.tag, since=since, until=args.until)
+        print(f"👥 {len(rows)} פרופילים השתמשו ב-{args.tag}")
+        for username, row in list(rows.items())[:args.limit]:
+            bio = " | 📝 בביו" if row["in_bio"] else ""
+            print(f"   @{username}: {row['posts']} פוסטים | אחרון: {row['last_date']}{bio}")
+    elif args.command == "related":
+        for tag, count in index.related(args.tag, since=since, until=args.until, limit=args.limit):
+            print(f"   {tag}: {count} פוסטים משותפים")
+    elif args.command == "top":
+        kind = "mention" if args.mentions else "hashtag"
+        for tag, posts, profiles in index.top(kind, since=since, until=args.until, limit=args.limit):
+            print(f"   {tag}: {posts} פוסטים אצל {profiles} פרופילים")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+מנוע סריקת פרופילי אינסטגרם מבוסס instaloader
+מריץ סריקות של כמה פרופילים במקביל, כל worker עם context ו-session משלו.
+נקודת הכניסה משורת הפקודה: scripts/instaloader-scan.py
+"""
+
+from .engine import read_usernames, run_batch
+from .loader import build_loader, load_session
+from .scan import ScanOptions, scan_profile
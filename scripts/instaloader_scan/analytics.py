@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+ניתוח מעורבות וקטורי על הטבלאות העמודתיות (columnar.py) של כל הפרופילים
+כל החישובים הם פעולות על עמודות שלמות (groupby / explode / merge) ולא לולאה על פוסטים:
+- שיעור מעורבות (likes + comments) ביחס ל-followers של הפרופיל
+- קצב פרסום: פוסטים בשבוע והפער החציוני בין פוסטים
+- וידאו מול תמונה: מעורבות ממוצעת לכל סוג והיחס ביניהם
+- lift של האשטאג: המעורבות של פוסטים עם ההאשטאג ביחס לממוצע של אותו פרופיל
+דורש pandas (ו-pyarrow לקריאת הקבצים): pip3 install pandas pyarrow
+"""
+
+import os
+
+from .columnar import EXPORT_FORMATS
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    pd = None
+
+# כמה פוסטים לפחות צריך האשטאג כדי שה-lift שלו ייחשב
+MIN_TAG_POSTS = 3
+
+
+def _require_pandas():
+    if pd is None:
+        raise RuntimeError("הניתוח דורש את החבילות pandas ו-pyarrow: pip3 install pandas pyarrow")
+
+
+def load_tables(columnar_dir, export_format="parquet"):
+    """(posts, profiles) כ-DataFrames מתוך קבצי הייצוא"""
+    _require_pandas()
+    read = pd.read_parquet if export_format == "parquet" else pd.read_feather
+    suffix = EXPORT_FORMATS[export_format]
+    return (read(os.path.join(columnar_dir, "posts" + suffix)),
+            read(os.path.join(columnar_dir, "profiles" + suffix)))
+
+
+def with_engagement(posts, profiles):
+    """
+    מוסיף לכל פוסט engagement (likes + comments), followers ו-engagement_rate,
+    ו-relative_engagement - המעורבות ביחס לממוצע של אותו פרופיל (1.0 = פוסט ממוצע)
+    """
+    _require_pandas()
+    posts = posts.merge(profiles[["username", "followers"]], on="username", how="left")
+    posts["engagement"] = posts["likes"].fillna(0) + posts["comments"].fillna(0)
+    followers = posts["followers"].where(posts["followers"] > 0)
+    posts["engagement_rate"] = posts["engagement"] / followers
+    profile_mean = posts.groupby("username")["engagement"].transform("mean")
+    posts["relative_engagement"] = posts["engagement"] / profile_mean.where(profile_mean > 0)
+    return posts
+
+
+def engagement_by_profile(posts):
+    """שיעור מעורבות ממוצע וחציוני, likes ו-comments ממוצעים לכל פרופיל (posts אחרי with_engagement)"""
+    return posts.groupby("username").agg(
+        posts=("shortcode", "size"),
+        followers=("followers", "first"),
+        avg_likes=("likes", "mean"),
+        avg_comments=("comments", "mean"),
+        engagement_rate=("engagement_rate", "mean"),
+        median_engagement_rate=("engagement_rate", "median"),
+    )
+
+
+def posting_cadence(posts):
+    """פוסטים בשבוע (לאורך טווח התאריכים שנסרק) והפער החציוני בשעות בין פוסטים עוקבים"""
+    _require_pandas()
+    ordered = posts.dropna(subset=["date"]).sort_values(["username", "date"])
+    gaps = ordered.groupby("username")["date"].diff().dt.total_seconds() / 3600
+    cadence = ordered.assign(gap_hours=gaps).groupby("username").agg(
+        first_post=("date", "min"), last_post=("date", "max"), posts=("date", "size"),
+        median_gap_hours=("gap_hours", "median"))
+    weeks = (cadence["last_post"] - cadence["first_post"]).dt.total_seconds() / (7 * 24 * 3600)
+    cadence["posts_per_week"] = cadence["posts"] / weeks.where(weeks > 0)
+    return cadence
+
+
+def video_vs_image(posts):
+    """שיעור מעורבות ממוצע לסרטונים ולתמונות בכל פרופיל, והיחס ביניהם (video_lift > 1 - הסרטונים עדיפים)"""
+    table = posts.pivot_table(index="username", columns="is_video", values="engagement_rate", aggfunc="mean")
+    table = table.rename(columns={True: "video_rate", False: "image_rate"})
+    for column in ("video_rate", "image_rate"):
+        if column not in table:
+            table[column] = np.nan
+    counts = posts.groupby("username")["is_video"].agg(videos="sum", posts="size")
+    table = table[["video_rate", "image_rate"]].join(counts)
+    table["video_lift"] = table["video_rate"] / table["image_rate"].where(table["image_rate"] > 0)
+    return table
+
+
+def hashtag_lift(posts, min_posts=MIN_TAG_POSTS):
+    """
+    לכל האשטאג: בכמה פוסטים ואצל כמה פרופילים הוא מופיע, וה-lift - ממוצע ה-relative_engagement של הפוסטים שלו.
+    המעורבות מנורמלת לכל פרופיל, כך שהאשטאג של חשבון גדול לא מנצח רק בגלל גודל החשבון.
+    """
+    tags = posts[["username", "hashtags", "relative_engagement"]].explode("hashtags").dropna(subset=["hashtags"])
+    tags["hashtags"] = tags["hashtags"].str.lower()
+    lift = tags.groupby("hashtags").agg(posts=("username", "size"), profiles=("username", "nunique"),
+                                        lift=("relative_engagement", "mean"))
+    return lift[lift["posts"] >= min_posts].sort_values("lift", ascending=False)
+
+
+def profile_report(posts, profiles):
+    """טבלה אחת לפרופיל: מעורבות, קצב פרסום ווידאו מול תמונה"""
+    posts = with_engagement(posts, profiles)
+    cadence = posting_cadence(posts)[["posts_per_week", "median_gap_hours", "last_post"]]
+    media = video_vs_image(posts)[["video_rate", "image_rate", "video_lift"]]
+    return engagement_by_profile(posts).join(cadence).join(media).sort_values("engagement_rate", ascending=False)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+מדידת ביצועים של הסריקה מול השרת המדומה (standin.py)
+הסריקה עצמה היא scan_profile - אותה לוגיקה של instaloader-scan.py - רק שכל הבקשות מופנות לשרת המקומי.
+השרת רץ בתהליך נפרד, כך ששיא הזיכרון וזמן המעבד שנמדדים הם של הסריקה בלבד.
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+
+import instaloader
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .checkpoint import write_json_atomic
+from .loader import build_loader
+from .media import MediaPipeline
+from .metrics import PHASES, MetricsRecorder
+from .ratecontrol import rate_stats, shared_rate_controller
+from .scan import ScanOptions, scan_profile
+from .standin import StandinConfig, StandinServer, fetch_stats, redirect_instagram
+
+BENCH_ACCOUNT = "standin"
+# עוגיות של session מחובר - השרת המדומה לא בודק אותן
+BENCH_SESSION = {"csrftoken": "standin", "sessionid": "standin", "ds_user_id": "1", "mid": "standin"}
+RATE_LIMIT_MODES = ("off", "real")
+
+
+class _UnthrottledRateController(instaloader.RateController):
+    """בלי המתנות בין בקשות ואחרי 429 - מודד את הסריקה ולא את תקציב הבקשות"""
+
+    def wait_before_query(self, query_type):
+        pass
+
+    def handle_429(self, query_type):
+        pass
+
+
+def _serve(config, urls):
+    server = StandinServer(config)
+    urls.put(server.url)
+    server.serve_forever()
+
+
+def start_standin(config=None):
+    """מפעיל את השרת המדומה בתהליך נפרד ומחזיר (process, url)"""
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(config or StandinConfig(), urls), daemon=True)
+    process.start()
+    return process, urls.get(timeout=30)
+
+
+def peak_rss_mb():
+    """שיא הזיכרון של התהליך הנוכחי ב-MB (None במערכות בלי resource)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ב-Linux הערך בקילובייטים וב-macOS בבתים
+    return round(peak / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+
+
+def run_benchmark(usernames, output_root, config=None, options=None, logged_in=False, workers=1, media_workers=4,
+                  rate_limits="off", sleep=False):
+    """
+    סורק את usernames מול שרת מדומה חדש ומחזיר דוח ביצועים (נשמר גם ב-{output_root}/bench_report.json).
+    logged_in - סריקה עם session מחובר (סטוריז, היילייטס והפיד של האייפון) במקום סריקה אנונימית.
+    rate_limits="real" - עם ה-AdaptiveRateController ותקציבי הבקשות האמיתיים; "off" - בלי המתנות.
+    sleep - ההמתנה האקראית ש-instaloader מוסיף לפני כל בקשה (כבויה כברירת מחדל).
+    """
+    config = config or StandinConfig()
+    options = options or ScanOptions(incremental=False)
+    os.makedirs(output_root, exist_ok=True)
+    process, url = start_standin(config)
+    metrics = MetricsRecorder(os.path.join(output_root, "metrics.jsonl"))
+
+    local = threading.local()
+    loaders = []
+    loaders_lock = threading.Lock()
+
+    def _loader():
+        if not hasattr(local, "loader"):
+            controller = shared_rate_controller(BENCH_ACCOUNT) if rate_limits == "real" else _UnthrottledRateController
+            L = build_loader(rate_controller=controller)
+            L.context.sleep = sleep
+            if logged_in:
+                L.context.load_session(BENCH_ACCOUNT, BENCH_SESSION)
+            with loaders_lock:
+                loaders.append(L)
+            local.loader = L
+        return local.loader
+
+    def _scan(username):
+        try:
+            result = scan_profile(_loader(), username, os.path.join(output_root, username), options, media=media,
+                                  metrics=metrics)
+            return {"username": username, "status": "ok", "stats": result["stats"]}
+        except Exception as e:
+            return {"username": username, "status": "error", "error": str(e)}
+
+    started_at = datetime.now()
+    try:
+        with redirect_instagram(url):
+            started = time.monotonic()
+            media = MediaPipeline(workers=media_workers)
+            try:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bench") as pool:
+                    results = list(pool.map(_scan, usernames))
+                scanned = time.monotonic()
+            finally:
+                media.close()
+                for L in loaders:
+                    L.close()
+                metrics.close()
+            finished = time.monotonic()
+        server = fetch_stats(url)
+    finally:
+        process.terminate()
+        process.join()
+
+    # זמן לכל שלב, מסוכם על כל הפרופילים, ועוד ההמתנה לסיום הורדות המדיה אחרי הפוסט האחרון
+    summary = metrics.summary()
+    phases = {phase: summary["spans"][phase]["total_sec"] for phase in PHASES if phase in summary["spans"]}
+    phases["media_drain"] = round(finished - scanned, 3)
+
+    posts = sum(entry.get("stats", {}).get("total_posts_scanned", 0) for entry in results)
+    duration = finished - started
+    report = {
+        "started_at": started_at.isoformat(),
+        "config": asdict(config),
+        "logged_in": logged_in,
+        "rate_limits": rate_limits,
+        "sleep": sleep,
+        "workers": workers,
+        "media_workers": media_workers,
+        "profiles": len(usernames),
+        "succeeded": sum(1 for entry in results if entry["status"] == "ok"),
+        "duration_sec": round(duration, 3),
+        "posts": posts,
+        "posts_per_sec": round(posts / duration, 2) if duration else None,
+        "api_requests": server["api_requests"],
+        "requests_per_post": round(server["api_requests"] / posts, 3) if posts else None,
+        "requests_by_endpoint": server["endpoints"],
+        "rate_limited": server["rate_limited"],
+        "media_requests": server["media_requests"],
+        "bytes": {"api": server["api_bytes"], "media": server["media_bytes"],
+                  "total": server["api_bytes"] + server["media_bytes"]},
+        "media": media.stats(),
+        "rate": rate_stats(BENCH_ACCOUNT) if rate_limits == "real" else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "phase_seconds": phases,
+        "spans": summary["spans"],
+        "counters": summary["counters"],
+        "results": results,
+    }
+    report_file = os.path.join(output_root, "bench_report.json")
+    write_json_atomic(report_file, report, indent=2)
+    report["report_file"] = report_file
+    return report
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+מטמון על הדיסק לתשובות JSON של אינסטגרם (GraphQL, API של האייפון ונתוני דפי פרופיל)
+המטמון עוטף את get_json ו-get_page_data של ה-context, כך שתשובה שנמצאה בו לא עוברת ב-rate controller בכלל.
+מצבים:
+- cache: תשובה טרייה (לפי TTL לכל סוג endpoint) מוגשת מהדיסק, ואחרת נשלפת ונשמרת
+- record: כל בקשה נשלפת מהרשת ונשמרת, בלי תפוגה ובלי פינוי - הקלטה של סריקה
+- replay: הכל מוגש מהדיסק בלי קשר לגיל; בקשה שלא הוקלטה נכשלת במקום לצאת לרשת
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import instaloader
+
+from .checkpoint import write_json_atomic
+
+CACHE_MODES = ("off", "cache", "record", "replay")
+CACHE_DIR = ".instaloader_cache"
+
+# תוקף בשניות לכל סוג endpoint
+CACHE_TTLS = {
+    "profile": 60 * 60,
+    "posts": 15 * 60,
+    "stories": 5 * 60,
+    "highlights": 60 * 60,
+    "comments": 60 * 60,
+    "other": 10 * 60,
+}
+# אחרי פינוי המטמון תופס עד 90% מהגודל המקסימלי, כדי לא לפנות שוב בכל כתיבה
+EVICT_TO = 0.9
+
+
+class CacheMiss(instaloader.exceptions.ConnectionException):
+    """במצב replay: הבקשה לא נמצאת בהקלטה"""
+
+
+def endpoint_type(path, params):
+    """סיווג גס של הבקשה לפי הנתיב והמשתנים שלה, לבחירת ה-TTL"""
+    if path.startswith("page:"):
+        return "profile"
+    text = (path + " " + json.dumps(params, sort_keys=True, default=str)).lower()
+    if "highlight" in text:
+        return "highlights"
+    if "reel" in text or "stories" in text:
+        return "stories"
+    if "comment" in text:
+        return "comments"
+    if "users/" in path or "profile_info" in path:
+        return "profile"
+    if "graphql" in path or "feed/user" in path:
+        return "posts"
+    return "other"
+
+
+class ResponseCache:
+    """
+    מטמון תשובות בתיקייה אחת: קובץ JSON לכל בקשה, בשם שהוא hash של החשבון, ה-host, הנתיב והפרמטרים.
+    max_bytes מגביל את גודל התיקייה; הקבצים שהשימוש האחרון בהם הכי ישן מפונים ראשונים.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, mode="cache", max_bytes=512 * 1024 * 1024, ttls=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"מצב מטמון לא נתמך: {mode}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.ttls = {**CACHE_TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "bytes_served": 0}
+        # נתיב -> (גודל, שימוש אחרון) לכל הקבצים במטמון
+        self._index = {}
+        if mode != "off":
+            os.makedirs(cache_dir, exist_ok=True)
+            for root, _, files in os.walk(cache_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        path = os.path.join(root, name)
+                        stat = os.stat(path)
+                        self._index[path] = (stat.st_size, stat.st_mtime)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    @staticmethod
+    def key_for(account, host, path, params):
+        raw = json.dumps([account or "", host, path, params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key, kind):
+        """התשובה השמורה, או None אם אינה קיימת או שפג תוקפה (ב-replay אין תפוגה)"""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if self.mode == "cache" and time.time() - entry["created_at"] > self.ttls.get(kind, self.ttls["other"]):
+            return None
+        now = time.time()
+        # mtime משמש כזמן השימוש האחרון, גם בין ריצות
+        os.utime(path, (now, now))
+        with self._lock:
+            size = self._index.get(path, (os.path.getsize(path), now))[0]
+            self._index[path] = (size, now)
+            self._stats["hits"] += 1
+            self._stats["bytes_served"] += size
+        return entry["response"]
+
+    def put(self, key, kind, request, response):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_json_atomic(path, {"created_at": time.time(), "kind": kind, "request": request, "response": response})
+        with self._lock:
+            self._index[path] = (os.path.getsize(path), time.time())
+            self._stats["stored"] += 1
+        if self.mode == "cache":
+            self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total = sum(size for size, _ in self._index.values())
+            if not self.max_bytes or total <= self.max_bytes:
+                return
+            for path, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                del self._index[path]
+                total -= size
+                self._stats["evicted"] += 1
+
+    def _fetch(self, context, kind, request, fetch):
+        key = self.key_for(context.username, request["host"], request["path"], request["params"])
+        if self.mode in ("cache", "replay"):
+            response = self.get(key, kind)
+            if response is not None:
+                return response
+        with self._lock:
+            self._stats["misses"] += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"הבקשה לא נמצאת בהקלטה ({kind}): {request['host']}/{request['path']}")
+        response = fetch()
+        self.put(key, kind, request, response)
+        return response
+
+    def install(self, context):
+        """עוטף את get_json ו-get_page_data של context כך שיעברו דרך המטמון"""
+        if self.mode == "off":
+            return
+        get_json = context.get_json
+        get_page_data = context.get_page_data
+
+        def cached_get_json(path, params, host='www.instagram.com', session=None, _attempt=1,
+                            response_headers=None, use_post=False):
+            if _attempt > 1:
+                # ניסיון חוזר מתוך get_json עצמו - הקריאה החיצונית כבר בדקה את המטמון ותשמור את התשובה
+                return get_json(path, params, host, session, _attempt, response_headers, use_post)
+            request = {"host": host, "path": path, "params": params}
+            return self._fetch(context, endpoint_type(path, params), request,
+                               lambda: get_json(path, params, host, session, _attempt, response_headers, use_post))
+
+        def cached_get_page_data(path):
+            request = {"host": "www.instagram.com", "path": f"page:{path}", "params": {}}
+            return self._fetch(context, "profile", request, lambda: get_page_data(path))
+
+        context.get_json = cached_get_json
+        context.get_page_data = cached_get_page_data
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "mode": self.mode, "entries": len(self._index),
+                    "bytes": sum(size for size, _ in self._index.values())}
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+checkpoint לכל פרופיל: אילו פוסטים כבר נאספו, מה הפוסט החדש ביותר, ואיפה נעצרה הריצה האחרונה
+נשמר כ-.checkpoint.json בתיקיית הפלט של הפרופיל, בכתיבה אטומית אחרי כל פוסט.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from instaloader import FrozenNodeIterator
+from instaloader.exceptions import InvalidArgumentException
+
+CHECKPOINT_FILE = ".checkpoint.json"
+
+
+def write_json_atomic(path, data, indent=None):
+    """כותב JSON לקובץ זמני ומחליף אותו בבת אחת, כך שקריסה לא משאירה קובץ חצי כתוב"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointStore:
+    """
+    מצב הסריקה של פרופיל אחד.
+    known_shortcodes - פוסטים שנאספו בריצות שהושלמו; סריקה חוזרת נעצרת בראשון מהם
+    run - התקדמות הריצה הנוכחית (None כשאין ריצה פתוחה); ריצה שנקטעה ממשיכה ממנו
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self.newest_shortcode = None
+        self.known_shortcodes = set()
+        self.last_completed_at = None
+        self.run = None
+        if os.path.isfile(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.newest_shortcode = data.get("newest_shortcode")
+            self.known_shortcodes = set(data.get("known_shortcodes", []))
+            self.last_completed_at = data.get("last_completed_at")
+            self.run = data.get("run")
+            if self.run is not None:
+                self.run["captured"] = set(self.run.get("captured", []))
+
+    def start_run(self, compression=None):
+        """פותח ריצה חדשה, או ממשיך את הריצה שנקטעה (עם אותו קובץ רשומות ואותה דחיסה)"""
+        if self.run is None:
+            started_at = datetime.now()
+            self.run = {
+                # עם מיקרו-שניות - שתי ריצות באותה שנייה (ריצה חוזרת מהירה) לא דורסות זו את קובץ הרשומות של זו
+                "run_id": started_at.strftime("%Y%m%dT%H%M%S%f"),
+                "started_at": started_at.isoformat(),
+                "compression": compression,
+                "newest_shortcode": None,
+                "phases_done": [],
+                "captured": set(),
+                "posts_done": 0,
+                "iterator": None,
+            }
+        self.run["resumed_at"] = datetime.now().isoformat() if self.run["posts_done"] else None
+        return self.run
+
+    def is_captured(self, shortcode):
+        return shortcode in self.run["captured"]
+
+    def is_known(self, shortcode):
+        return shortcode in self.known_shortcodes
+
+    def is_phase_done(self, phase):
+        return phase in self.run["phases_done"]
+
+    def mark_phase_done(self, phase):
+        """שלב שהושלם (סטוריז, היילייטס) לא יורץ שוב כשהריצה ממשיכה אחרי הפסקה"""
+        self.run["phases_done"].append(phase)
+        self.save()
+
+    def record_post(self, post, posts_iterator):
+        run = self.run
+        if run["newest_shortcode"] is None and not post.is_pinned:
+            run["newest_shortcode"] = post.shortcode
+        run["captured"].add(post.shortcode)
+        run["posts_done"] += 1
+        self.save_iterator(posts_iterator)
+
+    def save_iterator(self, posts_iterator):
+        self.run["iterator"] = posts_iterator.freeze()._asdict()
+        self.save()
+
+    def resume_iterator(self, posts_iterator):
+        """מחזיר את האיטרטור של הפוסטים לנקודה שבה הריצה הקודמת נעצרה. False אם אי אפשר (פג תוקף, חשבון אחר)"""
+        frozen = self.run.get("iterator") if self.run else None
+        if not frozen or (frozen.get("best_before") or 0) < datetime.now().timestamp():
+            return False
+        try:
+            posts_iterator.thaw(FrozenNodeIterator(**frozen))
+            return True
+        except (InvalidArgumentException, TypeError):
+            return False
+
+    def complete_run(self):
+        """סוגר את הריצה: הפוסטים שנאספו הופכים ל"מוכרים" ומחזיר את נתוני הריצה"""
+        run = self.run
+        self.known_shortcodes.update(run["captured"])
+        if run["newest_shortcode"]:
+            self.newest_shortcode = run["newest_shortcode"]
+        self.last_completed_at = datetime.now().isoformat()
+        self.run = None
+        self.save()
+        return run
+
+    def save(self):
+        write_json_atomic(self.path, {
+            "newest_shortcode": self.newest_shortcode,
+            "known_shortcodes": sorted(self.known_shortcodes),
+            "last_completed_at": self.last_completed_at,
+            # captured נשמר כרשימה; בזיכרון הוא set, כך ש-is_captured לא עובר על כל הפוסטים
+            "run": dict(self.run, captured=sorted(self.run["captured"])) if self.run is not None else None,
+        })
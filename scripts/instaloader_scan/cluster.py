@@ -0,0 +1,589 @@
+# -*- coding: utf-8 -*-
+"""
+תיאום סריקות בין כמה מכונות (nodes): כל node הוא instaloader-worker.py עם החשבונות וה-proxy שלו
+הפרופילים מחולקים בין ה-nodes ב-consistent hashing, כך שפרופיל נסרק תמיד מאותו node - אותו session, אותה
+כתובת יוצאת ואותו checkpoint מקומי. node שמדווח על חסימות או שהפסיק לשלוח heartbeat יוצא מהטבעת, ורק
+הפרופילים שלו עוברים ל-node הבא בה; משימות שרצו על node שאבד חוזרות לתור.
+ה-coordinator הוא שרת HTTP קטן מעל JobQueue: ה-nodes מושכים ממנו משימות ושולחים אליו את הרשומות שלהם,
+והוא כותב את כולן לעץ פלט אחד (תיקייה לכל פרופיל, כמו בסריקה מקומית) ולכל sink נוסף (Postgres, TagIndex).
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+from .jobs import JOB_BUCKETS, LEASE_SECONDS
+from .sink import BATCH_SIZE, Sink
+from .stream import PART_SUFFIX, RECORDS_DIR, _repair_part, iter_records, list_record_files, write_summary
+
+COORDINATOR_PORT = 8700
+# node שלא שלח heartbeat זמן כזה נחשב אבוד (ה-worker שולח אחד לפחות כל דקה)
+NODE_TIMEOUT = 3 * 60.0
+# נקודות לכל node בטבעת - פיזור אחיד גם כשיש מעט nodes
+VNODES = 64
+# כמה חסימות (429 / המתנות כפויות) בחלון הזמן מוציאות node מהטבעת; הוא חוזר כשהן יוצאות מהחלון
+NODE_THROTTLES = 3
+THROTTLE_WINDOW = 10 * 60.0
+# ניסיונות לכל קריאה ל-coordinator (המתנה כפולה בין ניסיונות), לפני שהשגיאה עולה ל-worker; בלי ניסיון חוזר ל-4xx
+CALL_ATTEMPTS = 5
+# הפעולות שה-coordinator מקבל ב-POST; כל נתיב אחר הוא 404
+COORDINATOR_METHODS = ("claim", "extend", "heartbeat", "has_pending", "records", "complete", "fail", "release")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_nodes (
+    id TEXT PRIMARY KEY,
+    identity TEXT,
+    registered_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    status TEXT,
+    throttled INTEGER NOT NULL DEFAULT 0,
+    current_jobs TEXT,
+    jobs_done INTEGER NOT NULL DEFAULT 0,
+    jobs_failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], "big")
+
+
+class HashRing:
+    """טבעת consistent hashing: הוספה או הסרה של node מזיזה רק את המפתחות שלו"""
+
+    def __init__(self, nodes, vnodes=VNODES):
+        self.nodes = sorted(nodes)
+        points = sorted((_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key):
+        if not self._keys:
+            return None
+        return self._nodes[bisect.bisect(self._keys, _hash(key.lower())) % len(self._keys)]
+
+    def bucket_owner(self, bucket):
+        return self.owner(f"bucket-{bucket}")
+
+    def buckets(self, node):
+        """ה-buckets של התור (JOB_BUCKETS) שה-node הוא הבעלים שלהם"""
+        return [bucket for bucket in range(JOB_BUCKETS) if self.bucket_owner(bucket) == node]
+
+    def assignments(self, bucket_counts):
+        """כמה משימות שייכות לכל node, מספירת המשימות לפי bucket"""
+        counts = Counter()
+        for bucket, count in bucket_counts.items():
+            counts[self.bucket_owner(bucket)] += count
+        return counts
+
+
+def mask_proxy(proxy):
+    """כתובת ה-proxy בלי שם משתמש וסיסמה, לדיווח ל-coordinator"""
+    if not proxy:
+        return None
+    parts = urlsplit(proxy)
+    return urlunsplit((parts.scheme, parts.hostname + (f":{parts.port}" if parts.port else ""), parts.path, "", ""))
+
+
+class ShardCoordinator:
+    """
+    טבלת ה-nodes (באותו קובץ SQLite של JobQueue) והחלוקה שלהם: claim() נותן ל-node רק משימות מה-buckets
+    שהוא הבעלים שלהם בטבעת של ה-nodes הבריאים (כל פרופיל שייך ל-bucket קבוע, ראו jobs.job_bucket). כשכל ה-nodes חסומים הטבעת כוללת את כל מי שחי,
+    כדי שהעבודה לא תיעצר לגמרי.
+    """
+
+    def __init__(self, queue, node_timeout=NODE_TIMEOUT):
+        self.queue = queue
+        self.node_timeout = node_timeout
+        self._local = threading.local()
+        self._db().executescript(_SCHEMA)
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(self.queue.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return self._local.db
+
+    def heartbeat(self, node_id, status, current_jobs, done=0, failed=0, throttled=False, identity=None):
+        """מעדכן (או רושם) node ומדווח כשהוא נכנס לטבעת או יוצא ממנה בגלל חסימות"""
+        now = time.time()
+        db = self._db()
+        previous = db.execute("SELECT status, throttled FROM scan_nodes WHERE id = ?", (node_id,)).fetchone()
+        db.execute(
+            "INSERT INTO scan_nodes (id, identity, registered_at, last_seen, status, throttled, current_jobs, "
+            "jobs_done, jobs_failed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET identity = COALESCE(excluded.identity, identity), "
+            "last_seen = excluded.last_seen, status = excluded.status, throttled = excluded.throttled, "
+            "current_jobs = excluded.current_jobs, jobs_done = excluded.jobs_done, jobs_failed = excluded.jobs_failed",
+            (node_id, json.dumps(identity, ensure_ascii=False) if identity else None, now, now, status,
+             int(bool(throttled)), json.dumps(current_jobs, ensure_ascii=False), done, failed))
+        if previous is None or previous["status"] in ("stopped", "lost"):
+            if status != "stopped":
+                print(f"🛰️  node {node_id} הצטרף ({', '.join((identity or {}).get('accounts') or [])})", flush=True)
+        elif bool(previous["throttled"]) != bool(throttled):
+            print(f"🐢 node {node_id} חסום - הפרופילים שלו עוברים ל-nodes אחרים" if throttled else
+                  f"✅ node {node_id} חזר לטבעת", flush=True)
+
+    def nodes(self):
+        now = time.time()
+        nodes = []
+        for row in self._db().execute("SELECT * FROM scan_nodes ORDER BY id"):
+            node = dict(row)
+            node["identity"] = json.loads(node["identity"] or "{}")
+            node["current_jobs"] = json.loads(node["current_jobs"] or "[]")
+            node["alive"] = node["status"] not in ("stopped", "lost") and node["last_seen"] >= now - self.node_timeout
+            node["throttled"] = bool(node["throttled"])
+            nodes.append(node)
+        return nodes
+
+    def ring(self):
+        alive = [node for node in self.nodes() if node["alive"]]
+        healthy = [node["id"] for node in alive if not node["throttled"]]
+        return HashRing(healthy or [node["id"] for node in alive])
+
+    def claim(self, node_id, lease_seconds=LEASE_SECONDS):
+        ring = self.ring()
+        if node_id not in ring.nodes:
+            return None
+        return self.queue.claim(node_id, lease_seconds, buckets=ring.buckets(node_id))
+
+    def reap(self):
+        """מסמן nodes שלא נשמעו כאבודים ומחזיר לתור את המשימות שרצו עליהם"""
+        cutoff = time.time() - self.node_timeout
+        lost = [row["id"] for row in self._db().execute(
+            "SELECT id FROM scan_nodes WHERE status NOT IN ('stopped', 'lost') AND last_seen < ?", (cutoff,))]
+        for node_id in lost:
+            self._db().execute("UPDATE scan_nodes SET status = 'lost', current_jobs = '[]' WHERE id = ?", (node_id,))
+            requeued = self.queue.release_worker(node_id, "node_lost")
+            print(f"📴 node {node_id} אבד - {requeued} משימות חזרו לתור", flush=True)
+        return lost
+
+    def status(self):
+        """מצב ה-nodes, המשימות, וכמה משימות ממתינות שייכות לכל node בטבעת הנוכחית"""
+        return {"counts": self.queue.counts(), "nodes": self.nodes(),
+                "assignments": dict(self.ring().assignments(self.queue.bucket_counts()))}
+
+    def close(self):
+        if hasattr(self._local, "db"):
+            self._local.db.close()
+            del self._local.db
+
+
+class MergedStore:
+    """
+    עץ הפלט המאוחד: כל קובץ רשומות של node נכתב ל-{output_root}/{username}/records/{run_id}-{node}.jsonl
+    (קודם .part, והשם הסופי כשהמשימה הסתיימה), שורה מול שורה עם המקור - כך המיקום של כל רשומה זהה בשני הקבצים
+    ואצווה שנשלחה פעמיים לא נכתבת פעמיים. רשומה נכתבת רק אם היא הבאה בדיוק אחרי האחרונה בקובץ; רשומה שיש
+    לפניה פער (אצווה שאבדה) לא נכתבת, וה-node שולח שוב מה-.part המקומי שלו מהמיקום האחרון שיש כאן.
+    instaloader-export.py, instaloader-tags.py ו-instaloader-sink.py עובדים על העץ הזה כמו על פלט של סריקה מקומית.
+    """
+
+    def __init__(self, output_root):
+        self.output_root = output_root
+        self._lock = threading.Lock()
+        # נתיב מאוחד -> [קובץ פתוח, רשומות שכבר בו, (node, username)]
+        self._files = {}
+        self._stats = defaultdict(int)
+
+    def path_for(self, node_id, source):
+        """ה-source הוא {output}/{username}/records/{run_id}.jsonl[.gz|.zst] אצל ה-node"""
+        username = os.path.basename(os.path.dirname(os.path.dirname(source)))
+        run_id = os.path.basename(source).split(".", 1)[0]
+        return username, os.path.join(self.output_root, username, RECORDS_DIR, f"{run_id}-{node_id}.jsonl")
+
+    def _open(self, path, owner):
+        if path not in self._files:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part = path + PART_SUFFIX
+            written = 0
+            if os.path.isfile(part):
+                # שורה חתוכה מ-coordinator שקרס הייתה נדבקת לרשומה הבאה
+                _repair_part(part, None)
+                written = sum(1 for _ in iter_records(part))
+            self._files[path] = [open(part, 'a', encoding='utf-8'), written, owner]
+        return self._files[path]
+
+    def write(self, node_id, record, source, position):
+        """
+        מחזיר (הנתיב המאוחד, המיקום האחרון שנכתב לו). הנתיב None - הרשומה לא נכתבה: היא כבר בקובץ,
+        או שיש פער לפניה (position גדול מהאחרון + 1)
+        """
+        username, path = self.path_for(node_id, source)
+        with self._lock:
+            entry = self._open(path, (node_id, username))
+            if position != entry[1] + 1:
+                self._stats["duplicates" if position <= entry[1] else "gaps"] += 1
+                return None, entry[1]
+            entry[0].write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            entry[1] = position
+            self._stats["records"] += 1
+            return path, position
+
+    def flush(self):
+        with self._lock:
+            for f, _, _ in self._files.values():
+                f.flush()
+
+    def finish(self, node_id, username, final):
+        """
+        סוגר את הקבצים של פרופיל מ-node; final - הריצה הושלמה והקבצים מקבלים את השם הסופי,
+        ואחרת ה-.part נשאר וממשיך להתמלא כשה-node ימשיך את אותה ריצה
+        """
+        with self._lock:
+            for path in [path for path, entry in self._files.items() if entry[2] == (node_id, username)]:
+                f, _, _ = self._files.pop(path)
+                f.close()
+                if final:
+                    os.replace(path + PART_SUFFIX, path)
+
+    def summarize(self, username, stats):
+        """profile_data.json של הפרופיל בעץ המאוחד, מרשומת הפרופיל האחרונה ומכל קבצי הרשומות הסופיים"""
+        output_dir = os.path.join(self.output_root, username)
+        record_files = list_record_files(output_dir)
+        profile_data = None
+        for path in reversed(record_files):
+            profile_data = next((record for record in iter_records(path) if record.get("type") == "profile"), None)
+            if profile_data is not None:
+                break
+        profile_data = {key: value for key, value in (profile_data or {"username": username}).items()
+                        if key not in ("type", "userid")}
+        return write_summary(output_dir, profile_data, stats, record_files)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "open_files": len(self._files)}
+
+    def close(self):
+        with self._lock:
+            for f, _, _ in self._files.values():
+                f.close()
+            self._files.clear()
+
+
+class CoordinatorServer:
+    """
+    שרת ה-coordinator: POST {url}/{method} עם גוף JSON לכל פעולה של התור (claim, extend, complete, fail,
+    release, heartbeat, has_pending) ו-records לאצוות רשומות; GET {url}/status למצב.
+    sink - RecordSink / TagIndex שמקבלים את הרשומות המאוחדות (עם הנתיב בעץ המאוחד כמקור ל-checkpoint).
+    thread ברקע מחזיר לתור משימות של nodes שאבדו.
+    """
+
+    def __init__(self, coordinator, store, sink=None, host="0.0.0.0", port=COORDINATOR_PORT):
+        self.coordinator = coordinator
+        self.store = store
+        self.sink = sink
+        self._stop = threading.Event()
+        server = self
+
+        class Handler(_Handler):
+            coordinator_server = server
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._threads = []
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{port}"
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._httpd.serve_forever, name="coordinator", daemon=True),
+                         threading.Thread(target=self._reap_loop, name="reaper", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _reap_loop(self):
+        while not self._stop.wait(max(1.0, self.coordinator.node_timeout / 4)):
+            self.coordinator.reap()
+
+    def stop(self):
+        self._stop.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self.store.close()
+        if self.sink is not None:
+            self.sink.close()
+
+    # --- פעולות ---
+
+    def call(self, method, payload):
+        coordinator, queue = self.coordinator, self.coordinator.queue
+        node = payload.get("node")
+        if method == "claim":
+            return coordinator.claim(node, payload.get("lease_seconds", LEASE_SECONDS))
+        if method == "extend":
+            return queue.extend(payload["job_ids"], node, payload.get("lease_seconds", LEASE_SECONDS))
+        if method == "heartbeat":
+            return coordinator.heartbeat(node, payload["status"], payload.get("current_jobs", []),
+                                         payload.get("done", 0), payload.get("failed", 0),
+                                         payload.get("throttled", False), payload.get("identity"))
+        if method == "has_pending":
+            return queue.has_pending()
+        if method == "records":
+            return self._records(node, payload["records"])
+        if method in ("complete", "fail", "release"):
+            return self._finish(method, node, payload)
+        raise ValueError(f"unknown method: {method}")
+
+    def _records(self, node, records):
+        """
+        כותב אצווה של node. gaps - לכל קובץ מקור שחסרות בו רשומות לפני האצווה, המיקום האחרון שיש ל-coordinator;
+        שאר הרשומות של אותו מקור באצווה לא נכתבות, וה-node שולח שוב מהמיקום הזה
+        """
+        written, gaps = 0, {}
+        for record, source, position in records:
+            if source in gaps:
+                continue
+            path, last = self.store.write(node, record, source, position)
+            if path is not None:
+                written += 1
+                if self.sink is not None:
+                    self.sink.write(record, path, position)
+            elif position > last:
+                gaps[source] = last
+        self.store.flush()
+        return {"written": written, "gaps": gaps}
+
+    def _finish(self, method, node, payload):
+        job = self.coordinator.queue.get(payload["job_id"])
+        queue = self.coordinator.queue
+        if method == "complete":
+            done = queue.complete(payload["job_id"], node, payload.get("result"))
+        elif method == "fail":
+            done = queue.fail(payload["job_id"], node, payload.get("error"), payload.get("retry", False),
+                              payload.get("result"))
+        else:
+            done = queue.release(payload["job_id"], node, payload.get("reason", "interrupted"))
+        if job is not None:
+            # רק ריצה שהושלמה מקבלת שמות סופיים; ריצה שנקטעה ממשיכה לאותו .part
+            self.store.finish(node, job["username"], final=method == "complete")
+            if self.sink is not None:
+                self.sink.flush()
+            if method == "complete":
+                self.store.summarize(job["username"], (payload.get("result") or {}).get("stats") or {})
+        return done
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    coordinator_server = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/status":
+            server = self.coordinator_server
+            self._send_json(200, {**server.coordinator.status(), "store": server.store.stats()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        # הגוף נקרא תמיד, גם לבקשה שתידחה - אחרת הוא נשאר בחיבור (keep-alive) ונקרא כבקשה הבאה
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        method = self.path.strip("/")
+        if method not in COORDINATOR_METHODS:
+            self._send_json(404, {"error": f"unknown method: {method}"})
+            return
+        try:
+            payload = json.loads(body.decode('utf-8')) if body else {}
+        except ValueError as e:
+            self._send_json(400, {"error": f"invalid JSON: {str(e)}"})
+            return
+        try:
+            result = self.coordinator_server.call(method, payload)
+        except Exception as e:
+            print(f"⚠️  coordinator: {self.path} נכשל: {str(e)}", flush=True)
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"result": result})
+
+
+class _Client:
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        # בלי משתני סביבה: ה-proxy של ה-node מיועד לאינסטגרם, לא ל-coordinator
+        if not hasattr(self._local, "session"):
+            session = requests.Session()
+            session.trust_env = False
+            self._local.session = session
+        return self._local.session
+
+    def _call(self, method, **payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        for attempt in range(CALL_ATTEMPTS):
+            try:
+                resp = self._session().post(f"{self.url}/{method}", data=body, timeout=self.timeout,
+                                            headers={"Content-Type": "application/json"})
+                resp.raise_for_status()
+                return resp.json()["result"]
+            except requests.RequestException as e:
+                # 4xx - הבקשה עצמה שגויה, וניסיון חוזר יקבל את אותה תשובה
+                rejected = isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code < 500
+                if rejected or attempt == CALL_ATTEMPTS - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
+
+class ThrottleMonitor:
+    """
+    האם ה-node חסום: לפחות NODE_THROTTLES אירועי חסימה של ה-rate controllers שלו ב-THROTTLE_WINDOW האחרונות,
+    או שכל החשבונות שלו יצאו מהסבב (challenge / session פג) - ה-IP או החשבונות שלו "שרופים" כרגע.
+    """
+
+    def __init__(self, sessions, threshold=NODE_THROTTLES, window=THROTTLE_WINDOW):
+        self.sessions = sessions
+        self.threshold = threshold
+        self.window = window
+        self._events = []
+        self._last_total = sessions.rate_totals()["throttle_events"]
+
+    def __call__(self):
+        now = time.monotonic()
+        total = self.sessions.rate_totals()["throttle_events"]
+        self._events.extend([now] * (total - self._last_total))
+        self._last_total = total
+        self._events = [at for at in self._events if at >= now - self.window]
+        report = self.sessions.report()
+        lost_identity = bool(report) and all(account["disabled_reason"] for account in report)
+        return lost_identity or len(self._events) >= self.threshold
+
+
+class RemoteQueue(_Client):
+    """
+    התור של node: אותו ממשק כמו JobQueue (מה ש-ScanWorker משתמש בו), מעל ה-coordinator.
+    attach() מחבר את ה-SessionPool של ה-worker - החשבונות וה-proxy מדווחים ב-heartbeat, וכך גם חסימות.
+    """
+
+    def __init__(self, url, timeout=60):
+        super().__init__(url, timeout)
+        self.identity = {"host": socket.gethostname()}
+        self.health = None
+
+    def attach(self, sessions, proxy=None):
+        self.identity = {"host": socket.gethostname(), "accounts": sessions.usernames(), "proxy": mask_proxy(proxy)}
+        self.health = ThrottleMonitor(sessions)
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS):
+        return self._call("claim", node=worker_id, lease_seconds=lease_seconds)
+
+    def extend(self, job_ids, worker_id, lease_seconds=LEASE_SECONDS):
+        if job_ids:
+            self._call("extend", node=worker_id, job_ids=job_ids, lease_seconds=lease_seconds)
+
+    def complete(self, job_id, worker_id, result):
+        return self._call("complete", node=worker_id, job_id=job_id, result=result)
+
+    def fail(self, job_id, worker_id, error, retry=False, result=None):
+        return self._call("fail", node=worker_id, job_id=job_id, error=error, retry=retry, result=result)
+
+    def release(self, job_id, worker_id, reason="interrupted"):
+        return self._call("release", node=worker_id, job_id=job_id, reason=reason)
+
+    def has_pending(self):
+        return self._call("has_pending")
+
+    def heartbeat(self, worker_id, status, current_jobs, done=0, failed=0):
+        throttled = self.health() if self.health is not None and status != "stopped" else False
+        self._call("heartbeat", node=worker_id, status=status, current_jobs=current_jobs, done=done, failed=failed,
+                   throttled=throttled, identity=self.identity)
+
+    def close(self):
+        if hasattr(self._local, "session"):
+            self._local.session.close()
+
+
+class RemoteSink(_Client, Sink):
+    """
+    sink של node: צובר רשומות ושולח אותן באצוות ל-coordinator, שכותב אותן לעץ המאוחד.
+    אצווה שלא נשלחה נשארת ותישלח עם הבאה (ה-coordinator מדלג על רשומות שכבר קיבל). כשה-coordinator מדווח
+    על פער (רשומות שאבדו ב-node שקרס לפני ששלח אותן), הרשומות החסרות נקראות מקובץ הרשומות המקומי ונשלחות שוב.
+    """
+
+    def __init__(self, url, node_id, batch_size=BATCH_SIZE, timeout=60):
+        super().__init__(url, timeout)
+        self.node_id = node_id
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending = []
+        self._stats = defaultdict(int)
+
+    def write(self, record, source=None, position=None):
+        if source is None:
+            return
+        with self._lock:
+            self._pending.append((record, source, position))
+            self._stats["records"] += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._send_lock:
+            while True:
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                if not batch:
+                    return
+                try:
+                    result = self._call("records", node=self.node_id, records=batch)
+                except requests.RequestException as e:
+                    with self._lock:
+                        self._pending = batch + self._pending
+                        self._stats["failed_batches"] += 1
+                    print(f"⚠️  שליחת רשומות ל-coordinator נכשלה ({str(e)}); ינסה שוב עם האצווה הבאה", flush=True)
+                    return
+                resend = self._missing(result["gaps"])
+                with self._lock:
+                    self._stats["batches"] += 1
+                    self._stats["resent"] += len(resend)
+                    # הרשומות החסרות לפני מה שעוד ממתין, כדי שה-coordinator יקבל אותן לפי הסדר
+                    self._pending = resend + self._pending
+                if not resend:
+                    return
+
+    def _missing(self, gaps):
+        """הרשומות שאחרי המיקום האחרון של ה-coordinator, מה-.part המקומי (או מהקובץ הסופי אם הריצה הסתיימה)"""
+        missing = []
+        for source, last in gaps.items():
+            path = next((path for path in (source + PART_SUFFIX, source) if os.path.isfile(path)), None)
+            records = [] if path is None else [(record, source, position) for position, record
+                                               in enumerate(iter_records(path), start=1) if position > last]
+            if not records:
+                print(f"⚠️  ל-coordinator חסרות רשומות מ-{source} אחרי {last}, והן לא נמצאו בקובץ המקומי", flush=True)
+            missing.extend(records)
+        return missing
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending)}
+
+    def close(self):
+        self.flush()
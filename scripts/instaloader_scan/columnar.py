@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+ייצוא עמודתי (Parquet / Arrow) של כל הפרופילים שנסרקו
+מעבר זורם אחד על קבצי הרשומות של כל פרופיל בונה שתי טבלאות - posts ו-profiles - במקום מאות קבצי JSON,
+כך שדשבורד חוצה-משפיענים קורא כמה עמודות בלבד. המונים של כל פוסט הם האחרונים מהיסטוריית המעורבות.
+דורש pyarrow: pip3 install pyarrow
+"""
+
+import os
+from datetime import datetime
+
+from .engagement import EngagementLog
+from .stream import RECORDS_DIR, iter_records, list_record_files
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("ייצוא עמודתי דורש את החבילה pyarrow: pip3 install pyarrow")
+
+
+def _schemas():
+    posts = pa.schema([
+        ("username", pa.string()),
+        ("shortcode", pa.string()),
+        ("date", pa.timestamp("s")),
+        ("likes", pa.int64()),
+        ("comments", pa.int64()),
+        ("views", pa.int64()),
+        ("is_video", pa.bool_()),
+        ("typename", pa.string()),
+        ("video_duration", pa.float64()),
+        ("location", pa.string()),
+        ("caption_length", pa.int32()),
+        ("hashtags", pa.list_(pa.string())),
+        ("mentions", pa.list_(pa.string())),
+    ])
+    profiles = pa.schema([
+        ("username", pa.string()),
+        ("userid", pa.int64()),
+        ("full_name", pa.string()),
+        ("followers", pa.int64()),
+        ("followees", pa.int64()),
+        ("mediacount", pa.int64()),
+        ("is_verified", pa.bool_()),
+        ("is_private", pa.bool_()),
+        ("posts_scanned", pa.int64()),
+    ])
+    return posts, profiles
+
+
+def profile_dirs(output_root):
+    """תיקיות הפרופילים מתחת ל-output_root (כל תיקייה שיש בה records)"""
+    return sorted(os.path.join(output_root, name) for name in os.listdir(output_root)
+                  if os.path.isdir(os.path.join(output_root, name, RECORDS_DIR)))
+
+
+def _date(value):
+    return datetime.fromisoformat(value).replace(tzinfo=None) if value else None
+
+
+def collect_profile(output_dir):
+    """(רשומת הפרופיל האחרונה, {shortcode: שורת פוסט}) של פרופיל אחד, מהרשומה החדשה ביותר לכל פוסט"""
+    profile = None
+    posts = {}
+    for path in reversed(list_record_files(output_dir)):
+        for record in iter_records(path):
+            record_type = record.get("type")
+            if record_type == "profile" and profile is None:
+                profile = record
+            elif record_type == "post" and record["shortcode"] not in posts:
+                media_info = record.get("media_info") or {}
+                posts[record["shortcode"]] = {
+                    "username": record.get("username"),
+                    "shortcode": record["shortcode"],
+                    "date": _date(record.get("date")),
+                    "likes": record.get("likes"),
+                    "comments": record.get("comments_count"),
+                    "views": None,
+                    "is_video": bool(record.get("is_video")),
+                    "typename": media_info.get("typename"),
+                    "video_duration": media_info.get("video_duration"),
+                    "location": record.get("location"),
+                    "caption_length": len(record.get("caption") or ""),
+                    "hashtags": record.get("caption_hashtags") or [],
+                    "mentions": record.get("caption_mentions") or [],
+                }
+    # המונים העדכניים ביותר - גם של פוסטים שרק רוענו בלי רשומת post חדשה
+    for shortcode, values in EngagementLog(output_dir).latest.items():
+        if shortcode in posts:
+            posts[shortcode].update({key: value for key, value in zip(("likes", "comments", "views"), values)
+                                     if value is not None})
+    return profile, posts
+
+
+def build_tables(output_dirs):
+    """(posts, profiles) כטבלאות pyarrow מכל תיקיות הפרופילים"""
+    _require_pyarrow()
+    posts_schema, profiles_schema = _schemas()
+    post_columns = {field.name: [] for field in posts_schema}
+    profile_columns = {field.name: [] for field in profiles_schema}
+    for output_dir in output_dirs:
+        profile, posts = collect_profile(output_dir)
+        for post in posts.values():
+            for name, column in post_columns.items():
+                column.append(post[name])
+        if profile is not None:
+            for name, column in profile_columns.items():
+                column.append(len(posts) if name == "posts_scanned" else profile.get(name))
+    return (pa.table(post_columns, schema=posts_schema),
+            pa.table(profile_columns, schema=profiles_schema))
+
+
+def _write(table, path, export_format):
+    part_path = path + ".part"
+    if export_format == "parquet":
+        pq.write_table(table, part_path, compression="zstd")
+    else:
+        feather.write_feather(table, part_path, compression="zstd")
+    os.replace(part_path, path)
+
+
+def export_columnar(output_root, dest_dir=None, export_format="parquet"):
+    """
+    כותב posts.{parquet,arrow} ו-profiles.{parquet,arrow} לכל הפרופילים שב-output_root
+    (ברירת מחדל: {output_root}/columnar). מחזיר {טבלה: (נתיב, שורות)}.
+    """
+    _require_pyarrow()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"פורמט לא נתמך: {export_format}")
+    dest_dir = dest_dir or os.path.join(output_root, "columnar")
+    os.makedirs(dest_dir, exist_ok=True)
+    posts, profiles = build_tables(profile_dirs(output_root))
+    written = {}
+    for name, table in (("posts", posts), ("profiles", profiles)):
+        path = os.path.join(dest_dir, name + EXPORT_FORMATS[export_format])
+        _write(table, path, export_format)
+        written[name] = (path, table.num_rows)
+    return written
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+תגובות ראשונות של פוסט מתוך הנתונים שכבר הגיעו עם הפוסט, בלי בקשות נוספות
+צומת הפוסט ברשימת הפוסטים של הפרופיל כבר מכיל תצוגה מקדימה של התגובות (edges ב-GraphQL או preview_comments
+ב-API של האייפון). get_comments() נקרא רק כשהתצוגה המקדימה קצרה מהמספר המבוקש.
+"""
+
+from datetime import datetime, timezone
+
+COMMENT_MODES = ("preview", "full")
+
+# edges של תגובות בצומת GraphQL של פוסט, לפי סדר עדיפות
+_GRAPHQL_COMMENT_EDGES = ("edge_media_to_parent_comment", "edge_media_preview_comment", "edge_media_to_comment")
+
+
+def new_comment_stats():
+    return {"from_preview": 0, "skipped_no_comments": 0, "fetched": 0, "requests_saved": 0}
+
+
+def embedded_comment_count(post):
+    """מספר התגובות מתוך צומת הפוסט, או None אם אינו שם. post.comments עלול לשלוף את כל ה-metadata של הפוסט"""
+    node = post._node
+    for key in _GRAPHQL_COMMENT_EDGES:
+        if 'count' in node.get(key, {}):
+            return node[key]['count']
+    if node.get("comments") is not None:
+        return node["comments"]
+    return node.get("iphone_struct", {}).get("comment_count")
+
+
+def _graphql_comment(node):
+    return {
+        "id": int(node['id']),
+        "owner": node.get('owner', {}).get('username'),
+        "text": node.get('text'),
+        "created_at": datetime.fromtimestamp(node['created_at'], timezone.utc).isoformat(),
+        "likes": node.get('edge_liked_by', {}).get('count', 0),
+    }
+
+
+def _iphone_comment(comment):
+    return {
+        "id": int(comment['pk']),
+        "owner": comment.get('user', {}).get('username'),
+        "text": comment.get('text'),
+        "created_at": datetime.fromtimestamp(comment['created_at'], timezone.utc).isoformat(),
+        "likes": comment.get('comment_like_count', 0),
+    }
+
+
+def embedded_comments(post):
+    """התגובות שכבר נמצאות בצומת הפוסט"""
+    node = post._node
+    for key in _GRAPHQL_COMMENT_EDGES:
+        edges = node.get(key, {}).get('edges')
+        if edges:
+            return [_graphql_comment(edge['node']) for edge in edges]
+    preview = node.get("iphone_struct", {}).get("preview_comments")
+    if preview:
+        return [_iphone_comment(comment) for comment in preview]
+    return []
+
+
+def _fetched_comments(post, max_comments):
+    comments_list = []
+    for comment in post.get_comments():
+        if len(comments_list) >= max_comments:
+            break
+        comments_list.append({
+            "id": comment.id,
+            "owner": comment.owner.username,
+            "text": comment.text,
+            "created_at": comment.created_at_utc.isoformat(),
+            "likes": comment.likes_count if hasattr(comment, 'likes_count') else 0,
+        })
+    return comments_list
+
+
+def collect_comments(post, max_comments, stats, mode="preview", logged_in=True):
+    """
+    עד max_comments תגובות ראשונות של הפוסט.
+    mode="preview" - מהתצוגה המקדימה; get_comments() רק אם היא קצרה מהמבוקש (ודורש התחברות)
+    mode="full" - תמיד get_comments(), כמו בסקריפטים המקוריים
+    stats מתעדכן במקום; requests_saved סופר פוסטים שבהם נחסכה לפחות בקשה אחת.
+    """
+    if max_comments <= 0:
+        return []
+    if mode == "full":
+        stats["fetched"] += 1
+        return _fetched_comments(post, max_comments)
+
+    count = embedded_comment_count(post)
+    if count == 0:
+        stats["skipped_no_comments"] += 1
+        stats["requests_saved"] += 1
+        return []
+
+    preview = embedded_comments(post)
+    wanted = max_comments if count is None else min(max_comments, count)
+    if len(preview) >= wanted:
+        stats["from_preview"] += 1
+        stats["requests_saved"] += 1
+        return preview[:max_comments]
+    if not logged_in:
+        # get_comments() דורש התחברות - מסתפקים במה שיש
+        stats["from_preview"] += 1
+        return preview
+
+    stats["fetched"] += 1
+    return _fetched_comments(post, max_comments)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+היסטוריית מעורבות לכל פוסט (likes, comments, views) בקובץ append-only בתיקיית הפרופיל
+שורה נוספת רק כשאחד המונים השתנה מאז התצפית הקודמת, כך שסריקה חוזרת של אלפי פוסטים כותבת רק את השינויים,
+ועקומת הגדילה של פוסט היא פשוט השורות שלו לפי הסדר. המונים נלקחים מנתוני הפוסט שכבר נטענו - בלי בקשות נוספות.
+"""
+
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+
+from .checkpoint import write_json_atomic
+from .comments import embedded_comment_count
+from .stream import _repair_part
+
+ENGAGEMENT_LOG = "engagement.jsonl"
+ENGAGEMENT_INDEX = ".engagement_index.json"
+
+
+def post_engagement(post):
+    """(likes, comments, views) מתוך צומת הפוסט; views רק לסרטונים"""
+    node = post._node
+    iphone = node.get("iphone_struct") or {}
+    comments = embedded_comment_count(post)
+    views = None
+    if node.get("is_video"):
+        views = node.get("video_view_count")
+        if views is None:
+            views = iphone.get("play_count") or iphone.get("view_count")
+    return post.likes, comments, views
+
+
+class EngagementLog:
+    """
+    engagement.jsonl - שורה לכל שינוי: {shortcode, at, likes, comments, views}.
+    האינדקס (.engagement_index.json) שומר את הערכים האחרונים לכל פוסט ועד איזה offset בקובץ הם מעודכנים;
+    שורות שנכתבו אחרי השמירה האחרונה (ריצה שקרסה) נקראות מחדש בטעינה, ושורה חתוכה בסוף הקובץ נחתכת ממנו -
+    אחרת התצפית הבאה הייתה נדבקת אליה.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, ENGAGEMENT_LOG)
+        self.index_path = os.path.join(output_dir, ENGAGEMENT_INDEX)
+        self.latest = {}
+        offset = 0
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            self.latest = {shortcode: tuple(values) for shortcode, values in index.get("posts", {}).items()}
+            offset = index.get("offset", 0)
+        if os.path.isfile(self.path):
+            _repair_part(self.path, None)
+        self._replay(offset)
+        self._file = None
+        self.stats = {"observed": 0, "changed": 0}
+
+    def _replay(self, offset):
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) <= offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    point = json.loads(line)
+                except json.JSONDecodeError:
+                    # שורה חתוכה מקובץ שנכתב לפני שהתיקון בטעינה היה קיים - מדלגים רק עליה
+                    continue
+                self.latest[point["shortcode"]] = (point["likes"], point["comments"], point.get("views"))
+
+    def observe(self, shortcode, likes, comments, views=None, at=None):
+        """רושם תצפית; מחזיר את השורה שנוספה, או None אם המונים לא השתנו"""
+        self.stats["observed"] += 1
+        values = (likes, comments, views)
+        if self.latest.get(shortcode) == values:
+            return None
+        point = {"shortcode": shortcode, "at": (at or datetime.now()).isoformat(timespec='seconds'),
+                 "likes": likes, "comments": comments, "views": views}
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(point, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.latest[shortcode] = values
+        self.stats["changed"] += 1
+        return point
+
+    def observe_post(self, post):
+        return self.observe(post.shortcode, *post_engagement(post))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        offset = os.path.getsize(self.path) if os.path.isfile(self.path) else 0
+        write_json_atomic(self.index_path, {"offset": offset, "posts": self.latest,
+                                            "saved_at": datetime.now().isoformat()})
+
+
+def load_series(output_dir, shortcodes=None):
+    """הסדרה של כל פוסט: shortcode -> [{at, likes, comments, views}] לפי הסדר (shortcodes=None - כולם)"""
+    wanted = set(shortcodes) if shortcodes else None
+    series = defaultdict(list)
+    path = os.path.join(output_dir, ENGAGEMENT_LOG)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                point = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if wanted is None or point["shortcode"] in wanted:
+                series[point.pop("shortcode")].append(point)
+    return dict(series)
+
+
+def growth(points):
+    """גדילה בין התצפית הראשונה לאחרונה: {likes, comments, views, hours}"""
+    if len(points) < 2:
+        return None
+    first, last = points[0], points[-1]
+    hours = (datetime.fromisoformat(last["at"]) - datetime.fromisoformat(first["at"])).total_seconds() / 3600
+    return {key: (last[key] - first[key]) if last.get(key) is not None and first.get(key) is not None else None
+            for key in ("likes", "comments", "views")} | {"hours": round(hours, 2)}
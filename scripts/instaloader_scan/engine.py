@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+הרצת סריקות של רשימת פרופילים על מאגר workers מוגבל
+כל worker מחזיק Instaloader משלו (context ו-session נפרדים), וה-workers של אותו חשבון חולקים קצב בקשות.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import instaloader
+
+from .checkpoint import write_json_atomic
+from .loader import SESSION_FILE
+from .media import MediaPipeline
+from .metrics import MetricsRecorder
+from .ratecontrol import RATE_STATE_FILE
+from .scan import ScanInterrupted, ScanOptions, scan_profile
+from .sessions import SessionPool, is_challenge
+from .sink import combine_sinks
+
+
+def read_usernames(source):
+    """קורא שמות משתמש מקובץ או מ-stdin ('-'): שורה לכל פרופיל, '#' להערות, בלי כפילויות"""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+    usernames = []
+    for line in lines:
+        username = line.split("#", 1)[0].strip().lstrip("@")
+        if username and username not in usernames:
+            usernames.append(username)
+    return usernames
+
+
+def _status_for(error):
+    if isinstance(error, ScanInterrupted):
+        return "interrupted"
+    if isinstance(error, instaloader.exceptions.ProfileNotExistsException):
+        return "not_found"
+    if isinstance(error, instaloader.exceptions.PrivateProfileNotFollowedException):
+        return "private"
+    if isinstance(error, instaloader.exceptions.ConnectionException):
+        return "connection_error"
+    return "error"
+
+
+def scan_with_sessions(sessions, username, output_dir, options, stop_event=None, media=None, metrics=None,
+                       sink=None, profile_cache=None):
+    """
+    סורק פרופיל אחד עם החשבון הבריא ביותר במאגר ומחזיר רשומת תוצאה (status, stats/error, account, duration_sec).
+    חשבון שקיבל challenge יוצא מהסבב, והפרופיל ממשיך מה-checkpoint עם החשבון הבא.
+    """
+    started = time.monotonic()
+    entry = {"username": username, "output_dir": output_dir}
+    tried = set()
+    while True:
+        lease = sessions.acquire(exclude=tried)
+        entry["account"] = lease.username
+        try:
+            result = scan_profile(lease.loader, username, output_dir, options, stop_event=stop_event, media=media,
+                                  metrics=metrics, sink=sink, profile_cache=profile_cache)
+            sessions.release(lease)
+            entry.update(status="ok", stats=result["stats"])
+            entry.pop("error", None)
+            break
+        except Exception as e:
+            sessions.release(lease, e)
+            entry.update(status=_status_for(e), error=str(e))
+            print(f"[@{username}] ❌ {str(e)}", flush=True)
+            if lease.account is None or not is_challenge(e) or (stop_event is not None and stop_event.is_set()):
+                break
+            tried.add(lease.username)
+    entry["duration_sec"] = round(time.monotonic() - started, 2)
+    return entry
+
+
+def run_batch(usernames, output_root, workers=4, login_username=None, session_file=SESSION_FILE, options=None,
+              media_workers=8, media_queue=64, rate_state_file=RATE_STATE_FILE, accounts=None,
+              cache=None, metrics_file=None, progress=False, media_store=None, postprocess=None, sink=None,
+              tag_index=None, profile_cache=None, rag=None):
+    """
+    סורק את כל הפרופילים ב-usernames במקביל ושומר run_report.json מסכם ב-output_root.
+    כל פרופיל נכתב לתיקייה משלו: {output_root}/{username}
+    המדיה של כל הסריקות יורדת דרך MediaPipeline משותף אחד (media_workers, תור של media_queue משימות).
+    accounts - רשימת (username, session_file) למאגר ה-sessions; ברירת המחדל היא login_username עם session_file.
+    rate_state_file - קובץ תקציב הבקשות המשותף לכל התהליכים של אותו חשבון (None - רק בתוך התהליך הזה).
+    cache - ResponseCache לתשובות JSON (None - בלי מטמון).
+    media_store - MediaStore משותף: קבצים שכבר ירדו (בכל פרופיל ובכל ריצה) לא יורדים ולא נשמרים שוב.
+    postprocess - PostProcessor לתמונות ממוזערות, קול ו-keyframes של כל קובץ שירד, במקביל לסריקה.
+    sink - RecordSink שמקבל את הרשומות של כל הפרופילים באצוות (למשל PostgresSink); נסגר בסוף הריצה.
+    tag_index - TagIndex של האשטאגים ואזכורים, מתעדכן מהרשומות בזמן הסריקה.
+    profile_cache - ProfileCache של userid, מונים וביו (ראו options.profile_max_age).
+    rag - RagPreprocessor שמכין מהפוסטים chunks לחיפוש ול-embeddings באצוות, בזמן הסריקה.
+    metrics_file - קובץ JSONL למדידות הריצה (ברירת מחדל: metrics_{זמן התחלה}.jsonl ב-output_root);
+    progress - שורת התקדמות חיה ב-stderr.
+    Ctrl+C עוצר את כל ה-workers אחרי הפוסט הנוכחי, וכל פרופיל שנקטע ימשיך מה-checkpoint שלו בריצה הבאה.
+    """
+    options = options or ScanOptions()
+    os.makedirs(output_root, exist_ok=True)
+    if accounts is None:
+        accounts = [(login_username, session_file)] if login_username else []
+
+    started_at = datetime.now()
+    metrics_file = metrics_file or os.path.join(output_root, f"metrics_{started_at:%Y%m%d_%H%M%S}.jsonl")
+    metrics = MetricsRecorder(metrics_file)
+    sessions = SessionPool(accounts, rate_state_file, cache)
+    stop_event = threading.Event()
+    media = MediaPipeline(workers=media_workers, max_queue=media_queue, store=media_store, postprocess=postprocess)
+    records_sink = combine_sinks(sink, tag_index, rag)
+
+    def _scan_one(username):
+        output_dir = os.path.join(output_root, username)
+        if stop_event.is_set():
+            return {"username": username, "output_dir": output_dir, "status": "interrupted", "duration_sec": 0}
+        return scan_with_sessions(sessions, username, output_dir, options, stop_event, media, metrics, records_sink,
+                                  profile_cache)
+
+    started = time.monotonic()
+    results = []
+    interrupted = False
+    if progress:
+        metrics.start_progress(len(usernames))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+    try:
+        futures = [pool.submit(_scan_one, username) for username in usernames]
+        for future in as_completed(futures):
+            results.append(future.result())
+    except KeyboardInterrupt:
+        print("\n⚠️  עוצר את ה-workers ושומר checkpoints...", flush=True)
+        interrupted = True
+        stop_event.set()
+        pool.shutdown(wait=True)
+        results = [future.result() for future in futures]
+    finally:
+        pool.shutdown(wait=True)
+        media.close()
+        sessions.close()
+        metrics.close()
+        if records_sink is not None:
+            records_sink.close()
+
+    for entry in results:
+        entry["media"] = media.stats(entry["username"])
+
+    order = {username: index for index, username in enumerate(usernames)}
+    results.sort(key=lambda entry: order[entry["username"]])
+    report = {
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.now().isoformat(),
+        "duration_sec": round(time.monotonic() - started, 2),
+        "interrupted": interrupted,
+        "workers": workers,
+        "accounts": sessions.usernames(),
+        "total_profiles": len(usernames),
+        "succeeded": sum(1 for entry in results if entry["status"] == "ok"),
+        "failed": sum(1 for entry in results if entry["status"] != "ok"),
+        "media": media.stats(),
+        # בקשות get_comments() שנחסכו בזכות התגובות שכבר הגיעו עם הפוסטים
+        "comment_requests_saved": sum(entry.get("stats", {}).get("comments", {}).get("requests_saved", 0)
+                                      for entry in results),
+        "media_errors": media.errors,
+        # בקשות לאינסטגרם, זמן המתנה ואירועי חסימה של כל החשבונות בתהליך הזה
+        "rate": sessions.rate_totals(),
+        "sessions": sessions.report(),
+        "cache": cache.stats() if cache is not None else None,
+        "media_store": media_store.stats() if media_store is not None else None,
+        "postprocess": postprocess.stats() if postprocess is not None else None,
+        "sink": sink.stats() if sink is not None else None,
+        "tag_index": tag_index.stats() if tag_index is not None else None,
+        "profile_cache": profile_cache.stats() if profile_cache is not None else None,
+        "rag": rag.stats() if rag is not None else None,
+        # זמנים לכל שלב, מונים (בקשות, בתים, ניסיונות חוזרים, שגיאות) והפרופילים האיטיים ביותר
+        "metrics": metrics.summary(),
+        "metrics_file": metrics_file,
+        "profiles": results,
+    }
+    report_file = os.path.join(output_root, "run_report.json")
+    write_json_atomic(report_file, report, indent=2)
+    report["report_file"] = report_file
+    return report
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+הורדת מדיה לפי דרישה לפרופיל שנסרק במצב metadata_only
+ההורדות מתוכננות כבר ברשומות (kind, url, file), כך שכל עוד הכתובות לא פגו - ההורדה הולכת ישר ל-CDN
+בלי אף בקשה לאינסטגרם. כתובת שפגה (או שה-CDN דוחה) מתחדשת מנתוני הפוסט / פריט הסטורי ומורדת שוב.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import instaloader
+
+from .media import MediaJob, MediaPipeline, post_media_jobs, storyitem_media_jobs, url_expiry
+from .stream import iter_records, list_record_files
+
+# כתובת שתפוג בעוד פחות מזה מתחדשת מראש, כדי שלא תפוג באמצע התור
+REFRESH_MARGIN = timedelta(minutes=10)
+MEDIA_RECORD_TYPES = ("post", "story_item", "highlight_item")
+
+
+def find_media_records(output_dir, shortcodes=None):
+    """הרשומה העדכנית ביותר לכל shortcode (פוסטים, פריטי סטורי והיילייט); shortcodes=None - כולם"""
+    wanted = set(shortcodes) if shortcodes else None
+    found = {}
+    for path in list_record_files(output_dir):
+        for record in iter_records(path):
+            shortcode = record.get("shortcode")
+            if record.get("type") in MEDIA_RECORD_TYPES and shortcode and (wanted is None or shortcode in wanted):
+                found[shortcode] = record
+    return found
+
+
+def record_media_jobs(record):
+    """MediaJob לכל קובץ שמתואר ברשומה (לפי הכתובות שנשמרו בה)"""
+    mtime = datetime.fromisoformat(record["date"]) if record.get("date") else None
+    ref = record["shortcode"] if record["type"] == "post" else str(record.get("id"))
+    return [MediaJob(media["url"], os.path.splitext(media["file"])[0], mtime, record.get("username"), media["kind"],
+                     ref)
+            for media in record.get("media", []) if media.get("url")]
+
+
+def _refreshed_jobs(L, record):
+    """משימות עם כתובות טריות, מבקשה אחת לאינסטגרם לפוסט או לפריט"""
+    username = record.get("username")
+    files = [media["file"] for media in record.get("media", [])]
+    target_dir = os.path.dirname(files[0]) if files else "."
+    if record["type"] == "post":
+        post = instaloader.Post.from_shortcode(L.context, record["shortcode"])
+        return post_media_jobs(post, target_dir, username)
+    item = instaloader.StoryItem.from_mediaid(L.context, int(record["id"]))
+    owner = item._node.get("owner") or {}
+    if owner.get("username"):
+        # בעל הפריט מתוך אותה תשובה - אחרת instaloader שולף את הפרופיל שלו בבקשה נוספת
+        item = instaloader.StoryItem(L.context, item._node, instaloader.Profile(L.context, owner))
+    return storyitem_media_jobs(item, target_dir, username)
+
+
+def _expiring(jobs, now):
+    return any((url_expiry(job.url) or datetime.max) < now + REFRESH_MARGIN for job in jobs)
+
+
+def fetch_media(L, output_dir, shortcodes=None, media=None, media_workers=4, store=None):
+    """
+    מוריד את המדיה של shortcodes (None - כל מה שעוד לא ירד) מתוך הרשומות של output_dir.
+    L - Instaloader לחידוש כתובות שפגו (פריטי סטורי והיילייט דורשים התחברות); None - בלי חידוש.
+    store - MediaStore; קבצים שכבר במאגר לא יורדים שוב.
+    יש להריץ מאותה תיקיית עבודה של הסריקה, כי נתיבי הקבצים ברשומות יחסיים אליה.
+    """
+    records = find_media_records(output_dir, shortcodes)
+    stats = {"requested": len(shortcodes) if shortcodes else len(records), "found": len(records), "complete": 0,
+             "queued": 0, "refreshed": 0, "expired": 0, "failed": 0, "missing": []}
+    if shortcodes:
+        stats["missing"] = sorted(set(shortcodes) - set(records))
+
+    own_media = media is None
+    media = MediaPipeline(workers=media_workers, store=store) if own_media else media
+    pending = {}
+    try:
+        now = datetime.now()
+        for shortcode, record in records.items():
+            jobs = [job for job in record_media_jobs(record) if not os.path.isfile(job.filename)]
+            if not jobs:
+                stats["complete"] += 1
+                continue
+            if _expiring(jobs, now):
+                jobs = _refresh(L, record, stats)
+                if jobs is None:
+                    continue
+            pending[shortcode] = (record, jobs)
+            media.submit_all(jobs)
+            stats["queued"] += len(jobs)
+        for owner in {record.get("username") for record, _ in pending.values()}:
+            media.wait(owner)
+
+        # ה-CDN דחה כתובת שנראתה בתוקף - ניסיון אחד נוסף עם כתובות טריות
+        retry = {}
+        for shortcode, (record, jobs) in pending.items():
+            if all(os.path.isfile(job.filename) for job in jobs):
+                continue
+            refreshed = _refresh(L, record, stats)
+            if refreshed is not None:
+                retry[shortcode] = refreshed
+                media.submit_all(refreshed)
+        for owner in {records[shortcode].get("username") for shortcode in retry}:
+            media.wait(owner)
+        stats["failed"] = sum(1 for shortcode, (_, jobs) in pending.items()
+                              if not all(os.path.isfile(job.filename) for job in retry.get(shortcode, jobs)))
+    finally:
+        if own_media:
+            media.close()
+    stats["media"] = media.stats()
+    return stats
+
+
+def _refresh(L, record, stats):
+    if L is None:
+        stats["expired"] += 1
+        return None
+    try:
+        jobs = _refreshed_jobs(L, record)
+    except instaloader.exceptions.InstaloaderException as e:
+        print(f"⚠️  לא ניתן לחדש את הכתובות של {record.get('shortcode')}: {str(e)}", flush=True)
+        stats["expired"] += 1
+        return None
+    stats["refreshed"] += 1
+    return [job for job in jobs if not os.path.isfile(job.filename)]
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+סנכרון היילייטס לפי הפרשים (delta) מול אינדקס שנשמר בתיקיית הפרופיל
+לכל היילייט נשמרים ה-IDs של הפריטים שכבר נאספו, השם והתיקייה שלו וסימן "שונה לאחרונה" (אם אינסטגרם מחזירה כזה).
+סריקה חוזרת: בקשה אחת לרשימת ההיילייטס, בקשה אחת לפריטים של כל ההיילייטס שאולי השתנו,
+ובקשת reels_media אחת לכתובות באיכות מלאה - רק אם יש פריטים חדשים. רק הפריטים החדשים יורדים.
+היילייט ששמו השתנה (התיקייה נקראת לפי השם) מזוהה לפי ה-ID שלו, והתיקייה הקיימת עוברת לשם החדש.
+"""
+
+import json
+import os
+from datetime import datetime
+
+import instaloader
+
+from .checkpoint import write_json_atomic
+from .media import storyitem_media_jobs, storyitem_media_plan
+from .stream import story_item_info
+
+HIGHLIGHT_INDEX = ".highlights_index.json"
+HIGHLIGHT_ITEMS_QUERY_HASH = "45246d3fe16ccc6577e0bd297a5db1ab"
+HIGHLIGHTS_PER_QUERY = 20
+
+
+def highlight_marker(highlight):
+    """סימן "שונה לאחרונה" מתוך רשימת ההיילייטס, אם יש; None - צריך לבדוק את רשימת הפריטים"""
+    node = highlight._node
+    for key in ("latest_reel_media", "media_count"):
+        if node.get(key) is not None:
+            return node[key]
+    return None
+
+
+def _folder_name(title):
+    return title.replace("/", "_").strip() or "untitled"
+
+
+def _chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+class HighlightIndex:
+    """
+    האינדקס של פרופיל אחד: highlight_id -> {title, folder, marker, item_ids, updated_at, removed}
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, HIGHLIGHT_INDEX)
+        self.highlights = {}
+        if os.path.isfile(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.highlights = json.load(f).get("highlights", {})
+
+    def save(self):
+        write_json_atomic(self.path, {"highlights": self.highlights, "saved_at": datetime.now().isoformat()})
+
+    def entry(self, highlight_id):
+        return self.highlights.get(str(highlight_id))
+
+    def folder_for(self, highlight):
+        """התיקייה של ההיילייט; אם השם השתנה מאז הסריקה הקודמת - מעביר את התיקייה הקיימת לשם החדש"""
+        entry = self.highlights.setdefault(str(highlight.unique_id), {"item_ids": []})
+        folder = _folder_name(highlight.title)
+        previous = entry.get("folder")
+        renamed = previous is not None and previous != folder
+        if renamed:
+            old_path = os.path.join(self.output_dir, "highlights", previous)
+            new_path = os.path.join(self.output_dir, "highlights", folder)
+            if os.path.isdir(old_path) and not os.path.exists(new_path):
+                os.rename(old_path, new_path)
+            entry.setdefault("previous_titles", []).append(entry.get("title"))
+        entry.update(title=highlight.title, folder=folder)
+        return os.path.join(self.output_dir, "highlights", folder), renamed
+
+    def mark_removed(self, current_ids):
+        """היילייטס שנמחקו מהפרופיל נשארים באינדקס (והקבצים בדיסק) עם removed=True"""
+        removed = 0
+        for highlight_id, entry in self.highlights.items():
+            if highlight_id not in current_ids and not entry.get("removed"):
+                entry["removed"] = True
+                removed += 1
+        return removed
+
+
+def _fetch_items(context, highlights):
+    """הפריטים של כמה היילייטס בבקשת GraphQL אחת (במקום בקשה לכל היילייט ב-get_items())"""
+    by_id = {str(highlight.unique_id): highlight for highlight in highlights}
+    requests = 0
+    for chunk in _chunks(list(by_id), HIGHLIGHTS_PER_QUERY):
+        data = context.graphql_query(HIGHLIGHT_ITEMS_QUERY_HASH,
+                                     {"reel_ids": [], "tag_names": [], "location_ids": [],
+                                      "highlight_reel_ids": chunk, "precomposed_overlay": False})
+        requests += 1
+        for reel in data["data"]["reels_media"]:
+            highlight = by_id.get(str(reel["id"]).replace("highlight:", ""))
+            if highlight is not None:
+                highlight._items = reel["items"]
+    for highlight in highlights:
+        if highlight._items is None:
+            highlight._items = []
+    return requests
+
+
+def _fetch_iphone_structs(context, highlights):
+    """הכתובות באיכות מלאה לכל ההיילייטס שהשתנו בבקשת reels_media אחת"""
+    if not (context.iphone_support and context.is_logged_in) or not highlights:
+        return 0
+    reel_ids = [f"highlight:{highlight.unique_id}" for highlight in highlights]
+    try:
+        reels = context.get_iphone_json("api/v1/feed/reels_media/", {"reel_ids": ",".join(reel_ids)}).get("reels", {})
+    except instaloader.exceptions.ConnectionException:
+        reels = {}
+    for highlight, reel_id in zip(highlights, reel_ids):
+        # מבנה ריק ולא None - אחרת get_items() יבקש אותו שוב לכל היילייט
+        highlight._iphone_struct_ = reels.get(reel_id) or {"items": []}
+    return 1
+
+
+def sync_highlights(L, profile, username, output_dir, media, stream, on_error=None, metadata_only=False):
+    """
+    מוריד רק את פריטי ההיילייט שלא נאספו בסריקות קודמות וכותב להם רשומות highlight_item.
+    on_error(message) נקרא על פריט שנכשל; הסנכרון ממשיך לפריט הבא.
+    metadata_only - ההורדות רק נרשמות ברשומות ולא נכנסות לתור. אחרת פריט נרשם באינדקס רק אחרי שכל הקבצים
+    שלו ירדו (ממתינים להורדות של כל היילייט), כך שפריט שההורדה שלו נכשלה ברקע ינוסה שוב בסריקה הבאה.
+    מחזיר (סטטיסטיקות, קבצי מדיה שנכנסו לתור).
+    """
+    index = HighlightIndex(output_dir)
+    highlights = list(L.get_highlights(profile))
+    stats = {"total": len(highlights), "unchanged": 0, "changed": 0, "renamed": 0, "removed": 0,
+             "new_items": 0, "requests": 1}
+    media_queued = 0
+
+    # היילייט עם סימן שלא השתנה (ואותו שם) - לא צריך אפילו את רשימת הפריטים שלו
+    candidates = []
+    for highlight in highlights:
+        entry = index.entry(highlight.unique_id)
+        marker = highlight_marker(highlight)
+        if (entry is not None and marker is not None and entry.get("marker") == marker
+                and entry.get("title") == highlight.title and not entry.get("removed")):
+            stats["unchanged"] += 1
+        else:
+            candidates.append(highlight)
+    stats["requests"] += _fetch_items(L.context, candidates)
+
+    changed = []
+    for highlight in candidates:
+        entry = index.entry(highlight.unique_id) or {}
+        known = set(entry.get("item_ids", []))
+        new_ids = [str(item["id"]) for item in highlight._items if str(item["id"]) not in known]
+        if new_ids:
+            changed.append((highlight, set(new_ids)))
+        elif entry and entry.get("title") == highlight.title and not entry.get("removed"):
+            stats["unchanged"] += 1
+        # גם היילייט בלי פריטים חדשים מקבל את השם העדכני
+        _, renamed = index.folder_for(highlight)
+        stats["renamed"] += int(renamed)
+        index.entry(highlight.unique_id)["removed"] = False
+        if not new_ids:
+            index.entry(highlight.unique_id)["marker"] = highlight_marker(highlight)
+    stats["requests"] += _fetch_iphone_structs(L.context, [highlight for highlight, _ in changed])
+
+    for highlight, new_ids in changed:
+        stats["changed"] += 1
+        target_dir, _ = index.folder_for(highlight)
+        entry = index.entry(highlight.unique_id)
+        item_ids = entry["item_ids"]
+        failed = 0
+        errors_before = len(media.errors)
+        # פריט -> הקבצים שלו שנכנסו לתור
+        submitted = {}
+        for item in highlight.get_items():
+            if str(item.mediaid) not in new_ids:
+                continue
+            try:
+                if metadata_only:
+                    jobs = storyitem_media_plan(item, target_dir, username)
+                else:
+                    jobs = storyitem_media_jobs(item, target_dir, username)
+                    media.submit_all(jobs)
+                media_queued += len(jobs)
+                stream.write({"type": "highlight_item", "username": username,
+                              "highlight_id": highlight.unique_id, "highlight_title": highlight.title,
+                              **story_item_info(item), "media": [job.describe() for job in jobs]})
+                if metadata_only:
+                    item_ids.append(str(item.mediaid))
+                else:
+                    submitted[str(item.mediaid)] = {job.filename for job in jobs}
+                stats["new_items"] += 1
+            except Exception as e:
+                failed += 1
+                if on_error is not None:
+                    on_error(f"שגיאה בהורדת פריט היילייט: {str(e)}")
+        if submitted:
+            media.wait(username)
+            failed_files = {error["file"] for error in media.errors[errors_before:]}
+            for item_id, files in submitted.items():
+                if files & failed_files:
+                    failed += 1
+                    if on_error is not None:
+                        on_error(f"הורדת פריט היילייט {item_id} נכשלה, ינוסה שוב בסריקה הבאה")
+                else:
+                    item_ids.append(item_id)
+        # הסימן נשמר רק אחרי שכל הפריטים נאספו, אחרת הסריקה הבאה תדלג על אלה שנכשלו
+        entry.update(marker=highlight_marker(highlight) if not failed else None,
+                     updated_at=datetime.now().isoformat())
+        # נשמר אחרי כל היילייט: סריקה שקורסת באמצע לא תכתוב ותוריד שוב פריטים שכבר נרשמו ב-stream
+        index.save()
+
+    stats["removed"] = index.mark_removed({str(highlight.unique_id) for highlight in highlights})
+    index.save()
+    return stats, media_queued
+
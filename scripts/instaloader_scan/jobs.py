@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+תור משימות סריקה בטבלת SQLite מקומית, שכמה תהליכי worker מושכים ממנו במקביל
+משימה נלקחת בטרנזקציה BEGIN IMMEDIATE (נעילת כתיבה על כל הקובץ), כך ששני workers אף פעם לא מקבלים אותה משימה.
+worker שלקח משימה מחזיק בה lease שמתחדש כל עוד הוא חי; משימה שה-lease שלה פג (worker שקרס) חוזרת לתור.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+JOBS_DB = "instaloader_jobs.db"
+JOB_STATUSES = ("queued", "running", "done", "failed")
+LEASE_SECONDS = 5 * 60.0
+# המתנה לפני ניסיון חוזר של משימה שנכשלה בשגיאת חיבור, כפול מספר הניסיונות
+RETRY_DELAY = 10 * 60.0
+# כל פרופיל שייך ל-bucket קבוע לפי hash של השם; ה-coordinator מחלק buckets בין ה-nodes,
+# וכך claim של node מסנן ב-SQL בלי לעבור על כל התור
+JOB_BUCKETS = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    bucket INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    priority INTEGER NOT NULL DEFAULT 0,
+    options TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    lease_until REAL,
+    not_before REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS scan_jobs_claim ON scan_jobs (status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS scan_jobs_username ON scan_jobs (username, status);
+CREATE TABLE IF NOT EXISTS scan_workers (
+    id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    started_at REAL,
+    last_seen REAL,
+    status TEXT,
+    current_jobs TEXT,
+    jobs_done INTEGER NOT NULL DEFAULT 0,
+    jobs_failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def new_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def job_bucket(username):
+    return int.from_bytes(hashlib.md5(username.lower().encode('utf-8')).digest()[:8], "big") % JOB_BUCKETS
+
+
+def _row(row):
+    job = dict(row)
+    for key in ("options", "result"):
+        if job.get(key):
+            job[key] = json.loads(job[key])
+    return job
+
+
+class JobQueue:
+    """
+    תור המשימות. חיבור SQLite נפרד לכל thread; כל הפעולות אטומיות גם בין תהליכים.
+    """
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """קובץ תור מלפני ה-buckets: מוסיף את העמודה וממלא אותה למשימות הקיימות"""
+        def has_bucket():
+            return any(row["name"] == "bucket" for row in self._db().execute("PRAGMA table_info(scan_jobs)"))
+
+        if has_bucket():
+            return
+        db = self._transaction()
+        try:
+            # תהליך אחר אולי הספיק לעדכן בין הבדיקה לנעילה
+            if not has_bucket():
+                db.execute("ALTER TABLE scan_jobs ADD COLUMN bucket INTEGER NOT NULL DEFAULT 0")
+                rows = db.execute("SELECT id, username FROM scan_jobs").fetchall()
+                db.executemany("UPDATE scan_jobs SET bucket = ? WHERE id = ?",
+                               [(job_bucket(row["username"]), row["id"]) for row in rows])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return self._local.db
+
+    def _transaction(self):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        return db
+
+    # --- הוספה ---
+
+    def enqueue(self, usernames, priority=0, options=None, max_attempts=3):
+        """מוסיף משימה לכל שם משתמש שאין לו כבר משימה ממתינה או רצה; מחזיר את מספר המשימות שנוספו"""
+        db = self._transaction()
+        try:
+            added = 0
+            now = time.time()
+            for username in usernames:
+                active = db.execute("SELECT 1 FROM scan_jobs WHERE username = ? AND status IN ('queued', 'running')",
+                                    (username,)).fetchone()
+                if active:
+                    continue
+                db.execute("INSERT INTO scan_jobs (username, bucket, priority, options, max_attempts, created_at) "
+                           "VALUES (?, ?, ?, ?, ?, ?)",
+                           (username, job_bucket(username), priority, json.dumps(options) if options else None,
+                            max_attempts, now))
+                added += 1
+            db.execute("COMMIT")
+            return added
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    # --- מחזור החיים של משימה ---
+
+    def claim(self, worker_id, lease_seconds=LEASE_SECONDS, buckets=None):
+        """
+        לוקח את המשימה הבאה (לפי עדיפות ואז לפי סדר הוספה), כולל משימות של workers שה-lease שלהם פג.
+        buckets - רק משימות מה-buckets האלה (הפרופילים שה-node הזה אחראי עליהם); רשימה ריקה - אף משימה.
+        """
+        if buckets is not None and not buckets:
+            return None
+        in_buckets = "" if buckets is None else f" AND bucket IN ({','.join('?' * len(buckets))})"
+        db = self._transaction()
+        try:
+            now = time.time()
+            row = db.execute(
+                "SELECT id FROM scan_jobs "
+                "WHERE ((status = 'queued' AND not_before <= ?) OR (status = 'running' AND lease_until < ?))"
+                + in_buckets + " ORDER BY priority DESC, id LIMIT 1", (now, now, *(buckets or ()))).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE scan_jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                       "lease_until = ?, started_at = ?, error = NULL WHERE id = ?",
+                       (worker_id, now + lease_seconds, now, row["id"]))
+            job = db.execute("SELECT * FROM scan_jobs WHERE id = ?", (row["id"],)).fetchone()
+            db.execute("COMMIT")
+            return _row(job)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def extend(self, job_ids, worker_id, lease_seconds=LEASE_SECONDS):
+        """מחדש את ה-lease של המשימות שה-worker עדיין מחזיק"""
+        if not job_ids:
+            return
+        placeholders = ",".join("?" * len(job_ids))
+        self._db().execute(f"UPDATE scan_jobs SET lease_until = ? WHERE worker = ? AND status = 'running' "
+                           f"AND id IN ({placeholders})", (time.time() + lease_seconds, worker_id, *job_ids))
+
+    def _finish(self, job_id, worker_id, status, error=None, result=None, not_before=0.0, refund=False):
+        cursor = self._db().execute(
+            "UPDATE scan_jobs SET status = ?, error = ?, result = ?, finished_at = ?, lease_until = NULL, "
+            "not_before = ?, attempts = attempts - ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (status, error, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+             time.time() if status in ("done", "failed") else None, not_before, 1 if refund else 0,
+             job_id, worker_id))
+        # 0 - ה-lease פג ומשימה נלקחה בינתיים על ידי worker אחר
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        return self._finish(job_id, worker_id, "done", result=result)
+
+    def fail(self, job_id, worker_id, error, retry=False, result=None):
+        """משימה שנכשלה חוזרת לתור אחרי המתנה אם retry ונשארו ניסיונות, ואחרת מסומנת failed"""
+        job = self.get(job_id)
+        if retry and job is not None and job["attempts"] < job["max_attempts"]:
+            return self._finish(job_id, worker_id, "queued", error, result,
+                                not_before=time.time() + RETRY_DELAY * job["attempts"])
+        return self._finish(job_id, worker_id, "failed", error, result)
+
+    def release(self, job_id, worker_id, reason="interrupted"):
+        """מחזיר משימה שנקטעה לתור בלי לספור את הניסיון; הסריקה תמשיך מה-checkpoint"""
+        return self._finish(job_id, worker_id, "queued", reason, refund=True)
+
+    def release_worker(self, worker_id, reason):
+        """מחזיר לתור את כל המשימות שרצות על worker שאבד, בלי לספור את הניסיון; מחזיר כמה משימות חזרו"""
+        cursor = self._db().execute(
+            "UPDATE scan_jobs SET status = 'queued', error = ?, lease_until = NULL, attempts = attempts - 1 "
+            "WHERE worker = ? AND status = 'running'", (reason, worker_id))
+        return cursor.rowcount
+
+    # --- מצב ---
+
+    def get(self, job_id):
+        row = self._db().execute("SELECT * FROM scan_jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row(row) if row else None
+
+    def jobs(self, status=None, limit=50):
+        if status:
+            rows = self._db().execute("SELECT * FROM scan_jobs WHERE status = ? ORDER BY id DESC LIMIT ?",
+                                      (status, limit))
+        else:
+            rows = self._db().execute("SELECT * FROM scan_jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return [_row(row) for row in rows]
+
+    def counts(self):
+        counts = {status: 0 for status in JOB_STATUSES}
+        for row in self._db().execute("SELECT status, COUNT(*) AS n FROM scan_jobs GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return counts
+
+    def bucket_counts(self, status="queued"):
+        """כמה משימות בכל bucket"""
+        return {row["bucket"]: row["n"] for row in self._db().execute(
+            "SELECT bucket, COUNT(*) AS n FROM scan_jobs WHERE status = ? GROUP BY bucket", (status,))}
+
+    def has_pending(self):
+        """יש משימות ממתינות או רצות (כולל כאלה שממתינות לניסיון חוזר)"""
+        return self._db().execute(
+            "SELECT 1 FROM scan_jobs WHERE status IN ('queued', 'running') LIMIT 1").fetchone() is not None
+
+    def heartbeat(self, worker_id, status, current_jobs, done=0, failed=0):
+        """מעדכן את שורת ה-worker בטבלת scan_workers"""
+        now = time.time()
+        self._db().execute(
+            "INSERT INTO scan_workers (id, host, pid, started_at, last_seen, status, current_jobs, jobs_done, "
+            "jobs_failed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET last_seen = excluded.last_seen, status = excluded.status, "
+            "current_jobs = excluded.current_jobs, jobs_done = excluded.jobs_done, jobs_failed = excluded.jobs_failed",
+            (worker_id, socket.gethostname(), os.getpid(), now, now, status, json.dumps(current_jobs), done, failed))
+
+    def workers(self):
+        rows = self._db().execute("SELECT * FROM scan_workers ORDER BY last_seen DESC")
+        return [{**dict(row), "current_jobs": json.loads(row["current_jobs"] or "[]")} for row in rows]
+
+    def close(self):
+        if hasattr(self._local, "db"):
+            self._local.db.close()
+            del self._local.db
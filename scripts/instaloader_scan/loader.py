@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+בניית מופעי Instaloader וטעינת sessions שמורים - ללא שום קלט אינטראקטיבי
+"""
+
+import instaloader
+
+SESSION_FILE = "instaloader_session"
+
+
+def build_loader(rate_controller=None, quiet=True):
+    """יוצר Instaloader עם ההגדרות של סקריפטי הבדיקה; התיקייה נקבעת לפי ה-target של כל הורדה"""
+    return instaloader.Instaloader(
+        quiet=quiet,
+        download_videos=True,
+        download_video_thumbnails=True,
+        download_geotags=True,
+        download_comments=True,
+        save_metadata=True,
+        compress_json=False,
+        post_metadata_txt_pattern='',
+        max_connection_attempts=3,
+        dirname_pattern="{target}",
+        request_timeout=300,
+        rate_controller=rate_controller,
+    )
+
+
+def load_session(L, username, session_file=SESSION_FILE):
+    """טוען session קיים מקובץ. מחזיר False במקום לבקש סיסמה כשאין session תקין"""
+    try:
+        L.load_session_from_file(username, filename=session_file)
+        return True
+    except FileNotFoundError:
+        print(f"⚠️  לא נמצא session עבור {username} ב-{session_file}")
+    except Exception as e:
+        print(f"⚠️  לא ניתן לטעון session עבור {username}: {str(e)}")
+    return False
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""
+הורדת מדיה (תמונות וסרטונים) במקביל לאיסוף ה-metadata
+הסריקה רק מייצרת משימות הורדה ומכניסה אותן לתור; מאגר workers מוריד אותן עם session קבוע לכל worker.
+התור מוגבל בגודלו, כך שסריקה מהירה נחסמת עד שה-workers מדביקים את הקצב.
+"""
+
+import os
+import queue
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+import requests
+from instaloader.instaloadercontext import default_user_agent
+
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 256 * 1024
+# קוד שגיאה שלא שווה ניסיון חוזר (לרוב חתימת URL שפגה)
+PERMANENT_STATUS_CODES = (403, 404, 410)
+
+
+class MediaUnavailable(Exception):
+    """ה-CDN דחה את ה-URL; ניסיון חוזר לא יעזור"""
+
+
+@dataclass
+class MediaJob:
+    url: str
+    # נתיב הקובץ בלי סיומת; הסיומת נלקחת מה-URL
+    path: str
+    mtime: datetime = None
+    # שם המשתמש שהמדיה שייכת לו, לסטטיסטיקות
+    owner: str = None
+    kind: str = "image"
+    # shortcode של הפוסט או ID של פריט הסטורי - המפתח של הקובץ ב-manifest של MediaStore
+    ref: str = None
+
+    @property
+    def filename(self):
+        extension = os.path.splitext(urllib.parse.urlparse(self.url).path)[1].lstrip('.').lower()
+        if not extension:
+            extension = "mp4" if self.kind == "video" else "jpg"
+        return f"{self.path}.{extension}"
+
+    def describe(self):
+        """תיאור המשימה לשמירה ברשומה - מאפשר להוריד את הקובץ מחדש בלי לסרוק שוב"""
+        return {"kind": self.kind, "url": self.url, "file": self.filename}
+
+
+def _timestamp_name(date_utc):
+    """שם קובץ בתבנית ברירת המחדל של instaloader: {date_utc}_UTC"""
+    return date_utc.strftime('%Y-%m-%d_%H-%M-%S') + "_UTC"
+
+
+def post_media_jobs(post, target_dir, owner=None):
+    """משימות ההורדה של פוסט - תמונה, סרטון ותמונות/סרטונים של קרוסלה - מתוך ה-metadata שכבר נטען"""
+    base = os.path.join(target_dir, _timestamp_name(post.date_utc))
+    if post.typename == 'GraphSidecar':
+        jobs = []
+        for index, node in enumerate(post.get_sidecar_nodes(), start=1):
+            jobs.append(MediaJob(node.display_url, f"{base}_{index}", post.date_local, owner, "image", post.shortcode))
+            if node.is_video and node.video_url:
+                jobs.append(MediaJob(node.video_url, f"{base}_{index}", post.date_local, owner, "video",
+                                     post.shortcode))
+        return jobs
+    jobs = [MediaJob(post.url, base, post.date_local, owner, "image", post.shortcode)]
+    if post.is_video and post.video_url:
+        jobs.append(MediaJob(post.video_url, base, post.date_local, owner, "video", post.shortcode))
+    return jobs
+
+
+def storyitem_media_jobs(item, target_dir, owner=None):
+    """משימות ההורדה של פריט סטורי או היילייט"""
+    base = os.path.join(target_dir, _timestamp_name(item.date_utc))
+    jobs = [MediaJob(item.url, base, item.date_local, owner, "image", str(item.mediaid))]
+    if item.is_video:
+        video_url = item.video_url
+        if video_url:
+            jobs.append(MediaJob(video_url, base, item.date_local, owner, "video", str(item.mediaid)))
+    return jobs
+
+
+def url_expiry(url):
+    """מתי פגה החתימה של כתובת CDN (הפרמטר oe, זמן unix בהקסדצימלי); None אם אין כזה"""
+    expiry = urllib.parse.parse_qs(urllib.parse.urlparse(url).query).get("oe")
+    try:
+        return datetime.fromtimestamp(int(expiry[0], 16)) if expiry else None
+    except ValueError:
+        return None
+
+
+def _node_dimensions(node):
+    if node.get("dimensions"):
+        return {"width": node["dimensions"].get("width"), "height": node["dimensions"].get("height")}
+    if node.get("original_width"):
+        return {"width": node["original_width"], "height": node.get("original_height")}
+    candidates = (node.get("image_versions2") or {}).get("candidates") or []
+    if candidates and candidates[0].get("width"):
+        return {"width": candidates[0]["width"], "height": candidates[0].get("height")}
+    return None
+
+
+def post_media_info(post):
+    """
+    תיאור המדיה של פוסט מתוך הנתונים שכבר נטענו: סוג, מידות, אורך וידאו ומבנה הקרוסלה - בלי אף בקשה.
+    expires_at - מתי פגות הכתובות שנשמרו ברשומה (עד אז fetch_media יכול להוריד בלי לפנות לאינסטגרם).
+    """
+    node = post._node
+    # פוסטים מהפיד המחובר נבנים מה-API של האייפון, והמבנה המקורי נשמר ב-iphone_struct
+    iphone = node.get("iphone_struct") or {}
+    expires_at = url_expiry(node.get("display_url") or node.get("display_src") or "")
+    info = {
+        "typename": node.get("__typename"),
+        "is_video": bool(node.get("is_video")),
+        "dimensions": _node_dimensions(node) or _node_dimensions(iphone),
+        "video_duration": node.get("video_duration"),
+        "expires_at": expires_at.isoformat() if expires_at else None,
+    }
+    if node.get("__typename") == "GraphSidecar":
+        edges = (node.get("edge_sidecar_to_children") or {}).get("edges") or []
+        carousel = node.get("carousel_media") or iphone.get("carousel_media") or []
+        info["items"] = [{
+            "is_video": bool(edge["node"].get("is_video")),
+            "dimensions": _node_dimensions(edge["node"]) or (_node_dimensions(carousel[index])
+                                                               if index < len(carousel) else None),
+        } for index, edge in enumerate(edges)]
+    return info
+
+
+def post_media_plan(post, target_dir, owner=None):
+    """
+    אותן משימות כמו post_media_jobs, רק מתוך ה-URLs שכבר ברשימת הפוסטים: בלי ה-iphone struct
+    ובלי בקשות HEAD לבחירת גרסת הווידאו. למצב metadata_only - המשימות נשמרות ברשומה ולא יורדות.
+    """
+    node = post._node
+    base = os.path.join(target_dir, _timestamp_name(post.date_utc))
+    if node.get("__typename") == 'GraphSidecar':
+        jobs = []
+        edges = (node.get("edge_sidecar_to_children") or {}).get("edges") or []
+        for index, edge in enumerate(edges, start=1):
+            child = edge["node"]
+            jobs.append(MediaJob(child.get("display_url"), f"{base}_{index}", post.date_local, owner, "image",
+                                 post.shortcode))
+            if child.get("is_video") and child.get("video_url"):
+                jobs.append(MediaJob(child["video_url"], f"{base}_{index}", post.date_local, owner, "video",
+                                     post.shortcode))
+        return jobs
+    jobs = [MediaJob(node.get("display_url") or node.get("display_src"), base, post.date_local, owner, "image",
+                     post.shortcode)]
+    if node.get("is_video") and node.get("video_url"):
+        jobs.append(MediaJob(node["video_url"], base, post.date_local, owner, "video", post.shortcode))
+    return jobs
+
+
+def storyitem_media_plan(item, target_dir, owner=None):
+    """כמו storyitem_media_jobs, בלי בקשות HEAD לבחירת גרסת הווידאו"""
+    base = os.path.join(target_dir, _timestamp_name(item.date_utc))
+    jobs = [MediaJob(item.url, base, item.date_local, owner, "image", str(item.mediaid))]
+    if item.is_video:
+        node = item._node
+        iphone_versions = (node.get("iphone_struct") or {}).get("video_versions") or []
+        resources = node.get("video_resources") or []
+        video_url = iphone_versions[0]["url"] if iphone_versions else (resources[-1]["src"] if resources else None)
+        if video_url:
+            jobs.append(MediaJob(video_url, base, item.date_local, owner, "video", str(item.mediaid)))
+    return jobs
+
+
+class MediaPipeline:
+    """
+    מאגר workers להורדת מדיה.
+    - לכל worker יש requests.Session משלו, כך שחיבורים ל-CDN נשמרים בין קבצים
+    - קובץ שהורדתו נקטעה נשאר כ-.part וממשיך עם Range בהורדה הבאה
+    - submit נחסם כשהתור מלא (max_queue)
+    - עם store (MediaStore) קובץ שכבר במאגר לא יורד שוב, אלא נוצר כ-link ל-blob הקיים
+    - עם postprocess (PostProcessor) כל קובץ שירד ממשיך לעיבוד על מאגר התהליכים שלו, ונסגר יחד עם ה-pipeline
+    - cancel(owner) מוותר על ההורדות של owner שעוד בתור (סריקה שהתקציב שלה נגמר)
+    """
+
+    def __init__(self, workers=4, max_queue=64, request_timeout=300, max_attempts=3, store=None, postprocess=None):
+        self.workers = workers
+        self.store = store
+        self.postprocess = postprocess
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # משימות שעוד לא הסתיימו לכל owner, בשביל wait()
+        self._pending = defaultdict(int)
+        self._cancelled = set()
+        self._done = threading.Condition(self._lock)
+        self._stats = defaultdict(lambda: {
+            "files_downloaded": 0, "bytes_downloaded": 0, "already_existed": 0, "resumed": 0, "failed": 0,
+            "deduplicated": 0, "bytes_saved": 0, "cancelled": 0,
+        })
+        self.errors = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"media-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job):
+        with self._lock:
+            self._pending[job.owner] += 1
+        self._queue.put(job)
+
+    def submit_all(self, jobs):
+        for job in jobs:
+            self.submit(job)
+
+    def close(self):
+        """ממתין שכל המשימות בתור יסתיימו ועוצר את ה-workers"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.postprocess is not None:
+            self.postprocess.close()
+
+    def cancel(self, owner):
+        """
+        ההורדות של owner שעוד ממתינות בתור לא יתבצעו - הן נשארות ברשומות להורדה לפי דרישה (fetch_media).
+        הורדה שכבר התחילה מסתיימת; הביטול חל עד שהתור של owner מתרוקן.
+        """
+        with self._lock:
+            if self._pending[owner]:
+                self._cancelled.add(owner)
+
+    def wait(self, owner, timeout=None):
+        """
+        ממתין שכל ההורדות של owner שכבר נכנסו לתור (והעיבוד שלהן) יסתיימו; False אם עבר timeout.
+        timeout הוא לשני השלבים יחד - העיבוד מקבל רק את מה שנשאר ממנו אחרי ההורדות.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._done:
+            if not self._done.wait_for(lambda: self._pending[owner] == 0, timeout):
+                return False
+        if self.postprocess is not None:
+            return self.postprocess.wait(owner, max(deadline - time.monotonic(), 0.0) if deadline is not None else None)
+        return True
+
+    def stats(self, owner=None):
+        with self._lock:
+            if owner is not None:
+                return dict(self._stats[owner])
+            totals = defaultdict(int)
+            for owner_stats in self._stats.values():
+                for key, value in owner_stats.items():
+                    totals[key] += value
+            return dict(totals)
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            session = requests.Session()
+            session.headers["User-Agent"] = default_user_agent()
+            self._local.session = session
+        return self._local.session
+
+    def _count(self, owner, key, amount=1):
+        with self._lock:
+            self._stats[owner][key] += amount
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            with self._lock:
+                cancelled = job.owner in self._cancelled
+            if cancelled:
+                self._count(job.owner, "cancelled")
+            else:
+                self._run(job)
+            with self._done:
+                self._pending[job.owner] -= 1
+                if not self._pending[job.owner]:
+                    self._cancelled.discard(job.owner)
+                self._done.notify_all()
+        if hasattr(self._local, "session"):
+            self._local.session.close()
+
+    def _run(self, job):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._download(job)
+                return
+            except Exception as e:
+                # ניסיון חוזר ממשיך מה-.part שכבר נכתב
+                if attempt < self.max_attempts and not isinstance(e, MediaUnavailable):
+                    continue
+                self._count(job.owner, "failed")
+                with self._lock:
+                    self.errors.append({"url": job.url, "file": job.filename, "error": str(e)})
+
+    def _download(self, job):
+        filename = job.filename
+        if os.path.isfile(filename):
+            self._count(job.owner, "already_existed")
+            return
+        if self.store is not None:
+            blob = self.store.lookup(job)
+            if blob is not None:
+                self._reuse(job, blob)
+                return
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+        part_path = filename + PART_SUFFIX
+        offset = os.path.getsize(part_path) if os.path.isfile(part_path) else 0
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with self._session().get(job.url, headers=headers, stream=True, timeout=self.request_timeout) as resp:
+            if resp.status_code == 416 and offset:
+                # ה-.part כבר מכיל את כל הקובץ
+                pass
+            elif resp.status_code == 206 and offset:
+                self._count(job.owner, "resumed")
+                self._write(job, resp, part_path, 'ab')
+            elif resp.status_code == 200:
+                blob = self._match_size(job, resp)
+                if blob is not None:
+                    self._reuse(job, blob)
+                    return
+                self._write(job, resp, part_path, 'wb')
+            elif resp.status_code in PERMANENT_STATUS_CODES:
+                raise MediaUnavailable(f"{resp.status_code} {resp.reason} עבור {job.url}")
+            else:
+                raise requests.HTTPError(f"{resp.status_code} {resp.reason} עבור {job.url}")
+
+        os.replace(part_path, filename)
+        if job.mtime is not None:
+            os.utime(filename, (datetime.now().timestamp(), job.mtime.timestamp()))
+        if self.store is not None:
+            self.store.add(job, filename)
+        self._count(job.owner, "files_downloaded")
+        if self.postprocess is not None:
+            self.postprocess.submit(job, filename)
+
+    def _match_size(self, job, resp):
+        # הגוף עוד לא נקרא - אם יש כבר blob באותו גודל לאותו פוסט, החיבור נסגר בלי להעביר את הקובץ
+        if self.store is None or not resp.headers.get("Content-Length", "").isdigit():
+            return None
+        return self.store.match_size(job, int(resp.headers["Content-Length"]))
+
+    def _reuse(self, job, blob):
+        path, size = blob
+        self.store.materialize(path, job.filename)
+        self._count(job.owner, "deduplicated")
+        self._count(job.owner, "bytes_saved", size)
+        if self.postprocess is not None:
+            self.postprocess.submit(job, job.filename)
+
+    def _write(self, job, resp, part_path, mode):
+        with open(part_path, mode) as f:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                self._count(job.owner, "bytes_downloaded", len(chunk))
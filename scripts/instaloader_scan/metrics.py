@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+מדידות מובנות של הסריקה: spans עם זמנים לכל שלב ומונים (בקשות, בתים, ניסיונות חוזרים, שגיאות)
+כל אירוע נכתב כשורת JSON לקובץ המדידות של הריצה, ו-summary() מסכם לפי שלב ולפי פרופיל -
+כך רואים לאן הולך הזמן של הסריקה ואילו פרופילים חריגים.
+השמות של ה-spans: profile, profile_pic, stories, highlights, posts (כל המעבר על הפוסטים), post, comments.
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# spans ברמת השלב, שמסוכמים ל-phase_seconds של כל פרופיל
+PHASES = ("profile", "profile_pic", "stories", "highlights", "posts")
+PROGRESS_INTERVAL = 2.0
+
+
+def _new_span_stats():
+    return {"count": 0, "total_sec": 0.0, "max_sec": 0.0, "errors": 0}
+
+
+class _ProfileMetrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.duration = None
+        self.spans = defaultdict(_new_span_stats)
+        self.counters = defaultdict(int)
+
+
+class MetricsRecorder:
+    """
+    path - קובץ JSONL לאירועים (None - רק סיכום בזיכרון).
+    הפרופיל הנוכחי נקבע לכל thread עם profile(username), וכל span, מונה ובקשה ב-thread מיוחסים אליו.
+    install(context) מחבר את המונים של הבקשות ל-InstaloaderContext.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles = {}
+        self._progress = None
+        self._progress_total = 0
+
+    # --- אירועים ---
+
+    def _emit(self, event):
+        if self._file is None:
+            return
+        line = json.dumps({"ts": datetime.now().isoformat(timespec="milliseconds"), **event},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    @property
+    def username(self):
+        return getattr(self._local, "username", None)
+
+    def _current(self):
+        return self._profiles.get(self.username) if self.username else None
+
+    @contextmanager
+    def profile(self, username):
+        """כל מה שנמדד בתוך הבלוק (באותו thread) שייך לסריקה של username"""
+        previous = self.username
+        with self._lock:
+            # סריקה חוזרת של אותו פרופיל (למשל עם חשבון אחר אחרי challenge) נצברת לאותם מונים
+            self._profiles.setdefault(username, _ProfileMetrics()).duration = None
+        self._local.username = username
+        self._emit({"event": "profile_start", "username": username})
+        status = "ok"
+        try:
+            yield
+        except BaseException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            with self._lock:
+                metrics = self._profiles[username]
+                metrics.duration = time.monotonic() - metrics.started
+            self._emit({"event": "profile_end", "username": username, "status": status,
+                        "duration_sec": round(metrics.duration, 3), **self.profile_summary(username)})
+            self._local.username = previous
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """מודד את משך הבלוק; חריגה שעוברת דרכו נספרת כשגיאה של ה-span ועוברת הלאה"""
+        started = time.monotonic()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            duration = time.monotonic() - started
+            with self._lock:
+                metrics = self._current()
+                if metrics is not None:
+                    stats = metrics.spans[name]
+                    stats["count"] += 1
+                    stats["total_sec"] += duration
+                    stats["max_sec"] = max(stats["max_sec"], duration)
+                    if error is not None:
+                        stats["errors"] += 1
+            event = {"event": "span", "name": name, "username": self.username, "duration_sec": round(duration, 4),
+                     **attrs}
+            if error is not None:
+                event["error"] = f"{type(error).__name__}: {error}"
+            self._emit(event)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            metrics = self._current()
+            if metrics is not None:
+                metrics.counters[name] += amount
+
+    def counter(self, username, name):
+        """הערך הנוכחי של מונה בסריקה של username"""
+        with self._lock:
+            metrics = self._profiles.get(username)
+            return metrics.counters.get(name, 0) if metrics is not None else 0
+
+    # --- בקשות ---
+
+    def install(self, context):
+        """
+        סופר בקשות HTTP, בתים, ניסיונות חוזרים ושגיאות של context. ה-hooks מותקנים פעם אחת לכל context
+        וסופרים תמיד ל-recorder האחרון שהותקן עליו (context שעובר בין סריקות עם recorder חדש).
+        """
+        installed = getattr(context, "_metrics_recorder", None) is not None
+        context._metrics_recorder = self
+        if installed:
+            return
+
+        def count(name, amount=1):
+            context._metrics_recorder.count(name, amount)
+
+        def on_response(resp, **kwargs):
+            count("requests")
+            # בהורדה בזרימה התוכן עוד לא נקרא - סופרים רק את מה שהשרת הצהיר עליו
+            size = resp.headers.get("Content-Length") if kwargs.get("stream") else len(resp.content)
+            count("bytes", int(size or 0))
+            if resp.status_code >= 400:
+                count(f"http_{resp.status_code}")
+
+        def with_hook(session):
+            if on_response not in session.hooks['response']:
+                session.hooks['response'].append(on_response)
+            return session
+
+        get_json = context.get_json
+        get_anonymous_session = context.get_anonymous_session
+
+        def measured_get_json(path, params, host='www.instagram.com', session=None, _attempt=1,
+                              response_headers=None, use_post=False):
+            if _attempt > 1:
+                count("retries")
+            try:
+                return get_json(path, params, host, with_hook(session or context._session), _attempt,
+                                response_headers, use_post)
+            except Exception:
+                if _attempt == 1:
+                    count("request_errors")
+                raise
+
+        context.get_json = measured_get_json
+        context.get_anonymous_session = lambda: with_hook(get_anonymous_session())
+
+    # --- סיכומים ---
+
+    def profile_summary(self, username):
+        with self._lock:
+            metrics = self._profiles.get(username)
+            if metrics is None:
+                return {}
+            return {
+                "phase_seconds": {name: round(metrics.spans[name]["total_sec"], 3)
+                                  for name in PHASES if name in metrics.spans},
+                "spans": {name: {**stats, "total_sec": round(stats["total_sec"], 3),
+                                 "max_sec": round(stats["max_sec"], 3)}
+                          for name, stats in metrics.spans.items()},
+                "counters": dict(metrics.counters),
+            }
+
+    def summary(self, slowest=5):
+        """סיכום הריצה: לכל span ספירה וזמנים, סכום המונים, והפרופילים האיטיים ביותר עם השלב הכבד שלהם"""
+        spans = defaultdict(_new_span_stats)
+        counters = defaultdict(int)
+        profiles = []
+        with self._lock:
+            items = list(self._profiles.items())
+        for username, metrics in items:
+            for name, stats in metrics.spans.items():
+                total = spans[name]
+                total["count"] += stats["count"]
+                total["total_sec"] += stats["total_sec"]
+                total["max_sec"] = max(total["max_sec"], stats["max_sec"])
+                total["errors"] += stats["errors"]
+            for name, value in metrics.counters.items():
+                counters[name] += value
+            duration = metrics.duration if metrics.duration is not None else time.monotonic() - metrics.started
+            heaviest = max((name for name in metrics.spans if name in PHASES),
+                           key=lambda name: metrics.spans[name]["total_sec"], default=None)
+            profiles.append({"username": username, "duration_sec": round(duration, 3), "heaviest_phase": heaviest,
+                             "requests": metrics.counters.get("requests", 0)})
+        for stats in spans.values():
+            stats["avg_sec"] = round(stats["total_sec"] / stats["count"], 4) if stats["count"] else 0.0
+            stats["total_sec"] = round(stats["total_sec"], 3)
+            stats["max_sec"] = round(stats["max_sec"], 3)
+        profiles.sort(key=lambda entry: entry["duration_sec"], reverse=True)
+        return {"spans": dict(spans), "counters": dict(counters), "slowest_profiles": profiles[:slowest]}
+
+    # --- שורת התקדמות ---
+
+    def _progress_line(self):
+        with self._lock:
+            items = list(self._profiles.values())
+        done = sum(1 for metrics in items if metrics.duration is not None)
+        posts = sum(metrics.spans["post"]["count"] for metrics in items if "post" in metrics.spans)
+        requests = sum(metrics.counters.get("requests", 0) for metrics in items)
+        elapsed = time.monotonic() - self._progress_started
+        return (f"\r⏳ {done}/{self._progress_total} פרופילים | 📸 {posts} פוסטים "
+                f"({posts / elapsed if elapsed else 0:.1f}/שנייה) | 📡 {requests} בקשות | {elapsed:.0f} שניות ")
+
+    def start_progress(self, total_profiles, stream=sys.stderr, interval=PROGRESS_INTERVAL):
+        """שורת התקדמות חיה שמתעדכנת כל interval שניות עד stop_progress()"""
+        self._progress_total = total_profiles
+        self._progress_started = time.monotonic()
+        stop = threading.Event()
+
+        def _run():
+            while not stop.wait(interval):
+                stream.write(self._progress_line())
+                stream.flush()
+            stream.write(self._progress_line() + "\n")
+            stream.flush()
+
+        thread = threading.Thread(target=_run, name="progress", daemon=True)
+        thread.start()
+        self._progress = (stop, thread)
+
+    def stop_progress(self):
+        if self._progress is not None:
+            stop, thread = self._progress
+            stop.set()
+            thread.join()
+            self._progress = None
+
+    def close(self):
+        self.stop_progress()
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+שלב עיבוד אופציונלי אחרי ההורדה, על מאגר תהליכים (ProcessPoolExecutor)
+לכל קובץ שירד: תמונה ממוזערת ב-WebP, ולסרטונים (is_video) גם פס הקול ו-keyframes.
+העבודה הכבדה על ה-CPU רצה במקביל לסריקה, שרובה המתנה לרשת, במקום בעיבוד סדרתי נפרד אחרי הסריקה.
+התוצרים נשמרים ליד קובץ המדיה ונרשמים ברשומות media_derived בתיקיית הפרופיל (לפי shortcode / ID של פריט סטורי).
+דורש Pillow (pip3 install Pillow) לתמונות ו-ffmpeg לסרטונים; בלי אחד מהם רק החלק שלו מדולג.
+"""
+
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .stream import RECORDS_DIR, RecordStream, run_records_path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+THUMBNAIL_SIZE = 480
+WEBP_QUALITY = 80
+KEYFRAMES = 3
+FFMPEG_TIMEOUT = 120
+
+
+def available_tools():
+    """אילו כלים מותקנים: Pillow לתמונות ממוזערות, ffmpeg לקול ול-keyframes"""
+    return {"pillow": Image is not None, "ffmpeg": shutil.which("ffmpeg") is not None}
+
+
+def _ffmpeg(args):
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *args],
+                            capture_output=True, timeout=FFMPEG_TIMEOUT)
+    return result.returncode == 0
+
+
+def _thumbnail(source, target, size, quality):
+    if os.path.isfile(target):
+        return target
+    with Image.open(source) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        image.save(target + ".part", "WEBP", quality=quality)
+    os.replace(target + ".part", target)
+    return target
+
+
+def _audio(source, target):
+    # העתקת פס הקול בלי קידוד מחדש (AAC ב-mp4 של אינסטגרם); סרטון בלי קול מחזיר None
+    if os.path.isfile(target):
+        return target
+    if _ffmpeg(["-i", source, "-vn", "-map", "0:a:0", "-c:a", "copy", "-f", "mp4", target + ".part"]):
+        os.replace(target + ".part", target)
+        return target
+    if os.path.exists(target + ".part"):
+        os.remove(target + ".part")
+    return None
+
+
+def _keyframes(source, base, count):
+    existing = [f"{base}_keyframe_{index}.jpg" for index in range(1, count + 1)]
+    if all(os.path.isfile(path) for path in existing):
+        return existing
+    # רק פריימי I (keyframes) - הפענוח מדלג על כל השאר, כך שזה מהיר גם לסרטונים ארוכים
+    _ffmpeg(["-skip_frame", "nokey", "-i", source, "-vsync", "vfr", "-frames:v", str(count), "-q:v", "3",
+             f"{base}_keyframe_%d.jpg"])
+    return [path for path in existing if os.path.isfile(path)]
+
+
+def process_file(source, kind, tools, thumbnail_size=THUMBNAIL_SIZE, keyframes=KEYFRAMES, audio=True):
+    """
+    רץ בתהליך של המאגר: מייצר את התוצרים של קובץ אחד ומחזיר את הנתיבים שלהם.
+    קובץ שכבר עובד (התוצרים קיימים) לא מעובד שוב.
+    """
+    base = os.path.splitext(source)[0]
+    outputs = {"thumbnail": None, "audio": None, "keyframes": []}
+    if kind == "video" and tools["ffmpeg"]:
+        if keyframes:
+            outputs["keyframes"] = _keyframes(source, base, keyframes)
+        if audio:
+            outputs["audio"] = _audio(source, base + ".m4a")
+    # לסרטון - התמונה הממוזערת מה-keyframe הראשון
+    thumbnail_source = source if kind != "video" else (outputs["keyframes"] or [None])[0]
+    if tools["pillow"] and thumbnail_source:
+        outputs["thumbnail"] = _thumbnail(thumbnail_source, f"{base}_{kind}_thumb.webp", thumbnail_size, WEBP_QUALITY)
+    return outputs
+
+
+def _profile_dir(filename):
+    """תיקיית הפרופיל של קובץ מדיה - התיקייה הקרובה שיש בה records (סטוריז והיילייטס נמצאים בתת-תיקיות)"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    for _ in range(3):
+        if os.path.isdir(os.path.join(directory, RECORDS_DIR)):
+            return directory
+        directory = os.path.dirname(directory)
+    return os.path.dirname(filename) or "."
+
+
+class PostProcessor:
+    """
+    מקבל קבצים מ-MediaPipeline אחרי שירדו ומעבד אותם על workers תהליכים.
+    התוצאות נכתבות כרשומות media_derived ל-records/derived_{זמן}.jsonl של כל פרופיל;
+    wait(owner) ממתין לעיבוד של הפרופיל וסוגר את קובץ הרשומות שלו.
+    """
+
+    def __init__(self, workers=None, thumbnail_size=THUMBNAIL_SIZE, keyframes=KEYFRAMES, audio=True):
+        self.tools = available_tools()
+        self.thumbnail_size = thumbnail_size
+        self.keyframes = keyframes
+        self.audio = audio
+        self.enabled = any(self.tools.values())
+        if not self.enabled:
+            print("⚠️  עיבוד מדיה כבוי: צריך Pillow (pip3 install Pillow) ו/או ffmpeg", flush=True)
+        # spawn ולא fork - התהליך הראשי מריץ threads (סריקה, הורדות) בזמן שהמאגר נפתח
+        self._pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                         mp_context=multiprocessing.get_context("spawn")) if self.enabled else None
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._pending = defaultdict(int)
+        self._streams = {}
+        self._stats = defaultdict(int)
+        self.errors = []
+
+    def submit(self, job, filename):
+        """מעבד קובץ שירד (MediaJob והנתיב שלו) ברקע"""
+        if not self.enabled or (job.kind == "video" and not self.tools["ffmpeg"]):
+            return
+        with self._lock:
+            self._pending[job.owner] += 1
+        future = self._pool.submit(process_file, filename, job.kind, self.tools, self.thumbnail_size,
+                                   self.keyframes, self.audio)
+        future.add_done_callback(lambda future: self._finished(job, filename, future))
+
+    def _finished(self, job, filename, future):
+        with self._done:
+            try:
+                outputs = future.result()
+                self._stream(job.owner, filename).write({
+                    "type": "media_derived", "username": job.owner, "ref": job.ref, "kind": job.kind,
+                    "file": filename, **outputs})
+                self._stats["processed"] += 1
+                self._stats["thumbnails"] += int(outputs["thumbnail"] is not None)
+                self._stats["audio_tracks"] += int(outputs["audio"] is not None)
+                self._stats["keyframes"] += len(outputs["keyframes"])
+            except Exception as e:
+                self._stats["failed"] += 1
+                self.errors.append({"file": filename, "error": str(e)})
+            self._pending[job.owner] -= 1
+            self._done.notify_all()
+
+    def _stream(self, owner, filename):
+        if owner not in self._streams:
+            run_id = f"derived_{datetime.now():%Y%m%d_%H%M%S_%f}"
+            self._streams[owner] = RecordStream(run_records_path(_profile_dir(filename), run_id))
+        return self._streams[owner]
+
+    def wait(self, owner, timeout=None):
+        """ממתין לעיבוד הקבצים של owner וסוגר את קובץ הרשומות שלו; False אם עבר timeout"""
+        with self._done:
+            if not self._done.wait_for(lambda: self._pending[owner] == 0, timeout):
+                return False
+            stream = self._streams.pop(owner, None)
+        if stream is not None:
+            stream.finalize()
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        with self._lock:
+            streams, self._streams = list(self._streams.values()), {}
+        for stream in streams:
+            stream.finalize()
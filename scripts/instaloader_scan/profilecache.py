@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+מטמון קבוע של נתוני פרופילים: username -> userid, המונים האחרונים ושדות הביו, עם זמן תפוגה
+Profile.from_username הוא בקשה מלאה (ומוגבלת בקצב) לכל פרופיל, גם כשמשימה צריכה רק את ה-userid - למשל לסטוריז
+ולהיילייטס. המטמון בונה Profile מהנתונים השמורים כל עוד הם טריים, ועוקב אחרי שינויי שם משתמש: ה-userid קבוע,
+ושם שהשתנה נרשם בהיסטוריה (מתשובות שכבר מגיעות, כמו בעל הסטורי, או מ-Profile.from_id כשהשם הישן כבר לא קיים).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+import instaloader
+
+PROFILE_CACHE_FILE = ".profile_cache.db"
+# המונים והביו נחשבים טריים יום אחד
+PROFILE_TTL = 24 * 3600.0
+# ה-userid של שם משתמש נחשב נכון שבוע בלי בדיקה (שם יכול לעבור לחשבון אחר)
+USERNAME_TTL = 7 * 24 * 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    userid INTEGER PRIMARY KEY,
+    username TEXT NOT NULL,
+    node TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_username ON profiles (username, fetched_at);
+CREATE TABLE IF NOT EXISTS username_history (
+    userid INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (userid, username)
+);
+CREATE INDEX IF NOT EXISTS username_history_username ON username_history (username, last_seen);
+"""
+
+
+def _cached_node(profile):
+    """ה-node של הפרופיל בלי רשימות הפוסטים (רק המונים שלהן), כולל מבנה האייפון אם נטען"""
+    node = {}
+    for key, value in profile._node.items():
+        if isinstance(value, dict) and "edges" in value:
+            value = {"count": value.get("count")}
+        node[key] = value
+    if profile._iphone_struct_:
+        node["iphone_struct"] = profile._iphone_struct_
+    return node
+
+
+class ProfileCache:
+    """
+    profile_cache.db (SQLite) בתיקיית הפלט של כל הסריקות. חיבור SQLite נפרד לכל thread, כמו ב-TagIndex,
+    כך שכל ה-workers והפולרים של אותה תיקייה חולקים אותו מטמון.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(int)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return self._local.db
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # --- עדכון ---
+
+    def store(self, profile):
+        """שומר פרופיל שנטען מאינסטגרם (מונים, ביו ו-userid) ורושם את השם שלו בהיסטוריה"""
+        userid, username = profile.userid, profile.username
+        self.observe(userid, username)
+        self._db().execute(
+            "INSERT INTO profiles (userid, username, node, fetched_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(userid) DO UPDATE SET username = excluded.username, node = excluded.node, "
+            "fetched_at = excluded.fetched_at",
+            (userid, username, json.dumps(_cached_node(profile), ensure_ascii=False, default=str), time.time()))
+
+    def observe(self, userid, username):
+        """
+        userid ושם משתמש שנראו יחד בתשובה כלשהי (בעל סטורי, בעל פוסט) - בלי בקשה נוספת.
+        שם חדש ל-userid מוכר נרשם כשינוי שם; מחזיר את השם הקודם אם השם השתנה.
+        """
+        userid, username, now = int(userid), username.lower(), time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            previous = db.execute("SELECT username FROM username_history WHERE userid = ? "
+                                  "ORDER BY last_seen DESC LIMIT 1", (userid,)).fetchone()
+            db.execute("INSERT INTO username_history (userid, username, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                       "ON CONFLICT(userid, username) DO UPDATE SET last_seen = excluded.last_seen",
+                       (userid, username, now, now))
+            renamed = previous is not None and previous[0] != username
+            if renamed:
+                db.execute("UPDATE profiles SET username = ? WHERE userid = ?", (username, userid))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if renamed:
+            self._count("renames")
+            print(f"🔁 @{previous[0]} שינה את שם המשתמש ל-@{username} (userid {userid})", flush=True)
+            return previous[0]
+        return None
+
+    # --- שליפה ---
+
+    def userid(self, username, max_age=USERNAME_TTL, current=True):
+        """
+        ה-userid האחרון שנראה עם השם הזה, אם נראה בתוך max_age; אחרת None.
+        current=False - גם חשבון שעבר מאז לשם אחר (לאיתור הפרופיל לפי שם ישן).
+        """
+        latest = (" AND last_seen = (SELECT MAX(last_seen) FROM username_history AS other "
+                  "WHERE other.userid = username_history.userid)") if current else ""
+        row = self._db().execute(
+            f"SELECT userid FROM username_history WHERE username = ? AND last_seen >= ?{latest} "
+            f"ORDER BY last_seen DESC LIMIT 1", (username.lower(), time.time() - max_age)).fetchone()
+        self._count("userid_hits" if row else "userid_misses")
+        return row[0] if row else None
+
+    def _cached(self, username, max_age):
+        row = self._db().execute(
+            "SELECT userid, node FROM profiles WHERE username = ? AND fetched_at >= ? "
+            "ORDER BY fetched_at DESC LIMIT 1", (username.lower(), time.time() - max_age)).fetchone()
+        return json.loads(row[1]) if row else None
+
+    def profile(self, context, username, max_age=PROFILE_TTL):
+        """
+        Profile לשם המשתמש: מהמטמון בלי שום בקשה אם נשמר בתוך max_age, ואחרת מ-Profile.from_username.
+        שם שכבר לא קיים אבל ה-userid שלו מוכר נטען לפי ה-userid (Profile.from_id) ונרשם כשינוי שם.
+        """
+        node = self._cached(username, max_age) if max_age else None
+        if node is not None:
+            self._count("hits")
+            return instaloader.Profile(context, node)
+        self._count("fetches")
+        try:
+            profile = instaloader.Profile.from_username(context, username)
+        except instaloader.exceptions.ProfileNotExistsException:
+            userid = self.userid(username, max_age=float("inf"), current=False)
+            if userid is None:
+                raise
+            profile = instaloader.Profile.from_id(context, userid)
+        self.store(profile)
+        return profile
+
+    def history(self, userid):
+        """כל השמות של userid, מהישן לחדש: [(username, first_seen, last_seen)]"""
+        return self._db().execute("SELECT username, first_seen, last_seen FROM username_history WHERE userid = ? "
+                                  "ORDER BY first_seen", (int(userid),)).fetchall()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        if hasattr(self._local, "db"):
+            self._local.db.close()
+            del self._local.db
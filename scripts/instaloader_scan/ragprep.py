@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+"""
+הכנת הפוסטים ל-RAG בזמן הסריקה: נרמול טקסט בעברית ובאנגלית, הסרת אימוג'י, זיהוי שפה, איחוד כיתובים כמעט
+זהים וחיתוך ל-chunks מוכנים לחיפוש טקסט מלא ול-embeddings - בלי שלב עיבוד נוסף אחרי ה-onboarding.
+החיתוך והגיבוב זהים ל-src/lib/rag/chunker.ts ו-ingest.ts (3.5 תווים לטוקן, 400 / 100 / 500 טוקנים, חפיפה 12%,
+chunk_hash = md5 של הטקסט), כך ששכבת השליפה יכולה לטעון את ה-chunks כמו שהם.
+chunk שה-hash שלו כבר קיבל embedding לא חוזר לרשימת הממתינים - פוסט שלא השתנה לא מקבל embedding שוב.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from .sink import Sink
+from .stream import iter_records, list_record_files
+
+RAG_DB_FILE = ".rag_chunks.db"
+# כמה פוסטים מעובדים יחד (טרנזקציה אחת); סוף כל פרופיל שוטף את האצווה בכל מקרה
+RAG_BATCH = 100
+
+# כמו DEFAULTS ו-estimateTokens ב-chunker.ts
+CHARS_PER_TOKEN = 3.5
+TARGET_TOKENS = 400
+MIN_TOKENS = 100
+MAX_TOKENS = 500
+OVERLAP_RATIO = 0.12
+
+# כיתוב עם SimHash במרחק של עד 7 ביטים מכיתוב קודם של אותו פרופיל נחשב כמעט זהה
+NEAR_DUPLICATE_BITS = 7
+# כיתובים קצרים מזה (במילים) לא נבדקים - "בוקר טוב" זהה בהרבה פוסטים בלי להיות העתק
+NEAR_DUPLICATE_MIN_WORDS = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    username TEXT NOT NULL,
+    shortcode TEXT NOT NULL,
+    date TEXT,
+    language TEXT,
+    text_hash TEXT NOT NULL,
+    simhash INTEGER,
+    duplicate_of TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (username, shortcode)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chunks (
+    username TEXT NOT NULL,
+    shortcode TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    part TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    chunk_text TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    language TEXT,
+    metadata TEXT NOT NULL,
+    UNIQUE (username, shortcode, chunk_index)
+);
+CREATE INDEX IF NOT EXISTS chunks_by_hash ON chunks (chunk_hash);
+CREATE TABLE IF NOT EXISTS embedded (
+    chunk_hash TEXT PRIMARY KEY,
+    model TEXT,
+    embedded_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    chunk_text, username UNINDEXED, shortcode UNINDEXED, chunk_index UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# --- נרמול ---
+
+# אימוג'י, סמלים ודגלים, כולל ZWJ, בוררי וריאציה, גווני עור ותגי דגלים
+_EMOJI = re.compile(
+    "[\U0001F000-\U0001FAFF\U00002600-\U000027BF\U00002B00-\U00002BFF\U00002190-\U000021FF"
+    "\U0000231A-\U000023FF\U000025A0-\U000025FF\U00003030\U0000303D\U00003297\U00003299"
+    "\U0000FE0E\U0000FE0F\U000020E3\U000E0020-\U000E007F]+")
+# ניקוד וטעמים (בלי מקף, פסק וסוף פסוק)
+_NIQQUD = re.compile("[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")
+# סימני כיווניות ורווחים ברוחב אפס - נפוצים בכיתובים שמערבבים עברית ואנגלית
+_INVISIBLE = re.compile("[\u00AD\u200B-\u200F\u202A-\u202E\u2060-\u2069\uFEFF]")
+_HEBREW_PUNCTUATION = str.maketrans({"\u05BE": "-", "\u05F3": "'", "\u05F4": '"', "\u05C0": "|", "\u05C3": ":"})
+# שורות ריווח של אינסטגרם ("." / "•" / "-" לבד בשורה)
+_SPACER_LINE = re.compile(r"^[\s.·•\-_|*~]+$", re.MULTILINE)
+_REPEATED_PUNCTUATION = re.compile(r"([!?])\1+")
+
+_HEBREW = re.compile("[\u05D0-\u05EA]")
+_ARABIC = re.compile("[\u0620-\u064A]")
+_LATIN = re.compile("[A-Za-z]")
+_TAGS_AND_LINKS = re.compile(r"[#@]\w+|https?://\S+")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    """
+    טקסט נקי ל-embedding ולחיפוש: NFKC (גם אותיות "מעוצבות" של יוניקוד חוזרות לרגילות), בלי ניקוד, אימוג'י,
+    סימני כיווניות ושורות ריווח, ואז normalizeText של chunker.ts (רווחים, שורות ריקות, trim)
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).translate(_HEBREW_PUNCTUATION)
+    text = _INVISIBLE.sub("", _NIQQUD.sub("", text))
+    text = _EMOJI.sub(" ", text)
+    text = _SPACER_LINE.sub("", text.replace("\0", "").replace("\r\n", "\n").replace("\r", "\n"))
+    text = _REPEATED_PUNCTUATION.sub(r"\1", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def detect_language(text):
+    """
+    'he' / 'en' / 'ar' / 'mixed' / 'unknown' לפי יחס האותיות (בלי האשטאגים, אזכורים וקישורים).
+    כל כתב לטיני נחשב אנגלית - מספיק לבחירת מודל ולסינון, לא זיהוי שפה מלא.
+    """
+    text = _TAGS_AND_LINKS.sub(" ", text or "")
+    counts = {"he": len(_HEBREW.findall(text)), "ar": len(_ARABIC.findall(text)), "en": len(_LATIN.findall(text))}
+    total = sum(counts.values())
+    if total < 3:
+        return "unknown"
+    language, count = max(counts.items(), key=lambda item: item[1])
+    return language if count >= 0.8 * total else "mixed"
+
+
+def content_hash(text):
+    """chunk_hash - md5 של הטקסט, כמו ב-ingest.ts ובמטמון ה-embeddings"""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def simhash(text):
+    """
+    SimHash של 64 ביט על המילים (בלי תגים וקישורים), כ-INTEGER עם סימן של SQLite.
+    מילים בודדות ולא רצפים - בכיתוב של 15 מילים החלפת מילה אחת משנה כמה ביטים, לא רבע מהם.
+    """
+    features = [word.lower() for word in _WORD.findall(_TAGS_AND_LINKS.sub(" ", text))]
+    if not features:
+        return None
+    weights = [0] * 64
+    for feature in features:
+        value = int.from_bytes(hashlib.md5(feature.encode("utf-8")).digest()[:8], "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    value = sum(1 << bit for bit in range(64) if weights[bit] > 0)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _distance(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+# --- חיתוך (כמו chunkText ב-chunker.ts) ---
+
+def estimate_tokens(text):
+    """Math.ceil(len / 3.5), כמו estimateTokens"""
+    return -(-2 * len(text) // 7)
+
+
+def _split_point(text, target, window):
+    start, end = max(0, target - window), min(len(text), target + window)
+    region = text[start:end]
+    for separator in ("\n\n", "\n"):
+        found = region.rfind(separator)
+        if found != -1:
+            return start + found + len(separator)
+    sentence = re.search(r"[.!?]\s+\S", region)
+    if sentence:
+        after = region.find(" ", sentence.start() + 1)
+        if after != -1:
+            return start + after + 1
+    for separator in (", ", " "):
+        found = region.rfind(separator)
+        if found != -1:
+            return start + found + len(separator)
+    return target
+
+
+def chunk_text(text, target_tokens=TARGET_TOKENS, min_tokens=MIN_TOKENS, max_tokens=MAX_TOKENS,
+               overlap_ratio=OVERLAP_RATIO):
+    """text (כבר מנורמל) -> [{index, text, token_count, start_char, end_char}]"""
+    if not text:
+        return []
+    if estimate_tokens(text) <= max_tokens:
+        return [{"index": 0, "text": text, "token_count": estimate_tokens(text), "start_char": 0,
+                 "end_char": len(text)}]
+    # Math.round של JS (חצי כלפי מעלה)
+    target_chars = int(target_tokens * CHARS_PER_TOKEN + 0.5)
+    overlap_chars = int(target_chars * overlap_ratio + 0.5)
+    window = int(target_chars * 0.2 + 0.5)
+    chunks, pos = [], 0
+    while pos < len(text):
+        previous = pos
+        ideal_end = pos + target_chars
+        end = len(text) if ideal_end >= len(text) else _split_point(text, ideal_end, window)
+        if end <= pos:
+            end = min(pos + target_chars, len(text))
+        piece = text[pos:end].strip()
+        tokens = estimate_tokens(piece)
+        if piece and (tokens >= min_tokens or not chunks):
+            chunks.append({"index": len(chunks), "text": piece, "token_count": tokens, "start_char": pos,
+                           "end_char": end})
+        elif piece:
+            # chunk קטן בסוף מתאחד עם הקודם
+            last = chunks[-1]
+            last["text"] = text[last["start_char"]:end].strip()
+            last["token_count"] = estimate_tokens(last["text"])
+            last["end_char"] = end
+        pos = end - overlap_chars if end - overlap_chars > previous else end
+        if pos <= previous:
+            pos = previous + 1
+    return chunks
+
+
+# --- טקסט הפוסט ---
+
+def post_text(record):
+    """
+    הכיתוב עם ההקשר שלו, כמו buildPostText ב-ingest.ts: סוג הפוסט, האשטאגים, אזכורים ומיקום.
+    התגובות נפרדות (comments_text) - תגובה חדשה לא משנה את ה-chunks של הכיתוב.
+    """
+    caption = normalize_text(record.get("caption"))
+    if not caption:
+        return ""
+    lines = [f"[{'video' if record.get('is_video') else 'image'}] {caption}"]
+    if record.get("caption_hashtags"):
+        lines.append("Hashtags: " + ", ".join(record["caption_hashtags"]))
+    if record.get("caption_mentions"):
+        lines.append("Mentions: " + ", ".join("@" + mention for mention in record["caption_mentions"]))
+    location = normalize_text(record.get("location"))
+    if location:
+        lines.append("Location: " + location)
+    return "\n".join(lines)
+
+
+def comments_text(record):
+    """טקסט התגובות שנאספו, תגובה בשורה (תגובות של אימוג'י בלבד נופלות בנרמול)"""
+    lines = []
+    for comment in record.get("comments") or []:
+        text = normalize_text(comment.get("text"))
+        if text:
+            lines.append(f"@{comment.get('owner')}: {text}" if comment.get("owner") else text)
+    return "\n".join(lines)
+
+
+class RagPreprocessor(Sink):
+    """
+    rag_chunks.db (SQLite) בתיקיית הפלט של כל הסריקות. מחבר ל-RecordStream כמו RecordSink (write / flush / close):
+    רשומות post נאספות לאצווה של batch_size פוסטים ומעובדות בטרנזקציה אחת. פוסט שהטקסט שלו לא השתנה מדולג,
+    ופוסט שנערך מחליף את ה-chunks שלו. חיבור SQLite נפרד לכל thread, כמו ב-TagIndex.
+    """
+
+    def __init__(self, path, batch_size=RAG_BATCH):
+        self.path = path
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._stats = defaultdict(int)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return self._local.db
+
+    # --- עדכון ---
+
+    def write(self, record, source=None, position=None):
+        """מוסיף רשומת post לאצווה (הרשומה האחרונה של כל פוסט קובעת); שאר הסוגים מדולגים"""
+        if record.get("type") != "post":
+            return
+        with self._lock:
+            self._pending[(record.get("username"), record["shortcode"])] = record
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """מעבד את האצווה הנוכחית; כישלון נרשם ב-stats והסריקה ממשיכה (אפשר להשלים עם instaloader-rag.py build)"""
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = list(self._pending.values()), {}
+            try:
+                counts = self._process(batch)
+            except Exception as e:
+                with self._lock:
+                    self._stats["failed_batches"] += 1
+                print(f"⚠️  הכנת ה-chunks לאצווה נכשלה ({str(e)}); אפשר להשלים עם instaloader-rag.py build",
+                      flush=True)
+                return
+            with self._lock:
+                self._stats["batches"] += 1
+                for name, count in counts.items():
+                    self._stats[name] += count
+
+    def _process(self, batch):
+        counts = defaultdict(int)
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            known = {}
+            for record in batch:
+                self._process_post(db, record, known, counts)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return counts
+
+    def _process_post(self, db, record, known, counts):
+        username, shortcode = record.get("username"), record["shortcode"]
+        counts["posts"] += 1
+        caption, comments = post_text(record), comments_text(record)
+        text_hash = content_hash(caption + "\0" + comments)
+        row = db.execute("SELECT text_hash FROM posts WHERE username = ? AND shortcode = ?",
+                         (username, shortcode)).fetchone()
+        if row and row[0] == text_hash:
+            counts["unchanged"] += 1
+            return
+        language = detect_language(record.get("caption") or comments)
+        normalized = normalize_text(record.get("caption"))
+        fingerprint = simhash(normalized) if len(_WORD.findall(normalized)) >= NEAR_DUPLICATE_MIN_WORDS else None
+        duplicate_of = self._near_duplicate(db, username, shortcode, fingerprint, known)
+        db.execute("INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   (username, shortcode, record.get("date"), language, text_hash, fingerprint, duplicate_of,
+                    time.time()))
+        db.execute("DELETE FROM chunks_fts WHERE rowid IN (SELECT rowid FROM chunks WHERE username = ? AND shortcode = ?)",
+                   (username, shortcode))
+        db.execute("DELETE FROM chunks WHERE username = ? AND shortcode = ?", (username, shortcode))
+        if duplicate_of is not None:
+            counts["near_duplicates"] += 1
+            caption = ""
+        if fingerprint is not None and duplicate_of is None:
+            known[username].append((shortcode, fingerprint))
+
+        metadata = {
+            "date": record.get("date"),
+            "url": record.get("url"),
+            "likes": record.get("likes"),
+            "hashtags": record.get("caption_hashtags") or [],
+            "mentions": record.get("caption_mentions") or [],
+            "location": record.get("location"),
+            "is_video": record.get("is_video"),
+        }
+        index = 0
+        for part, text in (("caption", caption), ("comments", comments)):
+            for chunk in chunk_text(text):
+                chunk_hash = content_hash(chunk["text"])
+                rowid = db.execute("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (username, shortcode, index, part, chunk_hash, chunk["text"], chunk["token_count"],
+                            language, json.dumps({**metadata, "startChar": chunk["start_char"],
+                                                  "endChar": chunk["end_char"]}, ensure_ascii=False))).lastrowid
+                # אותו rowid כמו ב-chunks, למחיקה כשהפוסט מתעדכן
+                db.execute("INSERT INTO chunks_fts (rowid, chunk_text, username, shortcode, chunk_index) "
+                           "VALUES (?, ?, ?, ?, ?)", (rowid, chunk["text"], username, shortcode, index))
+                counts["chunks"] += 1
+                index += 1
+
+    def _near_duplicate(self, db, username, shortcode, fingerprint, known):
+        """ה-shortcode של כיתוב קודם של אותו פרופיל שכמעט זהה לזה, או None"""
+        if fingerprint is None:
+            return None
+        if username not in known:
+            known[username] = db.execute(
+                "SELECT shortcode, simhash FROM posts WHERE username = ? AND simhash IS NOT NULL "
+                "AND duplicate_of IS NULL", (username,)).fetchall()
+        for other, other_fingerprint in known[username]:
+            if other != shortcode and _distance(fingerprint, other_fingerprint) <= NEAR_DUPLICATE_BITS:
+                return other
+        return None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self.flush()
+        if hasattr(self._local, "db"):
+            self._local.db.close()
+            del self._local.db
+
+    # --- embeddings ---
+
+    def pending(self, limit=None, usernames=None):
+        """
+        ה-chunks שה-hash שלהם עוד לא קיבל embedding (hash שמופיע בכמה פוסטים - פעם אחת), כרשומות
+        בצורה של document_chunks ב-ingest.ts: {username, shortcode, entity_type, chunk_index, chunk_text, chunk_hash, ...}
+        """
+        where, params = "", []
+        if usernames:
+            usernames = list(usernames)
+            where = f" AND chunks.username IN ({','.join('?' * len(usernames))})"
+            params.extend(usernames)
+        rows = self._db().execute(
+            f"SELECT username, shortcode, chunk_index, part, chunk_hash, chunk_text, token_count, language, metadata "
+            f"FROM chunks WHERE chunk_hash NOT IN (SELECT chunk_hash FROM embedded){where} "
+            f"GROUP BY chunk_hash ORDER BY username, shortcode, chunk_index LIMIT ?",
+            params + [-1 if limit is None else limit]).fetchall()
+        return [{"username": username, "shortcode": shortcode, "entity_type": "post", "chunk_index": chunk_index,
+                 "part": part, "chunk_hash": chunk_hash, "chunk_text": chunk_text, "token_count": token_count,
+                 "language": language, "metadata": json.loads(metadata)}
+                for username, shortcode, chunk_index, part, chunk_hash, chunk_text, token_count, language, metadata
+                in rows]
+
+    def mark_embedded(self, hashes, model=None):
+        """רושם שה-chunks האלה קיבלו embedding; מחזיר כמה hashes היו חדשים"""
+        db = self._db()
+        before = db.total_changes
+        db.executemany("INSERT OR IGNORE INTO embedded (chunk_hash, model, embedded_at) VALUES (?, ?, ?)",
+                       [(chunk_hash, model, time.time()) for chunk_hash in set(hashes)])
+        return db.total_changes - before
+
+    # --- שאילתות ---
+
+    def search(self, query, limit=20, usernames=None):
+        """חיפוש טקסט מלא (FTS5) על ה-chunks: [{username, shortcode, chunk_index, snippet}], מהרלוונטי ביותר"""
+        terms = " ".join('"' + term.replace('"', '""') + '"' for term in normalize_text(query).split())
+        if not terms:
+            return []
+        where, params = "", []
+        if usernames:
+            usernames = list(usernames)
+            where = f" AND username IN ({','.join('?' * len(usernames))})"
+            params.extend(usernames)
+        rows = self._db().execute(
+            f"SELECT username, shortcode, chunk_index, snippet(chunks_fts, 0, '[', ']', '…', 16) FROM chunks_fts "
+            f"WHERE chunks_fts MATCH ?{where} ORDER BY rank LIMIT ?", [terms] + params + [limit]).fetchall()
+        return [{"username": username, "shortcode": shortcode, "chunk_index": chunk_index, "snippet": snippet}
+                for username, shortcode, chunk_index, snippet in rows]
+
+    def summary(self):
+        """מונים של כל המסד: פוסטים, כמעט-כפולים, chunks, ממתינים ל-embedding והתפלגות השפות"""
+        db = self._db()
+        posts, duplicates = db.execute("SELECT COUNT(*), COUNT(duplicate_of) FROM posts").fetchone()
+        chunks, hashes = db.execute("SELECT COUNT(*), COUNT(DISTINCT chunk_hash) FROM chunks").fetchone()
+        pending = db.execute("SELECT COUNT(DISTINCT chunk_hash) FROM chunks "
+                             "WHERE chunk_hash NOT IN (SELECT chunk_hash FROM embedded)").fetchone()[0]
+        languages = dict(db.execute("SELECT language, COUNT(*) FROM posts GROUP BY language").fetchall())
+        return {"posts": posts, "near_duplicates": duplicates, "chunks": chunks, "distinct_hashes": hashes,
+                "pending_embedding": pending, "languages": languages}
+
+
+def prepare_records(preprocessor, output_dirs):
+    """
+    מעבד את קבצי הרשומות הקיימים (פרופילים שנסרקו לפני שהשלב היה קיים), מהישן לחדש, כמו index_records.
+    מחזיר כמה רשומות post נקראו.
+    """
+    records = 0
+    for output_dir in output_dirs:
+        for path in list_record_files(output_dir):
+            for record in iter_records(path):
+                if record.get("type") == "post":
+                    preprocessor.write(record)
+                    records += 1
+        preprocessor.flush()
+    return records
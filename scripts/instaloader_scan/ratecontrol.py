@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+קצב בקשות משותף לכל ה-workers שעובדים מול אותו חשבון
+אינסטגרם מגבילה לפי חשבון (ולפי IP), ולכן כמה contexts של אותו חשבון חייבים לחלוק את אותו תקציב בקשות.
+התקציב הוא token bucket לכל חשבון ולכל סוג שאילתה; תגובות 429, 401 ו-"please wait" מאטות אותו ומוסיפות המתנה
+שגדלה עם כל אירוע, והצלחות מחזירות אותו בהדרגה לקצב הרגיל.
+עם state_file המצב נשמר בקובץ מקומי נעול, כך שכמה תהליכים על אותה מכונה חולקים את אותו תקציב.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import instaloader
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+RATE_STATE_FILE = ".instaloader_ratelimit.json"
+
+# (בקשות, שניות, גודל פרץ) - לפי חלונות הזמן של ה-RateController המקורי של instaloader
+BUCKET_LIMITS = {
+    "graphql": (200, 660, 20),
+    "graphql_total": (275, 600, 30),
+    "iphone": (199, 1800, 10),
+    "other": (75, 660, 10),
+}
+MIN_RATE_FACTOR = 0.1
+# כל הצלחה מחזירה את הקצב ב-2% עד לקצב המלא
+RECOVERY_STEP = 0.02
+BACKOFF_BASE = 30.0
+BACKOFF_MAX = 15 * 60.0
+# אחרי חצי שעה בלי חסימות ההמתנה הבאה מתחילה שוב מ-BACKOFF_BASE
+STRIKES_RESET_AFTER = 30 * 60.0
+PLEASE_WAIT_MARKERS = ("please wait", "wait a few minutes")
+
+
+def _bucket_names(query_type):
+    """לשאילתות GraphQL יש bucket לכל סוג שאילתה ועוד bucket משותף לכולן"""
+    if query_type in ("iphone", "other"):
+        return [query_type]
+    return [query_type, "graphql_total"]
+
+
+def _limits_for(bucket_name):
+    return BUCKET_LIMITS.get(bucket_name, BUCKET_LIMITS["graphql"])
+
+
+class _MemoryState:
+    """מצב ה-buckets בזיכרון התהליך"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = {}
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self._data
+
+
+class _FileState:
+    """מצב ה-buckets בקובץ JSON משותף, נעול עם flock לאורך כל קריאה-עדכון-כתיבה"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock, open(self.path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    data = json.loads(f.read() or "{}")
+                except json.JSONDecodeError:
+                    data = {}
+                yield data
+                f.seek(0)
+                f.truncate()
+                json.dump(data, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class AdaptiveRateController(instaloader.RateController):
+    """
+    RateController שמבוסס על token buckets במקום חלונות זמן קבועים.
+    - wait_before_query ממתין עד שיש token בכל ה-buckets של השאילתה
+    - handle_429 ו-throttled מאטים את ה-bucket ודוחים את הבקשה הבאה
+    - stats() מחזיר מונים: בקשות, זמן המתנה ואירועי חסימה
+    """
+
+    def __init__(self, context, account=None, state_file=None):
+        super().__init__(context)
+        self._account = account
+        if state_file and fcntl is not None:
+            self._state = _FileState(state_file)
+        else:
+            if state_file:
+                print("⚠️  אין flock במערכת הזו - תקציב הבקשות לא ישותף בין תהליכים")
+            self._state = _MemoryState()
+        self._stats_lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._wait_seconds = defaultdict(float)
+        self._throttle_events = defaultdict(int)
+        self._local = threading.local()
+
+    @property
+    def account(self):
+        """החשבון שה-buckets שלו בשימוש; בלי account מפורש - החשבון שה-context מחובר אליו"""
+        return self._account or self._context.username or "anonymous"
+
+    def _buckets(self, data):
+        return data.setdefault(self.account, {})
+
+    def _bucket(self, buckets, name, now):
+        count, window, burst = _limits_for(name)
+        bucket = buckets.setdefault(name, {
+            "tokens": float(burst), "updated": now, "factor": 1.0,
+            "blocked_until": 0.0, "strikes": 0, "last_throttle": 0.0,
+        })
+        # מילוי לפי הזמן שעבר, בקצב הבסיסי כפול מקדם ההאטה הנוכחי
+        rate = count / window * bucket["factor"]
+        bucket["tokens"] = min(float(burst), bucket["tokens"] + (now - bucket["updated"]) * rate)
+        bucket["updated"] = now
+        return bucket, rate
+
+    def _try_acquire(self, query_type):
+        """לוקח token מכל ה-buckets של השאילתה, או מחזיר כמה שניות צריך לחכות"""
+        now = time.time()
+        with self._state.transaction() as data:
+            buckets = self._buckets(data)
+            wait = 0.0
+            entries = []
+            for name in _bucket_names(query_type):
+                bucket, rate = self._bucket(buckets, name, now)
+                entries.append(bucket)
+                wait = max(wait, bucket["blocked_until"] - now)
+                if bucket["tokens"] < 1:
+                    wait = max(wait, (1 - bucket["tokens"]) / rate)
+            if wait > 0:
+                return wait
+            for bucket in entries:
+                bucket["tokens"] -= 1
+                bucket["factor"] = min(1.0, bucket["factor"] + RECOVERY_STEP)
+            return 0.0
+
+    def wait_before_query(self, query_type):
+        self._local.query_type = query_type
+        waited = 0.0
+        announced = False
+        while True:
+            wait = self._try_acquire(query_type)
+            if wait <= 0:
+                break
+            if wait > 15 and not announced:
+                self._context.log(f"\n⏳ תקציב הבקשות של {self.account} נוצל - ממתין {round(wait)} שניות")
+                announced = True
+            self.sleep(wait)
+            waited += wait
+        with self._stats_lock:
+            self._requests[query_type] += 1
+            self._wait_seconds[query_type] += waited
+
+    def throttled(self, query_type, reason):
+        """אינסטגרם האטה אותנו: מקדם הקצב יורד בחצי והבקשה הבאה נדחית בהמתנה שגדלה עם כל אירוע"""
+        now = time.time()
+        with self._state.transaction() as data:
+            buckets = self._buckets(data)
+            backoff = 0.0
+            for name in _bucket_names(query_type):
+                bucket, _ = self._bucket(buckets, name, now)
+                if now - bucket["last_throttle"] > STRIKES_RESET_AFTER:
+                    bucket["strikes"] = 0
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** bucket["strikes"])
+                bucket["strikes"] += 1
+                bucket["last_throttle"] = now
+                bucket["factor"] = max(MIN_RATE_FACTOR, bucket["factor"] / 2)
+                bucket["tokens"] = min(bucket["tokens"], 0.0)
+                bucket["blocked_until"] = max(bucket["blocked_until"], now + backoff)
+        with self._stats_lock:
+            self._throttle_events[reason] += 1
+        # ה-controller משותף לכל ה-contexts של החשבון; האירוע נספר גם על ה-context שהבקשה שלו נחסמה
+        context = getattr(self._local, "context", None)
+        if context is not None:
+            context.throttle_events += 1
+        self._context.error(f"⚠️  {reason} מאינסטגרם ({self.account}) - מאט ומחכה {round(backoff)} שניות לפני הבקשה הבאה",
+                            repeat_at_end=False)
+
+    def handle_429(self, query_type):
+        # ההמתנה עצמה מתבצעת ב-wait_before_query של הניסיון החוזר
+        self.throttled(query_type, "429")
+
+    def observe_response(self, resp, **kwargs):
+        """response hook של requests: מזהה 401 ו-"please wait", ש-instaloader מנסה שוב בלי להאט"""
+        query_type = getattr(self._local, "query_type", None)
+        if query_type is None or resp.status_code in (200, 429):
+            return
+        if resp.status_code == 401:
+            self.throttled(query_type, "401")
+        else:
+            try:
+                message = str(resp.json().get("message", "")).lower()
+            except (ValueError, AttributeError):
+                return
+            if any(marker in message for marker in PLEASE_WAIT_MARKERS):
+                self.throttled(query_type, "please_wait")
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "requests": sum(self._requests.values()),
+                "wait_seconds": round(sum(self._wait_seconds.values()), 2),
+                "throttle_events": sum(self._throttle_events.values()),
+                "throttle_reasons": dict(self._throttle_events),
+                "requests_by_type": dict(self._requests),
+                "wait_seconds_by_type": {key: round(value, 2) for key, value in self._wait_seconds.items()},
+            }
+
+
+def _observe_sessions(context, controller):
+    """
+    מחבר את controller.observe_response לכל session שה-context משתמש בו (גם להעתקים שנוצרים לכל שאילתה),
+    ומסמן ל-controller איזה context שולח את הבקשה, כדי ש-context.throttle_events יספור רק את החסימות שלו
+    """
+    def with_hook(session):
+        if controller.observe_response not in session.hooks['response']:
+            session.hooks['response'].append(controller.observe_response)
+        return session
+
+    get_json = context.get_json
+    get_anonymous_session = context.get_anonymous_session
+
+    def observed_get_json(path, params, host='www.instagram.com', session=None, *args, **kwargs):
+        controller._local.context = context
+        return get_json(path, params, host, with_hook(session or context._session), *args, **kwargs)
+
+    context.throttle_events = 0
+    context.get_json = observed_get_json
+    context.get_anonymous_session = lambda: with_hook(get_anonymous_session())
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def shared_rate_controller(account, state_file=None):
+    """
+    factory ל-Instaloader(rate_controller=...) שמחזיר את אותו controller לכל context של החשבון.
+    account=None - החשבון נקבע לפי ההתחברות של ה-context (כשהוא לא ידוע מראש).
+    state_file - קובץ מצב משותף לכל התהליכים של אותו חשבון על המכונה.
+    """
+    def factory(context):
+        with _controllers_lock:
+            if account not in _controllers:
+                _controllers[account] = AdaptiveRateController(context, account, state_file)
+            controller = _controllers[account]
+        _observe_sessions(context, controller)
+        return controller
+    return factory
+
+
+def rate_stats(account):
+    """המונים של ה-controller המשותף של account ({} אם לא נוצר)"""
+    with _controllers_lock:
+        return _controllers[account].stats() if account in _controllers else {}
@@ -0,0 +1,569 @@
+# -*- coding: utf-8 -*-
+"""
+סריקה של פרופיל בודד: ביו, תמונת פרופיל, סטוריז, היילייטס, פוסטים ותגובות
+הלוגיקה זהה ל-main() של test-instaloader-with-login.py, רק בלי קלט מהמשתמש ועם תיקיית פלט לכל פרופיל
+"""
+
+import dataclasses
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import instaloader
+
+from .checkpoint import CheckpointStore, write_json_atomic
+from .comments import collect_comments, embedded_comment_count, new_comment_stats
+from .engagement import EngagementLog
+from .fetch import MEDIA_RECORD_TYPES, record_media_jobs
+from .highlights import sync_highlights
+from .media import (MediaJob, MediaPipeline, post_media_info, post_media_jobs, post_media_plan, storyitem_media_jobs,
+                    storyitem_media_plan)
+from .metrics import MetricsRecorder
+from .stream import (RecordStream, iter_records, list_record_files, run_records_path, story_item_info,
+                     write_summary)
+
+# סריקה מדורגת: כל שכבה מתפרסמת (profile_data.json, tiers.json, flush ל-sink) ברגע שהיא מסתיימת
+TIERS = ("profile", "recent_posts", "highlights", "history")
+RECENT_POSTS = 12
+TIERS_FILE = "tiers.json"
+
+
+@dataclass
+class ScanOptions:
+    max_posts: int = 150
+    max_comments_per_post: int = 3
+    # סריקה חוזרת נעצרת בפוסט הראשון שכבר נאסף בריצה קודמת
+    incremental: bool = True
+    # דחיסת קובץ הרשומות: None, "gzip" או "zstd"
+    compression: str = None
+    # workers להורדת מדיה כשהסריקה לא מקבלת MediaPipeline משותף
+    media_workers: int = 4
+    # "preview" - תגובות מתוך נתוני הפוסט שכבר נטענו; "full" - תמיד get_comments()
+    comments_mode: str = "preview"
+    # רק metadata: תיאור המדיה ותוכנית ההורדה נשמרים ברשומות, והמדיה יורדת אחר כך לפי בחירה (fetch_media)
+    metadata_only: bool = False
+    # בסריקה חוזרת: עוד כמה פוסטים מוכרים לעבור אחרי העצירה, רק לעדכון היסטוריית המעורבות (בלי רשומות ומדיה)
+    refresh_engagement: int = 0
+    # סריקה מדורגת בתקציב: שניות ו/או בקשות ל-API לפרופיל. התוצאות נכתבות לפי TIERS, והסריקה נעצרת
+    # כשהתקציב נגמר עם checkpoint פתוח - הריצה הבאה ממשיכה את ההיסטוריה משם
+    deadline: float = None
+    request_budget: int = None
+    # עם ProfileCache: כמה שניות פרופיל שמור (מונים, ביו) משמש במקום בקשה לאינסטגרם.
+    # 0 - הפרופיל תמיד נטען מחדש, והמטמון רק מתעדכן
+    profile_max_age: float = 0
+
+
+class ScanInterrupted(Exception):
+    """הסריקה נעצרה באמצע; ה-checkpoint נשמר והריצה הבאה תמשיך מאותה נקודה"""
+
+
+class ScanBudget:
+    """
+    התקציב של סריקה מדורגת: זמן מרגע ההתחלה ובקשות ל-API של הפרופיל (לפי המונים של MetricsRecorder).
+    is_set() כמו threading.Event, כך שהוא נכנס במקום stop_event ללולאות הקיימות; stop_event חיצוני עדיין עוצר.
+    התקציב נבדק בין פריטים, כך שבקשה שכבר יצאה (למשל הדף הבא של הפוסטים) יכולה לעבור אותו באחת.
+    """
+
+    def __init__(self, seconds=None, requests=None, metrics=None, username=None, stop_event=None):
+        self.started = time.monotonic()
+        self.seconds = seconds
+        self.requests = requests
+        self.metrics = metrics
+        self.username = username
+        self.stop_event = stop_event
+        self._requests_before = metrics.counter(username, "requests") if metrics is not None else 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        """שניות שנשארו (None - בלי מגבלת זמן)"""
+        return max(self.seconds - self.elapsed(), 0.0) if self.seconds else None
+
+    def requests_used(self):
+        if self.metrics is None:
+            return 0
+        return self.metrics.counter(self.username, "requests") - self._requests_before
+
+    def exhausted(self):
+        """למה הסריקה צריכה להיעצר: "stopped" (stop_event), "deadline", "requests", או None"""
+        if self.stop_event is not None and self.stop_event.is_set():
+            return "stopped"
+        if self.seconds and self.elapsed() >= self.seconds:
+            return "deadline"
+        if self.requests and self.requests_used() >= self.requests:
+            return "requests"
+        return None
+
+    def is_set(self):
+        return self.exhausted() is not None
+
+
+def _log(username, message):
+    print(f"[@{username}] {message}", flush=True)
+
+
+def _profile_info(profile):
+    """איסוף נתוני פרופיל בסיסיים"""
+    profile_data = {
+        "username": profile.username,
+        "full_name": profile.full_name,
+        "biography": profile.biography,
+        "bio_links": [],
+        "external_url": profile.external_url,
+        "followers": profile.followers,
+        "followees": profile.followees,
+        "mediacount": profile.mediacount,
+        "is_verified": profile.is_verified,
+        "is_private": profile.is_private,
+        "profile_pic_url": profile.profile_pic_url,
+    }
+
+    # איסוף קישורים מהביו
+    if profile.biography_mentions:
+        profile_data["bio_mentions"] = profile.biography_mentions
+    if profile.biography_hashtags:
+        profile_data["bio_hashtags"] = profile.biography_hashtags
+    return profile_data
+
+
+def _post_info(post, resolve=True):
+    """איסוף metadata של פוסט. resolve=False - רק מהנתונים שכבר נטענו, בלי בקשות לכתובת הווידאו ולמיקום"""
+    comments_count = embedded_comment_count(post)
+    if resolve:
+        video_url = post.video_url if post.is_video else None
+        location = post.location.name if post.location else None
+    else:
+        video_url = post._node.get("video_url") if post.is_video else None
+        location = (post._node.get("location") or (post._node.get("iphone_struct") or {}).get("location") or {}).get("name")
+    return {
+        "shortcode": post.shortcode,
+        "date": post.date_local.isoformat(),
+        "likes": post.likes,
+        "comments_count": post.comments if comments_count is None else comments_count,
+        "caption": post.caption,
+        "caption_hashtags": post.caption_hashtags,
+        "caption_mentions": post.caption_mentions,
+        "is_video": post.is_video,
+        "video_url": video_url,
+        "url": f"https://www.instagram.com/p/{post.shortcode}/",
+        "location": location,
+        "media_info": post_media_info(post),
+    }
+
+
+def scan_profile(L, username, output_dir, options=None, stop_event=None, media=None, metrics=None, sink=None,
+                 on_tier=None, profile_cache=None):
+    """
+    סורק פרופיל אחד לתוך output_dir: רשומות הריצה נכתבות בזרימה ל-records/ ו-profile_data.json מסכם אותן.
+    חריגות של instaloader (פרופיל לא קיים, פרטי, שגיאת חיבור) עוברות הלאה לקורא.
+    stop_event (threading.Event) מאפשר לעצור באמצע עם checkpoint שמור - ScanInterrupted.
+    media - MediaPipeline משותף להורדת המדיה; בלעדיו נפתח pipeline לסריקה הזו וממתינים לסיומו.
+    metrics - MetricsRecorder משותף לריצה; בלעדיו המדידות נשמרות רק בסיכום של הפרופיל (stats["metrics"]).
+    sink - RecordSink (למשל PostgresSink) שמקבל כל רשומה במקביל לקובץ הרשומות.
+    options.deadline / options.request_budget - סריקה מדורגת (_scan_tiered); on_tier(username, tier, state)
+    נקרא אחרי שכל שכבה מתפרסמת.
+    profile_cache - ProfileCache: מתעדכן מכל פרופיל שנטען, ומחליף את הבקשה בתוך options.profile_max_age.
+    """
+    options = options or ScanOptions()
+    metrics = metrics or MetricsRecorder()
+    os.makedirs(output_dir, exist_ok=True)
+    if media is None:
+        media = MediaPipeline(workers=options.media_workers)
+        try:
+            result = scan_profile(L, username, output_dir, options, stop_event, media, metrics, sink, on_tier,
+                                  profile_cache)
+        finally:
+            media.close()
+        result["stats"]["media"] = media.stats(username)
+        return result
+
+    metrics.install(L.context)
+    with metrics.profile(username):
+        if options.deadline or options.request_budget:
+            return _scan_tiered(L, username, output_dir, options, stop_event, media, metrics, sink, on_tier,
+                                profile_cache)
+        return _scan_profile(L, username, output_dir, options, stop_event, media, metrics, sink, profile_cache)
+
+
+def _load_profile(L, username, metrics, options, profile_cache):
+    _log(username, "📥 טוען פרופיל...")
+    with metrics.span("profile"):
+        if profile_cache is not None:
+            profile = profile_cache.profile(L.context, username, options.profile_max_age)
+        else:
+            profile = instaloader.Profile.from_username(L.context, username)
+        profile_data = _profile_info(profile)
+    _log(username, f"✅ פרופיל נטען: {profile.full_name} | 👥 {profile.followers:,} עוקבים | 📸 {profile.mediacount:,} פוסטים")
+
+    if profile.is_private and not L.context.is_logged_in:
+        raise instaloader.exceptions.PrivateProfileNotFollowedException(
+            f"הפרופיל {username} פרטי ונדרשת התחברות ועקיבה אחריו")
+    return profile, profile_data
+
+
+def _start_run(checkpoint, output_dir, compression):
+    """
+    פותח ריצה או ממשיך את זו שנקטעה. ריצה שקובץ הרשומות שלה כבר קיבל את השם הסופי (קריסה בין finalize
+    ל-complete_run) נסגרת קודם - אחרת הריצה שממשיכה אותה הייתה דורסת את הקובץ
+    """
+    run = checkpoint.run
+    if run is not None and os.path.isfile(run_records_path(output_dir, run["run_id"], run["compression"])):
+        checkpoint.complete_run()
+    return checkpoint.start_run(compression)
+
+
+def _scan_profile(L, username, output_dir, options, stop_event, media, metrics, sink, profile_cache):
+    profile, profile_data = _load_profile(L, username, metrics, options, profile_cache)
+
+    # ממשיך מה-checkpoint אם הריצה הקודמת נקטעה - כולל אותו קובץ רשומות
+    checkpoint = CheckpointStore(output_dir)
+    run = _start_run(checkpoint, output_dir, options.compression)
+    stream = RecordStream(run_records_path(output_dir, run["run_id"], run["compression"]), run["compression"], sink)
+    try:
+        stream.write({"type": "profile", **profile_data, "userid": profile.userid})
+        stats = _scan_content(L, profile, username, output_dir, options, stop_event, checkpoint, stream, media,
+                              metrics)
+    except BaseException:
+        stream.close()
+        raise
+
+    stats["metrics"] = metrics.profile_summary(username)
+    # קודם השם הסופי ורק אז "מוכרים": קריסה ביניהם משאירה ריצה פתוחה ש-_start_run סוגר, ולא פוסטים מוכרים
+    # שהרשומות שלהם נשארו ב-.part יתום
+    stream.finalize()
+    checkpoint.complete_run()
+    output_file = write_summary(output_dir, profile_data, stats)
+    _log(username, f"💾 {stats['total_posts_scanned']} פוסטים נסרקו | סיכום: {output_file}")
+    return {"profile": profile_data, "stats": stats, "records_file": stream.path, "summary_file": output_file}
+
+
+def _scan_tiered(L, username, output_dir, options, stop_event, media, metrics, sink, on_tier, profile_cache):
+    """
+    סריקה מדורגת בתקציב: פרופיל וביו, ה-metadata של RECENT_POSTS הפוסטים האחרונים, סטוריז והיילייטס,
+    ורק אז היסטוריה עמוקה ומדיה. כל שכבה מתפרסמת כשהיא מסתיימת, כך שיש נתונים שמישים אחרי שניות.
+    כשהתקציב נגמר הסריקה חוזרת כרגיל עם מה שנאסף (stats["stopped"]): קובץ הרשומות נשאר .part וה-checkpoint פתוח,
+    והריצה הבאה - מדורגת או מלאה - ממשיכה מאותה נקודה. מדיה שלא ירדה נשארת ברשומות (fetch_media).
+    """
+    budget = ScanBudget(options.deadline, options.request_budget, metrics, username, stop_event)
+    profile, profile_data = _load_profile(L, username, metrics, options, profile_cache)
+    checkpoint = CheckpointStore(output_dir)
+    run = _start_run(checkpoint, output_dir, options.compression)
+    stream = RecordStream(run_records_path(output_dir, run["run_id"], run["compression"]), run["compression"], sink)
+    state = {"username": username, "run_id": run["run_id"], "started_at": datetime.now().isoformat(),
+             "deadline": options.deadline, "request_budget": options.request_budget, "tiers": {},
+             "complete": False, "stopped": None}
+    comment_stats = new_comment_stats()
+    stats = {"total_posts_scanned": run["posts_done"], "stopped_at_known_post": False, "resumed": run["posts_done"] > 0,
+             "stories_downloaded": 0, "highlights_downloaded": 0, "highlights": None, "media_files_queued": 0,
+             "media_files_deferred": 0, "comments": comment_stats, "tiers": [], "stopped": None}
+
+    def _publish(tier):
+        if sink is not None:
+            sink.flush()
+        stats["tiers"].append(tier)
+        stats["budget"] = {"elapsed_sec": round(budget.elapsed(), 2), "requests": budget.requests_used()}
+        state["tiers"][tier] = {"at": datetime.now().isoformat(), **stats["budget"]}
+        output_file = _write_partial_summary(output_dir, profile_data, stats, stream)
+        write_json_atomic(os.path.join(output_dir, TIERS_FILE), state, indent=2)
+        _log(username, f"🚀 שכבה {tier} פורסמה | {stats['budget']['elapsed_sec']} שניות, "
+                       f"{stats['budget']['requests']} בקשות")
+        if on_tier is not None:
+            on_tier(username, tier, state)
+        return output_file
+
+    engagement = EngagementLog(output_dir)
+    try:
+        stream.write({"type": "profile", **profile_data, "userid": profile.userid})
+        _publish("profile")
+        if budget.is_set():
+            raise ScanInterrupted(budget.exhausted())
+
+        # המדיה של השכבות הראשונות רק מתוכננת ברשומות, ויורדת בשכבה האחרונה אם נשאר תקציב
+        recent = dataclasses.replace(options, max_posts=min(RECENT_POSTS, options.max_posts), metadata_only=True,
+                                     refresh_engagement=0)
+        with metrics.span("posts"):
+            post_count, _, stopped_at_known, _, _ = _scan_posts(
+                profile, username, output_dir, recent, budget, checkpoint, stream, media, metrics, comment_stats,
+                L.context.is_logged_in, engagement, continuing=True)
+        stats.update(total_posts_scanned=post_count, stopped_at_known_post=stopped_at_known)
+        _publish("recent_posts")
+        if budget.is_set():
+            raise ScanInterrupted(budget.exhausted())
+
+        stories, highlights, highlight_stats, _ = _scan_reels(L, profile, username, output_dir, checkpoint,
+                                                                     stream, media, metrics, defer=True)
+        stats.update(stories_downloaded=stories, highlights_downloaded=highlights, highlights=highlight_stats)
+        _publish("highlights")
+        if budget.is_set():
+            raise ScanInterrupted(budget.exhausted())
+
+        if not options.metadata_only:
+            stats["media_files_queued"] += _submit_recorded_media(profile, username, output_dir, stream, media,
+                                                                  budget)
+        if not stopped_at_known and post_count < options.max_posts:
+            with metrics.span("posts"):
+                post_count, _, stopped_at_known, posts_media, refreshed = _scan_posts(
+                    profile, username, output_dir, options, budget, checkpoint, stream, media, metrics,
+                    comment_stats, L.context.is_logged_in, engagement, continuing=True)
+            stats.update(total_posts_scanned=post_count, stopped_at_known_post=stopped_at_known)
+            stats["media_files_queued" if not options.metadata_only else "media_files_deferred"] += posts_media
+        if not options.metadata_only and not media.wait(username, budget.remaining()):
+            raise ScanInterrupted("deadline")
+    except ScanInterrupted:
+        reason = budget.exhausted() or "deadline"
+        if reason == "stopped":
+            stream.close()
+            raise
+        # התקציב נגמר: מה שנאסף נשאר מפורסם, וההורדות שעוד בתור נדחות להורדה לפי דרישה
+        media.cancel(username)
+        stream.close()
+        # גם עצירה לפני הפוסט הראשון משאירה את הריצה פתוחה, כך שהריצה הבאה ממשיכה לתוך אותו קובץ .part
+        checkpoint.save()
+        stats["stopped"] = state["stopped"] = reason
+        stats["total_posts_scanned"] = checkpoint.run["posts_done"]
+        stats["budget"] = {"elapsed_sec": round(budget.elapsed(), 2), "requests": budget.requests_used()}
+        stats["metrics"] = metrics.profile_summary(username)
+        output_file = _write_partial_summary(output_dir, profile_data, stats, stream)
+        write_json_atomic(os.path.join(output_dir, TIERS_FILE), state, indent=2)
+        _log(username, f"⏱️  התקציב נגמר ({reason}) אחרי השכבות: {', '.join(stats['tiers'])} - "
+                       f"הריצה הבאה תמשיך מה-checkpoint")
+        return {"profile": profile_data, "stats": stats, "records_file": stream.part_path,
+                "summary_file": output_file}
+    except BaseException:
+        stream.close()
+        raise
+    finally:
+        engagement.close()
+        stats["engagement"] = dict(engagement.stats)
+
+    stats["metrics"] = metrics.profile_summary(username)
+    stream.finalize()
+    checkpoint.complete_run()
+    state["complete"] = True
+    output_file = _publish("history")
+    _log(username, f"💾 {stats['total_posts_scanned']} פוסטים נסרקו בכל השכבות | סיכום: {output_file}")
+    return {"profile": profile_data, "stats": stats, "records_file": stream.path, "summary_file": output_file}
+
+
+def _write_partial_summary(output_dir, profile_data, stats, stream):
+    # הסיכום כולל גם את ה-.part של הריצה הפתוחה, כך שכל שכבה שהסתיימה כבר נראית בו
+    part = [stream.part_path] if os.path.isfile(stream.part_path) else []
+    return write_summary(output_dir, profile_data, stats, list_record_files(output_dir) + part)
+
+
+def _submit_recorded_media(profile, username, output_dir, stream, media, budget):
+    """מכניס לתור את המדיה שתוכננה בשכבות הקודמות (ותמונת הפרופיל), כל עוד נשאר תקציב; מחזיר כמה קבצים"""
+    jobs = [_profile_pic_job(profile, output_dir, username)]
+    for record in iter_records(stream.part_path):
+        if record.get("type") in MEDIA_RECORD_TYPES:
+            jobs.extend(record_media_jobs(record))
+    queued = 0
+    for job in jobs:
+        if budget.is_set():
+            break
+        if not os.path.isfile(job.filename):
+            media.submit(job)
+            queued += 1
+    return queued
+
+
+def _profile_pic_job(profile, output_dir, username):
+    # שם הקובץ ב-CDN משתנה רק כשהתמונה מתחלפת
+    pic_name = os.path.splitext(profile.profile_pic_url.split('/')[-1].split('?')[0])[0]
+    return MediaJob(profile.profile_pic_url, os.path.join(output_dir, f"profile_pic_{pic_name}"), owner=username)
+
+
+def _enqueue(media, jobs, defer=False):
+    """מכניס את ההורדות לתור ומחזיר את התיאור שלהן לרשומה; defer - רק התיאור, בלי להוריד"""
+    if not defer:
+        media.submit_all(jobs)
+    return [job.describe() for job in jobs]
+
+
+def _scan_content(L, profile, username, output_dir, options, stop_event, checkpoint, stream, media, metrics):
+    media_queued = 0
+    comment_stats = new_comment_stats()
+
+    # תמונת פרופיל
+    if not options.metadata_only:
+        with metrics.span("profile_pic"):
+            media.submit(_profile_pic_job(profile, output_dir, username))
+        media_queued += 1
+    stories_downloaded, highlights_downloaded, highlight_stats, reels_media = _scan_reels(
+        L, profile, username, output_dir, checkpoint, stream, media, metrics, options.metadata_only)
+    media_queued += reels_media
+
+    # הורדת פוסטים
+    engagement = EngagementLog(output_dir)
+    try:
+        with metrics.span("posts"):
+            post_count, resumed, stopped_at_known, posts_media, refreshed = _scan_posts(
+                profile, username, output_dir, options, stop_event, checkpoint, stream, media, metrics, comment_stats,
+                L.context.is_logged_in, engagement)
+    finally:
+        engagement.close()
+    media_queued += posts_media
+
+    if stopped_at_known:
+        _log(username, f"⏹️  הגעתי לפוסט שכבר נאסף - {post_count} פוסטים חדשים")
+    if refreshed:
+        _log(username, f"📈 מעורבות עודכנה ל-{refreshed} פוסטים מוכרים | {engagement.stats['changed']} שינויים נרשמו")
+
+    return {
+        "total_posts_scanned": post_count,
+        "stopped_at_known_post": stopped_at_known,
+        "resumed": resumed,
+        "stories_downloaded": stories_downloaded,
+        "highlights_downloaded": highlights_downloaded,
+        "highlights": highlight_stats,
+        # במצב metadata_only הקבצים רק מתוכננים ברשומות ולא נכנסים לתור
+        "media_files_queued": 0 if options.metadata_only else media_queued,
+        "media_files_deferred": media_queued if options.metadata_only else 0,
+        "comments": comment_stats,
+        "engagement": {**engagement.stats, "refreshed": refreshed},
+    }
+
+
+def _scan_reels(L, profile, username, output_dir, checkpoint, stream, media, metrics, defer):
+    """סטוריז והיילייטס (רק עם התחברות): (פריטי סטורי, פריטי היילייט חדשים, סטטיסטיקת היילייטס, קבצי מדיה)"""
+    media_queued = 0
+    storyitem_jobs = storyitem_media_plan if defer else storyitem_media_jobs
+
+    # סטוריז והיילייטס זמינים רק עם התחברות
+    stories_downloaded = 0
+    highlights_downloaded = 0
+    highlight_stats = None
+    if L.context.is_logged_in and not checkpoint.is_phase_done("stories"):
+        with metrics.span("stories"):
+            try:
+                for story in L.get_stories(userids=[profile.userid]):
+                    for item in story.get_items():
+                        try:
+                            files = _enqueue(media, storyitem_jobs(item, os.path.join(output_dir, "stories"), username),
+                                             defer)
+                            media_queued += len(files)
+                            stream.write({"type": "story_item", "username": username, **story_item_info(item),
+                                          "media": files})
+                            stories_downloaded += 1
+                        except Exception as e:
+                            metrics.count("errors")
+                            _log(username, f"⚠️  שגיאה בהורדת פריט סטורי: {str(e)}")
+                checkpoint.mark_phase_done("stories")
+            except Exception as e:
+                metrics.count("errors")
+                _log(username, f"⚠️  לא ניתן להוריד סטוריז: {str(e)}")
+
+    if L.context.is_logged_in and not checkpoint.is_phase_done("highlights"):
+        with metrics.span("highlights"):
+            try:
+                def _item_error(message):
+                    metrics.count("errors")
+                    _log(username, f"⚠️  {message}")
+
+                # רק היילייטס חדשים או כאלה שנוספו להם פריטים - לפי האינדקס של הסריקות הקודמות
+                highlight_stats, highlights_media = sync_highlights(L, profile, username, output_dir, media, stream,
+                                                                    _item_error, defer)
+                media_queued += highlights_media
+                highlights_downloaded = highlight_stats["new_items"]
+                checkpoint.mark_phase_done("highlights")
+            except Exception as e:
+                metrics.count("errors")
+                _log(username, f"⚠️  לא ניתן להוריד היילייטס: {str(e)}")
+    if L.context.is_logged_in:
+        unchanged = f" ({highlight_stats['unchanged']}/{highlight_stats['total']} ללא שינוי)" if highlight_stats else ""
+        _log(username, f"📱 סטוריז: {stories_downloaded} | 🎬 היילייטס: {highlights_downloaded} חדשים{unchanged}")
+
+    return stories_downloaded, highlights_downloaded, highlight_stats, media_queued
+
+
+def _observe(engagement, stream, username, post):
+    # שורה להיסטוריה ורשומת engagement לזרם - רק כשהמונים השתנו
+    point = engagement.observe_post(post)
+    if point is not None:
+        stream.write({"type": "engagement", "username": username, **point})
+
+
+def _scan_posts(profile, username, output_dir, options, stop_event, checkpoint, stream, media, metrics,
+                comment_stats, logged_in, engagement, continuing=False):
+    """
+    המעבר על הפוסטים: (פוסטים שנסרקו, האם המשיך מ-checkpoint, האם נעצר בפוסט מוכר, קבצי מדיה בתור,
+    פוסטים מוכרים שהמעורבות שלהם עודכנה).
+    continuing - המשך של אותה ריצה (שכבה קודמת בסריקה מדורגת), ולא ריצה שנקטעה.
+    """
+    run = checkpoint.run
+    media_queued = 0
+    posts_iterator = profile.get_posts()
+    if run["posts_done"]:
+        if not checkpoint.resume_iterator(posts_iterator):
+            _log(username, f"⏯️  לא ניתן לשחזר את מיקום הסריקה, עובר שוב מההתחלה ומדלג על {run['posts_done']} פוסטים")
+        elif not continuing:
+            _log(username, f"⏯️  ממשיך סריקה שנקטעה אחרי {run['posts_done']} פוסטים")
+
+    resumed = run["posts_done"] > 0 and not continuing
+    post_count = run["posts_done"]
+    stopped_at_known = False
+    refreshed = 0
+    for post in posts_iterator:
+        if stop_event is not None and stop_event.is_set():
+            checkpoint.save_iterator(posts_iterator)
+            raise ScanInterrupted(f"הסריקה של {username} נעצרה אחרי {post_count} פוסטים")
+        if stopped_at_known:
+            # אחרי העצירה: רק המונים מהדף שכבר נטען (12 פוסטים לבקשה), בלי רשומות פוסט ובלי מדיה
+            if refreshed >= options.refresh_engagement:
+                break
+            _observe(engagement, stream, username, post)
+            refreshed += 1
+            continue
+        if post_count >= options.max_posts:
+            break
+        if checkpoint.is_captured(post.shortcode):
+            continue
+        if options.incremental and checkpoint.is_known(post.shortcode):
+            # פוסטים נעוצים מופיעים ראשונים גם כשהם ישנים - מדלגים עליהם ולא עוצרים
+            if post.is_pinned:
+                if options.refresh_engagement:
+                    _observe(engagement, stream, username, post)
+                continue
+            stopped_at_known = True
+            if not options.refresh_engagement:
+                break
+            _observe(engagement, stream, username, post)
+            refreshed += 1
+            continue
+        post_count += 1
+
+        written = False
+        with metrics.span("post", shortcode=post.shortcode):
+            try:
+                # המדיה נכנסת לתור ההורדות, והסריקה ממשיכה מיד לפוסט הבא
+                post_info = _post_info(post, resolve=not options.metadata_only)
+                if options.metadata_only:
+                    post_info["media"] = _enqueue(media, post_media_plan(post, output_dir, username), defer=True)
+                else:
+                    post_info["media"] = _enqueue(media, post_media_jobs(post, output_dir, username))
+                media_queued += len(post_info["media"])
+                try:
+                    with metrics.span("comments", shortcode=post.shortcode):
+                        post_info["comments"] = collect_comments(post, options.max_comments_per_post, comment_stats,
+                                                                 options.comments_mode, logged_in)
+                except Exception as e:
+                    metrics.count("errors")
+                    post_info["comments"] = []
+                    _log(username, f"⚠️  שגיאה בתגובות של {post.shortcode}: {str(e)}")
+                stream.write({"type": "post", "username": username, **post_info})
+                written = True
+                _observe(engagement, stream, username, post)
+            except Exception as e:
+                metrics.count("errors")
+                _log(username, f"⚠️  שגיאה בפוסט {post.shortcode}: {str(e)}")
+        if written:
+            checkpoint.record_post(post, posts_iterator)
+        else:
+            # פוסט בלי רשומה לא נכנס ל-captured, ולכן גם לא יהפוך ל"מוכר" - הסריקה הבאה תנסה אותו שוב
+            checkpoint.save_iterator(posts_iterator)
+
+        if post_count % 10 == 0:
+            _log(username, f"✅ הושלמו {post_count}/{options.max_posts} פוסטים")
+    return post_count, resumed, stopped_at_known, media_queued, refreshed
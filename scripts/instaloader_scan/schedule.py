@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+לוח רענון אדפטיבי לפי קצב הפרסום של כל משפיען
+הקצב נלמד מהתאריכים שכבר נאספו ברשומות (פוסטים ופריטי סטורי), ולכל פרופיל ולכל סוג תוכן נקבע מועד בדיקה הבא:
+בערך כשצפוי פריט חדש אחד. יוצר שמפרסם כל שעה נבדק כל שעה, ויוצר שלא פרסם חודשים - פעם בשבוע.
+כל הצי נכנס לתקציב בקשות גלובלי לשעה: אם הביקוש גבוה מהתקציב, כל המרווחים נמתחים באותו יחס,
+ובכל סבב נשלחות רק הבדיקות שהכי באיחור, עד מה שנשאר מהתקציב בשעה האחרונה.
+המצב נשמר ב-SQLite בתיקיית הפלט, כך שהמתזמן של הסריקות ופולר הסטוריז חולקים את אותו תקציב.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from .checkpoint import CheckpointStore
+from .stories import USERIDS_PER_QUERY
+from .stream import RECORDS_DIR, iter_records, list_record_files
+
+SCHEDULE_DB = ".refresh_schedule.db"
+CONTENT_TYPES = ("posts", "stories")
+HOURLY_BUDGET = 200
+# בדיקה כשצפויים בערך כמה פריטים חדשים (סטוריז מגיעים ברצף, ולכן יותר מאחד)
+TARGET_ITEMS = {"posts": 1.0, "stories": 3.0}
+MIN_INTERVAL_HOURS = {"posts": 1.0, "stories": 1.0}
+# סטוריז נעלמים אחרי 24 שעות - גם פרופיל שקט נבדק לפני שפריט יכול להיעלם
+MAX_INTERVAL_HOURS = {"posts": 7 * 24.0, "stories": 20.0}
+# כמה מהפוסטים האחרונים קובעים את הקצב, ובאיזה חלון נספרים פריטי הסטורי
+RECENT_POSTS = 12
+STORY_WINDOW_HOURS = 7 * 24.0
+# בדיקת פוסטים בסריקה אינקרמנטלית: פרופיל, הדף הראשון של הפוסטים, ועוד בקשה לסטוריז / היילייטס
+POST_CHECK_REQUESTS = 3
+POSTS_PER_PAGE = 12
+DEFAULT_MAX_POSTS = 150
+# בקשת GraphQL ובקשת reels_media לכל קבוצה של משתמשים
+STORY_CHECK_REQUESTS = 2 / USERIDS_PER_QUERY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule (
+    username TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    fingerprint TEXT,
+    rate_per_hour REAL NOT NULL DEFAULT 0,
+    items INTEGER NOT NULL DEFAULT 0,
+    last_item REAL,
+    last_check REAL,
+    interval_hours REAL,
+    next_check REAL,
+    PRIMARY KEY (username, content_type)
+);
+CREATE TABLE IF NOT EXISTS dispatches (
+    at REAL NOT NULL,
+    content_type TEXT NOT NULL,
+    username TEXT NOT NULL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dispatches_by_time ON dispatches (at);
+"""
+
+
+def _epoch(value):
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def _fingerprint(output_dir):
+    # מספר קבצי הרשומות והשינוי האחרון בהם - הקצב נלמד מחדש רק כשנוספו רשומות
+    files = list_record_files(output_dir)
+    return f"{len(files)}:{max((os.path.getmtime(path) for path in files), default=0):.0f}"
+
+
+def learn_cadence(output_dir, now=None):
+    """
+    הקצב של פרופיל אחד מהרשומות שלו: {content_type: (פריטים לשעה, פריטים שנספרו, זמן הפריט האחרון)}.
+    פוסטים: RECENT_POSTS האחרונים לאורך החלון מהישן שבהם ועד עכשיו - כך שתקופת שקט מאז הפוסט האחרון
+    מורידה את הקצב מעצמה. סטוריז: הפריטים ב-STORY_WINDOW_HOURS האחרונות.
+    """
+    now = now or time.time()
+    post_dates = {}
+    story_dates = {}
+    for path in list_record_files(output_dir):
+        for record in iter_records(path):
+            record_type = record.get("type")
+            if record_type == "post":
+                post_dates[record["shortcode"]] = _epoch(record.get("date"))
+            elif record_type == "story_item":
+                story_dates[record.get("id")] = _epoch(record.get("date"))
+
+    recent = sorted((date for date in post_dates.values() if date), reverse=True)[:RECENT_POSTS]
+    posts_rate = 0.0
+    if len(recent) >= 2:
+        posts_rate = len(recent) / max((now - recent[-1]) / 3600, 1.0)
+    elif recent:
+        posts_rate = 1 / max((now - recent[0]) / 3600, 1.0)
+    window_start = now - STORY_WINDOW_HOURS * 3600
+    stories = [date for date in story_dates.values() if date and date >= window_start]
+    return {
+        "posts": (posts_rate, len(recent), recent[0] if recent else None),
+        "stories": (len(stories) / STORY_WINDOW_HOURS, len(stories), max(stories, default=None)),
+    }
+
+
+def _interval(content_type, rate):
+    if rate <= 0:
+        return MAX_INTERVAL_HOURS[content_type]
+    return min(max(TARGET_ITEMS[content_type] / rate, MIN_INTERVAL_HOURS[content_type]),
+               MAX_INTERVAL_HOURS[content_type])
+
+
+def check_cost(content_type, entry=None):
+    """בקשות משוערות לבדיקה אחת; פרופיל שעוד לא נסרק עולה סריקה מלאה"""
+    if content_type == "stories":
+        return STORY_CHECK_REQUESTS
+    if entry is not None and not entry["items"] and entry["last_check"] is None:
+        return POST_CHECK_REQUESTS + math.ceil(DEFAULT_MAX_POSTS / POSTS_PER_PAGE)
+    return POST_CHECK_REQUESTS
+
+
+def post_depth(entry, now=None):
+    """
+    max_posts לבדיקה: מה שצפוי להתפרסם מאז הבדיקה הקודמת (או הפוסט האחרון שנאסף), עם מרווח ודף אחד לפחות.
+    None - פרופיל שעוד לא נסרק, סריקה מלאה.
+    """
+    since = entry["last_check"] or entry["last_item"]
+    if since is None:
+        return None
+    elapsed = max((now or time.time()) - since, 0) / 3600
+    return min(DEFAULT_MAX_POSTS, math.ceil(entry["rate_per_hour"] * elapsed * 1.5) + POSTS_PER_PAGE)
+
+
+class RefreshScheduler:
+    """
+    {output_root}/.refresh_schedule.db: שורה לכל (פרופיל, סוג תוכן) עם הקצב שנלמד, המרווח ומועד הבדיקה הבא,
+    ו-dispatches - הבדיקות שנשלחו והעלות המשוערת שלהן, לחישוב מה שנשאר מהתקציב בשעה האחרונה.
+    חיבור SQLite נפרד לכל thread, וכמה תהליכים (מתזמן הסריקות ופולר הסטוריז) עובדים על אותו קובץ.
+    """
+
+    def __init__(self, output_root, hourly_budget=HOURLY_BUDGET, path=None):
+        self.output_root = output_root
+        self.hourly_budget = hourly_budget
+        self.path = path or os.path.join(output_root, SCHEDULE_DB)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return self._local.db
+
+    def _entries(self, usernames):
+        rows = self._db().execute("SELECT * FROM schedule").fetchall()
+        wanted = set(usernames)
+        return [dict(row) for row in rows if row["username"] in wanted]
+
+    def learn(self, usernames, now=None):
+        """מעדכן את הקצב של כל פרופיל שנוספו לו רשומות מאז הפעם הקודמת; מחזיר כמה פרופילים נלמדו מחדש"""
+        now = now or time.time()
+        db = self._db()
+        known = {row["username"]: row["fingerprint"] for row in
+                 db.execute("SELECT username, fingerprint FROM schedule WHERE content_type = 'posts'")}
+        learned = 0
+        for username in usernames:
+            output_dir = os.path.join(self.output_root, username)
+            fingerprint = _fingerprint(output_dir) if os.path.isdir(os.path.join(output_dir, RECORDS_DIR)) else None
+            if username in known and known[username] == fingerprint:
+                continue
+            cadence = learn_cadence(output_dir, now) if fingerprint else {}
+            completed = CheckpointStore(output_dir).last_completed_at if fingerprint else None
+            for content_type in CONTENT_TYPES:
+                rate, items, last_item = cadence.get(content_type, (0.0, 0, None))
+                db.execute("INSERT INTO schedule (username, content_type, fingerprint, rate_per_hour, items, "
+                           "last_item, last_check) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                           "ON CONFLICT (username, content_type) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                           "rate_per_hour = excluded.rate_per_hour, items = excluded.items, "
+                           "last_item = excluded.last_item, last_check = MAX(COALESCE(schedule.last_check, excluded.last_check), "
+                           "COALESCE(excluded.last_check, schedule.last_check))",
+                           (username, content_type, fingerprint, rate, items, last_item,
+                            _epoch(completed) if content_type == "posts" else None))
+            learned += 1
+        return learned
+
+    def plan(self, usernames, now=None):
+        """
+        לומד את הקצבים ומחשב לכל פרופיל וסוג תוכן את המרווח ומועד הבדיקה הבא, בתוך התקציב לשעה.
+        מחזיר (השורות, יחס המתיחה של המרווחים, בקשות לשעה אחרי ההתאמה).
+        """
+        now = now or time.time()
+        self.learn(usernames, now)
+        entries = self._entries(usernames)
+        for entry in entries:
+            entry["cost"] = check_cost(entry["content_type"], entry)
+            entry["desired_hours"] = _interval(entry["content_type"], entry["rate_per_hour"])
+
+        def _demand(stretch):
+            return sum(entry["cost"] / min(entry["desired_hours"] * stretch,
+                                           MAX_INTERVAL_HOURS[entry["content_type"]]) for entry in entries)
+
+        # המתיחה הקטנה ביותר שבה הביקוש נכנס לתקציב (חיפוש בינארי; המרווחים לא עוברים את המקסימום)
+        stretch = 1.0
+        if entries and _demand(1.0) > self.hourly_budget:
+            low, high = 1.0, 1.0
+            while _demand(high) > self.hourly_budget and high < 1e4:
+                high *= 2
+            for _ in range(30):
+                middle = (low + high) / 2
+                low, high = (middle, high) if _demand(middle) > self.hourly_budget else (low, middle)
+            stretch = high
+
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for entry in entries:
+                entry["interval_hours"] = min(entry["desired_hours"] * stretch,
+                                              MAX_INTERVAL_HOURS[entry["content_type"]])
+                # בלי בדיקה קודמת - מיד; אחרת מהבדיקה האחרונה
+                entry["next_check"] = (entry["last_check"] + entry["interval_hours"] * 3600
+                                       if entry["last_check"] is not None else now)
+                db.execute("UPDATE schedule SET interval_hours = ?, next_check = ? "
+                           "WHERE username = ? AND content_type = ?",
+                           (entry["interval_hours"], entry["next_check"], entry["username"], entry["content_type"]))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return entries, round(stretch, 3), round(_demand(stretch), 2)
+
+    def spent(self, now=None):
+        """העלות המשוערת של הבדיקות שנשלחו בשעה האחרונה, מכל התהליכים"""
+        now = now or time.time()
+        row = self._db().execute("SELECT COALESCE(SUM(cost), 0) FROM dispatches WHERE at > ?", (now - 3600,)).fetchone()
+        return row[0]
+
+    def due(self, usernames, content_type, now=None):
+        """
+        הבדיקות של content_type שהגיע זמנן, מהמאחרת ביותר (ביחס למרווח שלה), עד מה שנשאר מהתקציב לשעה.
+        כל שורה כוללת גם max_posts לבדיקת פוסטים (post_depth).
+        """
+        now = now or time.time()
+        entries, _, _ = self.plan(usernames, now)
+        ready = [entry for entry in entries if entry["content_type"] == content_type and entry["next_check"] <= now]
+        ready.sort(key=lambda entry: (now - entry["next_check"]) / (entry["interval_hours"] * 3600), reverse=True)
+        remaining = self.hourly_budget - self.spent(now)
+        selected = []
+        for entry in ready:
+            # בדיקה שיקרה מכל התקציב (סריקה ראשונה מלאה) יוצאת לבד, כשהשעה האחרונה ריקה
+            if entry["cost"] > remaining and (selected or remaining < self.hourly_budget):
+                continue
+            remaining -= entry["cost"]
+            if content_type == "posts":
+                entry["max_posts"] = post_depth(entry, now)
+            selected.append(entry)
+        return selected
+
+    def mark_checked(self, entries, now=None):
+        """רושם שהבדיקות נשלחו: מועד הבדיקה הבא מתחיל מעכשיו, והעלות נספרת בתקציב"""
+        now = now or time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for entry in entries:
+                db.execute("UPDATE schedule SET last_check = ?, next_check = ? WHERE username = ? AND content_type = ?",
+                           (now, now + entry["interval_hours"] * 3600, entry["username"], entry["content_type"]))
+                db.execute("INSERT INTO dispatches (at, content_type, username, cost) VALUES (?, ?, ?, ?)",
+                           (now, entry["content_type"], entry["username"], entry["cost"]))
+            db.execute("DELETE FROM dispatches WHERE at < ?", (now - 24 * 3600,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        if hasattr(self._local, "db"):
+            self._local.db.close()
+            del self._local.db
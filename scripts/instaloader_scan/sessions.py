@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+מאגר sessions של כמה חשבונות התחברות
+כל סריקה מקבלת את החשבון הבריא ביותר כרגע; חסימות מורידות את ציון הבריאות, הצלחות מעלות אותו,
+וחשבון שקיבל challenge/checkpoint או שנותק יוצא מהסבב עד סוף הריצה.
+ה-sessions נטענים רק מקבצים שמורים - המאגר אף פעם לא מבקש סיסמה או קוד.
+"""
+
+import threading
+import time
+from collections import deque
+
+import instaloader
+
+from .loader import SESSION_FILE, build_loader, load_session
+from .ratecontrol import rate_stats, shared_rate_controller
+
+ANONYMOUS_ACCOUNT = "anonymous"
+# חסימות מהחצי שעה האחרונה נחשבות "היסטוריה קרובה"
+THROTTLE_WINDOW = 30 * 60.0
+SUCCESS_BONUS = 0.05
+THROTTLE_PENALTY = 0.15
+ERROR_PENALTY = 0.3
+# כל סריקה שרצה כרגע על החשבון מורידה ממנו קצת, כדי לפזר עומס בין חשבונות בריאים באותה מידה
+LOAD_PENALTY = 0.05
+CHALLENGE_MARKERS = ("checkpoint_required", "challenge_required", "feedback_required", "logged out")
+
+
+def parse_account(spec, default_session_file=SESSION_FILE):
+    """'user' או 'user=session_file' -> (user, session_file)"""
+    username, _, session_file = spec.partition("=")
+    return username.strip().lstrip("@"), session_file.strip() or default_session_file
+
+
+def is_challenge(error):
+    """אינסטגרם דורשת אימות מחדש או ניתקה את ה-session - אין טעם להמשיך עם החשבון הזה"""
+    if isinstance(error, instaloader.exceptions.LoginRequiredException):
+        return True
+    message = str(error).lower()
+    return (isinstance(error, (instaloader.exceptions.AbortDownloadException,
+                               instaloader.exceptions.ConnectionException))
+            and any(marker in message for marker in CHALLENGE_MARKERS))
+
+
+class _Account:
+    def __init__(self, username, session_file):
+        self.username = username
+        self.session_file = session_file
+        self.score = 1.0
+        self.throttles = deque()
+        self.active = 0
+        self.scans = 0
+        self.failures = 0
+        self.disabled_reason = None
+
+    def recent_throttles(self, now):
+        while self.throttles and self.throttles[0] < now - THROTTLE_WINDOW:
+            self.throttles.popleft()
+        return len(self.throttles)
+
+    def priority(self, now):
+        return self.score - THROTTLE_PENALTY * self.recent_throttles(now) - LOAD_PENALTY * self.active
+
+
+class Lease:
+    """החשבון שהוקצה לסריקה אחת ו-Instaloader של ה-thread הנוכחי עבורו"""
+
+    def __init__(self, account, loader):
+        self.account = account
+        self.loader = loader
+        # החסימות נספרות על ה-context של ה-lease - ה-controller של החשבון משותף לסריקות שרצות במקביל
+        self.throttles_before = getattr(loader.context, "throttle_events", 0)
+
+    @property
+    def username(self):
+        return self.account.username if self.account else ANONYMOUS_ACCOUNT
+
+
+class SessionPool:
+    """
+    accounts - רשימת (username, session_file). רשימה ריקה - סריקה אנונימית בלבד.
+    acquire() מחזיר Lease עם Instaloader שה-session של החשבון טעון בו; release() מעדכן את הבריאות.
+    לכל thread יש Instaloader משלו לכל חשבון, וכל ה-contexts של חשבון חולקים את אותו rate controller.
+    cache - ResponseCache שעוטף את כל ה-contexts (אופציונלי).
+    """
+
+    def __init__(self, accounts, rate_state_file=None, cache=None):
+        self.rate_state_file = rate_state_file
+        self.cache = cache
+        self._accounts = [_Account(username, session_file) for username, session_file in accounts]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._loaders = []
+        for account in self._accounts:
+            # בודק מראש שה-session נטען, בלי בקשות לאינסטגרם
+            L = build_loader()
+            if not load_session(L, account.username, account.session_file):
+                account.disabled_reason = "no_session"
+            L.close()
+        if self._accounts and not self.available():
+            print("⚠️  אף session לא נטען - ממשיך ללא התחברות (ללא סטוריז והיילייטס)")
+
+    def available(self):
+        return [account for account in self._accounts if account.disabled_reason is None]
+
+    def _loader(self, account):
+        username = account.username if account else ANONYMOUS_ACCOUNT
+        loaders = self._local.__dict__.setdefault("loaders", {})
+        if username not in loaders:
+            L = build_loader(rate_controller=shared_rate_controller(username, self.rate_state_file))
+            if account is not None and not load_session(L, account.username, account.session_file):
+                self.disable(account, "no_session")
+            if self.cache is not None:
+                self.cache.install(L.context)
+            with self._lock:
+                self._loaders.append(L)
+            loaders[username] = L
+        return loaders[username]
+
+    def acquire(self, exclude=()):
+        """החשבון הבריא ביותר שעדיין בסבב (ולא ב-exclude), או context אנונימי אם אין כזה"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [account for account in self._accounts
+                          if account.disabled_reason is None and account.username not in exclude]
+            account = max(candidates, key=lambda a: a.priority(now)) if candidates else None
+            if account is not None:
+                account.active += 1
+        return Lease(account, self._loader(account))
+
+    def release(self, lease, error=None):
+        account = lease.account
+        if account is None:
+            return
+        throttles = getattr(lease.loader.context, "throttle_events", 0) - lease.throttles_before
+        with self._lock:
+            now = time.monotonic()
+            account.active -= 1
+            account.scans += 1
+            account.throttles.extend([now] * throttles)
+            account.score = max(0.0, account.score - THROTTLE_PENALTY * throttles)
+            if error is None:
+                account.score = min(1.0, account.score + SUCCESS_BONUS)
+                return
+            account.failures += 1
+            if isinstance(error, instaloader.exceptions.ConnectionException):
+                account.score = max(0.0, account.score - ERROR_PENALTY)
+        if is_challenge(error):
+            self.disable(account, "challenged")
+
+    def disable(self, account, reason):
+        with self._lock:
+            if account.disabled_reason is not None:
+                return
+            account.disabled_reason = reason
+        print(f"🚫 החשבון {account.username} הוצא מהסבב ({reason})", flush=True)
+
+    def usernames(self):
+        return [account.username for account in self._accounts] or [ANONYMOUS_ACCOUNT]
+
+    def rate_totals(self):
+        """סכום המונים של ה-rate controllers של כל החשבונות (כולל האנונימי)"""
+        totals = {"requests": 0, "wait_seconds": 0.0, "throttle_events": 0}
+        for username in {account.username for account in self._accounts} | {ANONYMOUS_ACCOUNT}:
+            stats = rate_stats(username)
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+        totals["wait_seconds"] = round(totals["wait_seconds"], 2)
+        return totals
+
+    def close(self):
+        for L in self._loaders:
+            L.close()
+
+    def report(self):
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "username": account.username,
+                "score": round(account.score, 3),
+                "scans": account.scans,
+                "failures": account.failures,
+                "recent_throttles": account.recent_throttles(now),
+                "disabled_reason": account.disabled_reason,
+                "rate": rate_stats(account.username),
+            } for account in self._accounts]
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+כתיבת רשומות הסריקה ישירות למסד נתונים, באצוות (sink)
+RecordStream מעביר לכאן כל רשומה שהוא כותב; ה-sink צובר אותן ומבצע upsert לאצווה שלמה בטרנזקציה אחת,
+יחד עם ה-checkpoint של האצווה (קובץ הרשומות והמיקום בו). כך אין צורך לקרוא את profile_data.json אחר כך
+ולהכניס פוסט אחרי פוסט, ו-load_records משלים מאותו checkpoint מה שלא נכתב (מסד שלא היה זמין, backfill).
+PostgresSink דורש psycopg 3: pip3 install "psycopg[binary,pool]"
+"""
+
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from functools import partial
+
+from .stream import iter_records, list_record_files
+
+try:
+    import psycopg
+    from psycopg import sql
+    from psycopg.types.json import Jsonb
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    psycopg = None
+
+DB_URL_ENV = "DATABASE_URL"
+BATCH_SIZE = 500
+# כמו ב-RecordStream - תאריכים וערכים אחרים שאינם JSON נשמרים כמחרוזת
+_dumps = partial(json.dumps, ensure_ascii=False, default=str)
+
+# טבלה -> (עמודות המפתח, כל העמודות)
+TABLES = {
+    "ig_profiles": (("userid",), ("userid", "username", "full_name", "biography", "followers", "followees",
+                                  "mediacount", "is_verified", "is_private", "data")),
+    "ig_posts": (("shortcode",), ("shortcode", "username", "posted_at", "likes", "comments_count", "caption",
+                                  "is_video", "location", "data")),
+    "ig_comments": (("id",), ("id", "shortcode", "owner", "text", "created_at", "likes")),
+    "ig_story_items": (("id",), ("id", "username", "shortcode", "posted_at", "is_video", "data")),
+    "ig_highlight_items": (("id",), ("id", "highlight_id", "highlight_title", "username", "shortcode", "posted_at",
+                                     "is_video", "data")),
+    "ig_engagement": (("shortcode", "observed_at"), ("shortcode", "observed_at", "username", "likes", "comments",
+                                                     "views")),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ig_profiles (
+    userid BIGINT PRIMARY KEY,
+    username TEXT NOT NULL,
+    full_name TEXT,
+    biography TEXT,
+    followers BIGINT,
+    followees BIGINT,
+    mediacount BIGINT,
+    is_verified BOOLEAN,
+    is_private BOOLEAN,
+    data JSONB,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS ig_posts (
+    shortcode TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    posted_at TIMESTAMP,
+    likes BIGINT,
+    comments_count BIGINT,
+    caption TEXT,
+    is_video BOOLEAN,
+    location TEXT,
+    data JSONB,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ig_posts_username ON ig_posts (username, posted_at DESC);
+CREATE TABLE IF NOT EXISTS ig_comments (
+    id BIGINT PRIMARY KEY,
+    shortcode TEXT NOT NULL,
+    owner TEXT,
+    text TEXT,
+    created_at TIMESTAMP,
+    likes BIGINT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ig_comments_shortcode ON ig_comments (shortcode);
+CREATE TABLE IF NOT EXISTS ig_story_items (
+    id BIGINT PRIMARY KEY,
+    username TEXT NOT NULL,
+    shortcode TEXT,
+    posted_at TIMESTAMP,
+    is_video BOOLEAN,
+    data JSONB,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS ig_highlight_items (
+    id BIGINT PRIMARY KEY,
+    highlight_id BIGINT,
+    highlight_title TEXT,
+    username TEXT NOT NULL,
+    shortcode TEXT,
+    posted_at TIMESTAMP,
+    is_video BOOLEAN,
+    data JSONB,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS ig_engagement (
+    shortcode TEXT NOT NULL,
+    observed_at TIMESTAMP NOT NULL,
+    username TEXT,
+    likes BIGINT,
+    comments BIGINT,
+    views BIGINT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (shortcode, observed_at)
+);
+CREATE TABLE IF NOT EXISTS ig_sink_checkpoints (
+    source TEXT PRIMARY KEY,
+    position BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+def _require_psycopg():
+    if psycopg is None:
+        raise RuntimeError('כתיבה ל-Postgres דורשת את psycopg 3: pip3 install "psycopg[binary,pool]"')
+
+
+def record_rows(record):
+    """השורות לטבלאות מתוך רשומה אחת: [(טבלה, {עמודה: ערך})]; רשומות מסוגים אחרים לא נכתבות"""
+    kind = record.get("type")
+    if kind == "profile" and record.get("userid"):
+        return [("ig_profiles", {**{key: record.get(key) for key in TABLES["ig_profiles"][1]}, "data": record})]
+    if kind == "post":
+        rows = [("ig_posts", {
+            "shortcode": record["shortcode"], "username": record.get("username"), "posted_at": record.get("date"),
+            "likes": record.get("likes"), "comments_count": record.get("comments_count"),
+            "caption": record.get("caption"), "is_video": record.get("is_video"), "location": record.get("location"),
+            "data": {key: value for key, value in record.items() if key != "comments"},
+        })]
+        for comment in record.get("comments") or []:
+            rows.append(("ig_comments", {"id": comment["id"], "shortcode": record["shortcode"],
+                                         "owner": comment.get("owner"), "text": comment.get("text"),
+                                         "created_at": comment.get("created_at"), "likes": comment.get("likes")}))
+        return rows
+    if kind in ("story_item", "highlight_item"):
+        table = "ig_story_items" if kind == "story_item" else "ig_highlight_items"
+        row = {"id": record["id"], "username": record.get("username"), "shortcode": record.get("shortcode"),
+               "posted_at": record.get("date"), "is_video": record.get("is_video"), "data": record}
+        if kind == "highlight_item":
+            row.update(highlight_id=record.get("highlight_id"), highlight_title=record.get("highlight_title"))
+        return [(table, row)]
+    if kind == "engagement":
+        return [("ig_engagement", {"shortcode": record["shortcode"], "observed_at": record["at"],
+                                   "username": record.get("username"), "likes": record.get("likes"),
+                                   "comments": record.get("comments"), "views": record.get("views")})]
+    return []
+
+
+class Sink(ABC):
+    """
+    הממשק של כל מה שמקבל רשומות מ-RecordStream: RecordSink, TagIndex, RagPreprocessor, RemoteSink ו-SinkGroup.
+    """
+
+    @abstractmethod
+    def write(self, record, source=None, position=None):
+        """רשומה אחת; source / position - קובץ הרשומות והמיקום שלה בו (מ-1), או None"""
+
+    @abstractmethod
+    def flush(self):
+        """סוף קובץ רשומות (RecordStream.finalize): כל מה שנצבר נכתב"""
+
+    @abstractmethod
+    def stats(self):
+        """מונים לדוח הריצה"""
+
+    @abstractmethod
+    def close(self):
+        """סוף הריצה: flush ושחרור החיבורים"""
+
+
+class RecordSink(Sink):
+    """
+    הבסיס של כל sink: צבירת שורות לאצוות (שורה אחרונה לכל מפתח מנצחת) ומעקב אחרי ה-checkpoint לכל קובץ רשומות.
+    מחלקה יורשת מממשת את _write_batch(rows, positions) - כתיבה אטומית של האצווה וה-checkpoints שלה -
+    ו-checkpoint(source). משותף לכל ה-threads של הסריקה.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        # אצווה אחת נכתבת בכל רגע, לפי הסדר - כך ה-checkpoint של קובץ רשומות רק מתקדם
+        self._write_lock = threading.Lock()
+        self._rows = defaultdict(dict)
+        self._positions = {}
+        self._pending = 0
+        # קבצי רשומות שאצווה שלהם נכשלה: ה-checkpoint שלהם לא מתקדם עד שמשלימים אותם עם load_records
+        self._failed_sources = set()
+        self._stats = defaultdict(int)
+
+    def write(self, record, source=None, position=None):
+        """מוסיף רשומה לאצווה; source / position - קובץ הרשומות והמיקום שלה בו (מ-1), ל-checkpoint"""
+        rows = record_rows(record)
+        with self._lock:
+            for table, row in rows:
+                self._rows[table][tuple(row[key] for key in TABLES[table][0])] = row
+            if source is not None and source not in self._failed_sources:
+                self._positions[source] = max(position, self._positions.get(source, 0))
+            self._pending += 1
+            self._stats["records"] += 1
+            full = self._pending >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """כותב את האצווה הנוכחית; כישלון נרשם ב-stats והסריקה ממשיכה (הרשומות נשארות בקבצים)"""
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                rows, positions = self._rows, self._positions
+                self._rows, self._positions, self._pending = defaultdict(dict), {}, 0
+            try:
+                self._write_batch(rows, positions)
+                with self._lock:
+                    self._stats["batches"] += 1
+                    self._stats["rows"] += sum(len(table_rows) for table_rows in rows.values())
+            except Exception as e:
+                with self._lock:
+                    self._stats["failed_batches"] += 1
+                    self._failed_sources.update(positions)
+                print(f"⚠️  כתיבת אצווה למסד נכשלה ({str(e)}); אפשר להשלים אחר כך עם instaloader-sink.py",
+                      flush=True)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self.flush()
+
+    @abstractmethod
+    def checkpoint(self, source):
+        """כמה רשומות מתחילת קובץ הרשומות כבר נכתבו למסד"""
+
+    @abstractmethod
+    def _write_batch(self, rows, positions):
+        """כותב את האצווה ואת ה-checkpoints שלה בטרנזקציה אחת"""
+
+
+class PostgresSink(RecordSink):
+    """
+    upsert לטבלאות ig_* לפי shortcode / ID: כל טבלה נטענת ב-COPY לטבלה זמנית,
+    ומשם INSERT ... ON CONFLICT DO UPDATE אחד. כל האצווה וה-checkpoint שלה בטרנזקציה אחת, על חיבור מתוך pool.
+    """
+
+    def __init__(self, url, batch_size=BATCH_SIZE, pool_size=2):
+        _require_psycopg()
+        super().__init__(batch_size)
+        self.pool = ConnectionPool(url, min_size=1, max_size=pool_size, open=True)
+        with self.pool.connection() as conn:
+            conn.execute(_SCHEMA)
+
+    def checkpoint(self, source):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT position FROM ig_sink_checkpoints WHERE source = %s", (source,)).fetchone()
+        return row[0] if row else 0
+
+    def _write_batch(self, rows, positions):
+        with self.pool.connection() as conn, conn.transaction():
+            for table, table_rows in rows.items():
+                if table_rows:
+                    self._upsert(conn, table, list(table_rows.values()))
+            for source, position in positions.items():
+                conn.execute("INSERT INTO ig_sink_checkpoints (source, position) VALUES (%s, %s) "
+                             "ON CONFLICT (source) DO UPDATE SET "
+                             "position = GREATEST(ig_sink_checkpoints.position, EXCLUDED.position), updated_at = now()",
+                             (source, position))
+
+    def _upsert(self, conn, table, table_rows):
+        keys, columns = TABLES[table]
+        stage = sql.Identifier(f"stage_{table}")
+        column_list = sql.SQL(", ").join(map(sql.Identifier, columns))
+        conn.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(
+            stage, sql.Identifier(table)))
+        with conn.cursor().copy(sql.SQL("COPY {} ({}) FROM STDIN").format(stage, column_list)) as copy:
+            for row in table_rows:
+                copy.write_row([Jsonb(row[column], _dumps) if column == "data" else row[column] for column in columns])
+        updates = sql.SQL(", ").join(sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column))
+                                     for column in columns if column not in keys)
+        conn.execute(sql.SQL("INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} "
+                             "ON CONFLICT ({keys}) DO UPDATE SET {updates}, updated_at = now()").format(
+            table=sql.Identifier(table), columns=column_list, stage=stage,
+            keys=sql.SQL(", ").join(map(sql.Identifier, keys)), updates=updates))
+
+    def close(self):
+        super().close()
+        self.pool.close()
+
+
+class SinkGroup(Sink):
+    """כמה sinks שמקבלים את אותן רשומות מאותו RecordStream (למשל PostgresSink ו-TagIndex)"""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def write(self, record, source=None, position=None):
+        for sink in self.sinks:
+            sink.write(record, source, position)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def stats(self):
+        return [sink.stats() for sink in self.sinks]
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def combine_sinks(*sinks):
+    """sink אחד לכל מה שלא None: None, ה-sink היחיד, או SinkGroup"""
+    sinks = [sink for sink in sinks if sink is not None]
+    if len(sinks) < 2:
+        return sinks[0] if sinks else None
+    return SinkGroup(sinks)
+
+
+def open_sink(url, batch_size=BATCH_SIZE):
+    """sink לפי ה-URL: postgresql://... (או postgres://) - PostgresSink"""
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresSink(url, batch_size)
+    raise ValueError(f"sink לא נתמך: {url}")
+
+
+def load_records(sink, output_dirs):
+    """
+    טוען ל-sink את קבצי הרשומות של תיקיות פרופילים קיימות, מה-checkpoint של כל קובץ ואילך
+    (backfill, או השלמה אחרי שהמסד לא היה זמין). מחזיר כמה רשומות נשלחו.
+    """
+    sent = 0
+    for output_dir in output_dirs:
+        for path in list_record_files(output_dir):
+            done = sink.checkpoint(path)
+            for position, record in enumerate(iter_records(path), start=1):
+                if position > done:
+                    sink.write(record, path, position)
+                    sent += 1
+            sink.flush()
+    return sent
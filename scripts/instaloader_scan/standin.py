@@ -0,0 +1,607 @@
+# -*- coding: utf-8 -*-
+"""
+שרת מקומי שמחקה את אינסטגרם, לבדיקות ביצועים של הסריקה בלי לגעת בחשבונות אמיתיים
+כל שם משתמש הוא פרופיל סינתטי שנבנה באופן דטרמיניסטי מהשם ומה-seed: פוסטים (תמונה, סרטון, קרוסלה),
+תגובות בתצוגה המקדימה, סטוריז והיילייטס, ומדיה בגודל מוגדר. אפשר להוסיף השהיה לכל תשובה ותשובות 429 אקראיות.
+השרת עונה ל-endpoints ש-instaloader משתמש בהם בסריקה אנונימית ובסריקה מחוברת (בלי get_comments ובלי התחברות
+בסיסמה), ו-redirect_instagram() מפנה אליו את כל הבקשות של requests בתהליך הנוכחי.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+import requests
+
+MEDIA_HOST = "scontent.standin.invalid"
+STANDIN_HOSTS = ("www.instagram.com", "i.instagram.com", MEDIA_HOST)
+STATS_PATH = "/__standin/stats"
+PAGE_SIZE = 12
+
+# doc_id ו-query_hash של השאילתות ש-instaloader שולח
+DOC_PROFILE_POSTS = "7950326061742207"
+DOC_TIMELINE = "28975909992013618"
+DOC_PROFILE = "27937681195819736"
+DOC_POST = "27128499623469141"
+DOC_CLIPS = "27234427476213202"
+HASH_STORIES = "303a4ae99711322310f25250d988f3b7"
+HASH_HIGHLIGHTS = "7c16654f22c819fb63d1183034a5162f"
+HASH_HIGHLIGHT_ITEMS = "45246d3fe16ccc6577e0bd297a5db1ab"
+HASH_STORY_ITEM = "2b0673e0dc4580674a88d426fe00ea90"
+
+_HASHTAGS = ("fashion", "beauty", "travel", "food", "fitness", "tlv", "ootd", "makeup", "skincare", "collab")
+_WORDS = ("שלום", "היום", "יום", "מושלם", "תודה", "love", "new", "today", "my", "favorite", "look", "summer")
+
+
+@dataclass
+class StandinConfig:
+    posts: int = 36
+    stories: int = 3
+    highlights: int = 2
+    highlight_items: int = 4
+    # תגובות בתצוגה המקדימה של כל פוסט
+    preview_comments: int = 3
+    video_ratio: float = 0.2
+    sidecar_ratio: float = 0.2
+    sidecar_items: int = 3
+    location_ratio: float = 0.3
+    image_bytes: int = 64 * 1024
+    video_bytes: int = 512 * 1024
+    # השהיה לכל תשובת API / קובץ מדיה, במילישניות
+    latency_ms: float = 0.0
+    media_latency_ms: float = 0.0
+    # החלק מבקשות ה-API שנענות ב-429
+    rate_limit_ratio: float = 0.0
+    # תוקף החתימה (oe) של כתובות המדיה, בשניות מרגע שהשרת בנה את הפרופיל; כתובת שפגה נענית ב-403
+    url_ttl: float = 3 * 24 * 3600.0
+    # תוספת likes לכל פוסט שמספרו מתחלק ב-engagement_every - מדמה מעורבות שגדלה בין סריקות (0 - בלי)
+    engagement_boost: int = 0
+    engagement_every: int = 3
+    seed: int = 0
+
+
+def _stable_id(*parts):
+    return zlib.crc32(":".join(str(part) for part in parts).encode('utf-8')) * 1000 + 17
+
+
+def _shortcode(pk):
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    code = ""
+    while pk:
+        pk, digit = divmod(pk, 64)
+        code = alphabet[digit] + code
+    return code[-11:]
+
+
+class _Profile:
+    """פרופיל סינתטי: כל הנתונים נגזרים מהשם, מה-seed ומהיום הנוכחי"""
+
+    def __init__(self, username, config):
+        rng = random.Random(f"{config.seed}:{username}")
+        self.username = username
+        self.config = config
+        self.user_id = _stable_id(config.seed, username)
+        self.full_name = username.replace("_", " ").replace(".", " ").title()
+        self.followers = rng.randint(1_000, 2_000_000)
+        self.following = rng.randint(50, 3_000)
+        self.biography = f"יוצרת תוכן | {rng.choice(_WORDS)} #{rng.choice(_HASHTAGS)} @{username}_shop"
+        # הפוסטים מתוארכים מתחילת היום, כך שסריקות חוזרות באותו יום רואות את אותם נתונים
+        today = int(time.time()) // 86400 * 86400
+        self.posts = []
+        taken_at = today
+        for index in range(config.posts):
+            taken_at -= rng.randint(3 * 3600, 4 * 86400)
+            pk = _stable_id(config.seed, username, "post", index)
+            roll = rng.random()
+            kind = "video" if roll < config.video_ratio else (
+                "sidecar" if roll < config.video_ratio + config.sidecar_ratio else "image")
+            tags = rng.sample(_HASHTAGS, rng.randint(0, 3))
+            self.posts.append({
+                "pk": pk,
+                "code": _shortcode(pk),
+                "kind": kind,
+                "taken_at": taken_at,
+                "caption": " ".join(rng.choices(_WORDS, k=rng.randint(3, 12)) + [f"#{tag}" for tag in tags]),
+                "likes": rng.randint(10, self.followers // 10 + 10) + (
+                    config.engagement_boost if index % config.engagement_every == 0 else 0),
+                "comments": rng.randint(0, 40),
+                "views": rng.randint(100, self.followers + 100),
+                "location": rng.random() < config.location_ratio,
+            })
+        self.stories = [{"pk": _stable_id(config.seed, username, "story", index),
+                         "taken_at": today - index * 3600, "is_video": rng.random() < config.video_ratio}
+                        for index in range(config.stories)]
+        self.highlights = []
+        for index in range(config.highlights):
+            highlight_id = _stable_id(config.seed, username, "highlight", index)
+            self.highlights.append({
+                "id": highlight_id,
+                "title": f"היילייט {index + 1}",
+                "items": [{"pk": _stable_id(config.seed, highlight_id, item),
+                           "taken_at": today - (index * 30 + item + 1) * 86400,
+                           "is_video": rng.random() < config.video_ratio}
+                          for item in range(config.highlight_items)],
+            })
+
+    # --- מדיה ---
+
+    def media_url(self, name, video=False):
+        size = self.config.video_bytes if video else self.config.image_bytes
+        extension = "mp4" if video else "jpg"
+        # החתימה מתחדשת בכל תשובה, כמו באינסטגרם
+        expires = int(time.time() + self.config.url_ttl)
+        return f"https://{MEDIA_HOST}/v/{self.username}/{name}.{extension}?size={size}&oe={expires:X}"
+
+    def pic_url(self):
+        return self.media_url(f"profile_{self.user_id}")
+
+    # --- פרופיל ---
+
+    def user_brief(self):
+        return {"id": str(self.user_id), "pk": str(self.user_id), "username": self.username,
+                "full_name": self.full_name, "is_private": False, "profile_pic_url": self.pic_url()}
+
+    def polaris_user(self):
+        """הפרופיל בפורמט של דף הפרופיל ושל שאילתת הפרופיל המחוברת"""
+        return {
+            **self.user_brief(),
+            "biography": self.biography,
+            "external_url": f"https://example.com/{self.username}",
+            "follower_count": self.followers,
+            "following_count": self.following,
+            "media_count": len(self.posts),
+            "is_verified": False,
+            "is_business": True,
+            "category": "Creator",
+            "hd_profile_pic_url_info": {"url": self.pic_url()},
+        }
+
+    def legacy_user(self):
+        """הפרופיל בפורמט של web_profile_info, עם העמוד הראשון של הפוסטים"""
+        return {
+            "id": str(self.user_id),
+            "username": self.username,
+            "full_name": self.full_name,
+            "biography": self.biography,
+            "external_url": f"https://example.com/{self.username}",
+            "edge_followed_by": {"count": self.followers},
+            "edge_follow": {"count": self.following},
+            "is_private": False,
+            "is_verified": False,
+            "is_business_account": True,
+            "business_category_name": "Creator",
+            "profile_pic_url": self.pic_url(),
+            "profile_pic_url_hd": self.pic_url(),
+            "edge_felix_video_timeline": {"count": 0},
+            "edge_owner_to_timeline_media": self.graphql_page(None),
+        }
+
+    # --- פוסטים ---
+
+    def _location(self, post):
+        if not post["location"]:
+            return None
+        return {"id": str(post["pk"] % 100000), "name": "תל אביב", "slug": "tel-aviv", "has_public_page": True,
+                "lat": 32.08, "lng": 34.78}
+
+    def _preview(self, post):
+        count = min(self.config.preview_comments, post["comments"])
+        return [{"pk": post["pk"] + index + 1, "text": f"תגובה {index + 1} ❤️",
+                 "created_at": post["taken_at"] + 60 * (index + 1),
+                 "user": {"pk": str(index + 1), "username": f"fan_{index + 1}"}, "comment_like_count": index}
+                for index in range(count)]
+
+    def graphql_node(self, post):
+        """פוסט בפורמט GraphQL הישן (רשימת הפוסטים האנונימית)"""
+        node = {
+            "__typename": {"image": "GraphImage", "video": "GraphVideo", "sidecar": "GraphSidecar"}[post["kind"]],
+            "id": str(post["pk"]),
+            "shortcode": post["code"],
+            "taken_at_timestamp": post["taken_at"],
+            "display_url": self.media_url(post["code"]),
+            "dimensions": {"width": 1080, "height": 1350},
+            "is_video": post["kind"] == "video",
+            "edge_media_to_caption": {"edges": [{"node": {"text": post["caption"]}}]},
+            "edge_media_preview_like": {"count": post["likes"]},
+            "edge_media_to_comment": {"count": post["comments"], "edges": [
+                {"node": {"id": str(comment["pk"]), "text": comment["text"], "created_at": comment["created_at"],
+                          "owner": {"id": comment["user"]["pk"], "username": comment["user"]["username"]},
+                          "edge_liked_by": {"count": comment["comment_like_count"]}}}
+                for comment in self._preview(post)]},
+            "location": self._location(post),
+            "owner": {"id": str(self.user_id), "username": self.username},
+        }
+        if post["kind"] == "video":
+            node["video_url"] = self.media_url(post["code"], video=True)
+            node["video_view_count"] = post["views"]
+        if post["kind"] == "sidecar":
+            node["edge_sidecar_to_children"] = {"edges": [
+                {"node": {"display_url": self.media_url(f"{post['code']}_{index}"), "is_video": False,
+                          "dimensions": {"width": 1080, "height": 1080}}}
+                for index in range(self.config.sidecar_items)]}
+        return node
+
+    def iphone_media(self, post, full=False):
+        """
+        פוסט בפורמט של ה-API של האייפון. בפיד המחובר location מופיע רק כשיש מיקום, ולכן instaloader
+        שולף את ה-metadata המלא (full=True) של כל פוסט בלי מיקום - כמו מול אינסטגרם.
+        """
+        media = {
+            "pk": post["pk"],
+            "id": f"{post['pk']}_{self.user_id}",
+            "code": post["code"],
+            "media_type": {"image": 1, "video": 2, "sidecar": 8}[post["kind"]],
+            "taken_at": post["taken_at"],
+            "caption": {"text": post["caption"]},
+            "has_liked": False,
+            "like_count": post["likes"],
+            "comment_count": post["comments"],
+            "preview_comments": self._preview(post),
+            "user": self.user_brief(),
+            "image_versions2": {"candidates": [{"url": self.media_url(post["code"]), "width": 1080, "height": 1350}]},
+            "original_width": 1080,
+            "original_height": 1350,
+        }
+        location = self._location(post)
+        if location or full:
+            media["location"] = location
+        if post["kind"] == "video":
+            # שתי גרסאות וידאו, כמו באינסטגרם - instaloader בוחר ביניהן עם HEAD
+            media["video_versions"] = [{"url": self.media_url(post["code"], video=True)},
+                                       {"url": self.media_url(f"{post['code']}_low", video=True)}]
+            media["video_duration"] = 15.0
+            media["view_count"] = post["views"]
+            media["play_count"] = post["views"]
+        if post["kind"] == "sidecar":
+            media["carousel_media"] = [
+                {"media_type": 1, "original_width": 1080, "original_height": 1080,
+                 "image_versions2": {"candidates": [{"url": self.media_url(f"{post['code']}_{index}")}]}}
+                for index in range(self.config.sidecar_items)]
+        return media
+
+    def graphql_page(self, after):
+        start = int(after or 0)
+        posts = self.posts[start:start + PAGE_SIZE]
+        end = start + len(posts)
+        return {"count": len(self.posts),
+                "page_info": {"has_next_page": end < len(self.posts), "end_cursor": str(end)},
+                "edges": [{"node": self.graphql_node(post)} for post in posts]}
+
+    def timeline_page(self, after):
+        page = self.graphql_page(after)
+        start = int(after or 0)
+        page["edges"] = [{"node": self.iphone_media(post)} for post in self.posts[start:start + PAGE_SIZE]]
+        return page
+
+    # --- סטוריז והיילייטס ---
+
+    def story_node(self, item):
+        name = f"story_{item['pk']}"
+        node = {
+            "id": str(item["pk"]),
+            "__typename": "GraphStoryVideo" if item["is_video"] else "GraphStoryImage",
+            "taken_at_timestamp": item["taken_at"],
+            "is_video": item["is_video"],
+            "display_resources": [{"src": self.media_url(name), "config_width": 1080, "config_height": 1920}],
+            "owner": {"id": str(self.user_id)},
+        }
+        if item["is_video"]:
+            node["video_resources"] = [{"src": self.media_url(name, video=True)}]
+        return node
+
+    def iphone_story_item(self, item):
+        name = f"story_{item['pk']}"
+        struct = {"pk": item["pk"], "image_versions2": {"candidates": [{"url": self.media_url(name)}]}}
+        if item["is_video"]:
+            struct["video_versions"] = [{"url": self.media_url(name, video=True)}]
+        return struct
+
+    def reel(self):
+        return {"id": str(self.user_id), "latest_reel_media": max((item["taken_at"] for item in self.stories), default=0),
+                "seen": None, "user": self.user_brief(), "owner": self.user_brief(),
+                "items": [self.story_node(item) for item in self.stories]}
+
+    def highlight_node(self, highlight):
+        return {"id": str(highlight["id"]), "title": highlight["title"],
+                "cover_media": {"thumbnail_src": self.media_url(f"cover_{highlight['id']}")},
+                "cover_media_cropped_thumbnail": {"url": self.media_url(f"cover_{highlight['id']}")},
+                "owner": self.user_brief()}
+
+
+class StandinServer:
+    """
+    השרת המדומה. start() מפעיל אותו ב-thread ברקע ו-url הוא הכתובת המקומית שלו.
+    ה-host המקורי של כל בקשה מגיע בכותרת X-Standin-Host (redirect_instagram מוסיף אותה).
+    GET {url}/__standin/stats מחזיר את המונים: בקשות לכל endpoint, בתים שנשלחו ו-429 שהוזרקו.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or StandinConfig()
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._profiles = {}
+        self._by_id = {}
+        self._highlights = {}
+        self._story_items = {}
+        self._posts = {}
+        self._stats = {"api_requests": 0, "media_requests": 0, "api_bytes": 0, "media_bytes": 0,
+                       "rate_limited": 0, "not_found": 0, "endpoints": {}}
+        server = self
+
+        class Handler(_Handler):
+            standin = server
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def profile(self, username):
+        username = username.lower()
+        with self._lock:
+            if username not in self._profiles:
+                profile = _Profile(username, self.config)
+                self._profiles[username] = profile
+                self._by_id[str(profile.user_id)] = profile
+                for highlight in profile.highlights:
+                    self._highlights[str(highlight["id"])] = (profile, highlight)
+                    for item in highlight["items"]:
+                        self._story_items[_shortcode(item["pk"])] = (profile, item)
+                for item in profile.stories:
+                    self._story_items[_shortcode(item["pk"])] = (profile, item)
+                for post in profile.posts:
+                    self._posts[post["code"]] = (profile, post)
+                    self._posts[str(post["pk"])] = (profile, post)
+            return self._profiles[username]
+
+    def count(self, endpoint, kind, size):
+        with self._lock:
+            self._stats[f"{kind}_requests"] += 1
+            self._stats[f"{kind}_bytes"] += size
+            self._stats["endpoints"][endpoint] = self._stats["endpoints"].get(endpoint, 0) + 1
+
+    def should_throttle(self):
+        with self._lock:
+            throttle = self._rng.random() < self.config.rate_limit_ratio
+            if throttle:
+                self._stats["rate_limited"] += 1
+            return throttle
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "endpoints": dict(self._stats["endpoints"]), "config": asdict(self.config)}
+
+    # --- ניתוב ---
+
+    def route(self, host, method, path, query, form):
+        """(endpoint, status, body) לבקשת API"""
+        if host == "i.instagram.com":
+            return self._route_iphone(path, query)
+        if path == "/":
+            return "home", 200, None
+        if path == "/api/v1/users/web_profile_info/":
+            return "web_profile_info", 200, {"data": {"user": self.profile(query["username"]).legacy_user()},
+                                             "status": "ok"}
+        if path.rstrip("/") == "/graphql/query":
+            params = form if method == "POST" else query
+            variables = json.loads(params.get("variables", "{}"))
+            if "doc_id" in params:
+                return self._route_doc_id(params["doc_id"], variables)
+            return self._route_query_hash(params.get("query_hash"), variables)
+        match = re.fullmatch(r"/([A-Za-z0-9._]+)/", path)
+        if match:
+            return "profile_page", 200, self.profile(match.group(1))
+        return "unknown", 404, {"message": "not found", "status": "fail"}
+
+    def _route_doc_id(self, doc_id, variables):
+        if doc_id == DOC_PROFILE_POSTS:
+            profile = self._by_id.get(str(variables.get("id")))
+            if profile is None:
+                return "profile_posts", 404, {"message": "not found", "status": "fail"}
+            return "profile_posts", 200, {"data": {"user": {
+                "edge_owner_to_timeline_media": profile.graphql_page(variables.get("after"))}}, "status": "ok"}
+        if doc_id == DOC_TIMELINE:
+            profile = self.profile(variables["username"])
+            return "timeline", 200, {"data": {
+                "xdt_api__v1__feed__user_timeline_graphql_connection": profile.timeline_page(variables.get("after"))},
+                "status": "ok"}
+        if doc_id == DOC_PROFILE:
+            profile = self._by_id.get(str(variables.get("id")))
+            return "profile_query", 200, {"data": {"user": profile.polaris_user() if profile else None}, "status": "ok"}
+        if doc_id == DOC_POST:
+            found = self._posts.get(variables.get("shortcode"))
+            items = [found[0].iphone_media(found[1], full=True)] if found else []
+            return "post_metadata", 200, {"data": {"xdt_api__v1__media__shortcode__web_info": {"items": items}},
+                                          "status": "ok"}
+        if doc_id == DOC_CLIPS:
+            return "clips", 200, {"data": {"xdt_api__v1__clips__user__connection_v2": {"edges": []}}, "status": "ok"}
+        return f"doc_id:{doc_id}", 400, {"message": "execution error", "status": "fail"}
+
+    def _route_query_hash(self, query_hash, variables):
+        if query_hash == HASH_STORIES:
+            reels = [self._by_id[str(user_id)].reel() for user_id in variables.get("reel_ids", [])
+                     if str(user_id) in self._by_id]
+            return "stories", 200, {"data": {"reels_media": reels}, "status": "ok"}
+        if query_hash == HASH_HIGHLIGHTS:
+            profile = self._by_id.get(str(variables.get("user_id")))
+            edges = [{"node": profile.highlight_node(highlight)} for highlight in profile.highlights] if profile else []
+            return "highlights", 200, {"data": {"user": {"edge_highlight_reels": {"edges": edges}}}, "status": "ok"}
+        if query_hash == HASH_HIGHLIGHT_ITEMS:
+            reels = []
+            for highlight_id in variables.get("highlight_reel_ids", []):
+                if str(highlight_id) in self._highlights:
+                    profile, highlight = self._highlights[str(highlight_id)]
+                    reels.append({"id": f"highlight:{highlight_id}",
+                                  "items": [profile.story_node(item) for item in highlight["items"]]})
+            return "highlight_items", 200, {"data": {"reels_media": reels}, "status": "ok"}
+        if query_hash == HASH_STORY_ITEM:
+            found = self._story_items.get(variables.get("shortcode"))
+            node = {**found[0].story_node(found[1]), "owner": found[0].user_brief()} if found else None
+            return "story_item", 200, {"data": {"shortcode_media": node}, "status": "ok"}
+        return f"query_hash:{query_hash}", 400, {"message": "execution error", "status": "fail"}
+
+    def _route_iphone(self, path, query):
+        match = re.fullmatch(r"/api/v1/users/(\d+)/info/", path)
+        if match and match.group(1) in self._by_id:
+            return "iphone_user_info", 200, {"user": self._by_id[match.group(1)].polaris_user(), "status": "ok"}
+        match = re.fullmatch(r"/api/v1/media/(\d+)/info/", path)
+        if match and match.group(1) in self._posts:
+            profile, post = self._posts[match.group(1)]
+            return "iphone_media_info", 200, {"items": [profile.iphone_media(post, full=True)], "status": "ok"}
+        if path == "/api/v1/feed/reels_media/":
+            reels = {}
+            for reel_id in query.get("reel_ids", "").split(","):
+                if reel_id.startswith("highlight:") and reel_id[len("highlight:"):] in self._highlights:
+                    profile, highlight = self._highlights[reel_id[len("highlight:"):]]
+                    reels[reel_id] = {"items": [profile.iphone_story_item(item) for item in highlight["items"]]}
+                elif reel_id in self._by_id:
+                    profile = self._by_id[reel_id]
+                    reels[reel_id] = {"items": [profile.iphone_story_item(item) for item in profile.stories]}
+            return "iphone_reels", 200, {"reels": reels, "status": "ok"}
+        return "iphone_unknown", 404, {"message": "not found", "status": "fail"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    standin = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body, headers=None, head_only=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+        return 0 if head_only else len(body)
+
+    def _send_json(self, status, data):
+        return self._send(status, "application/json; charset=utf-8", json.dumps(data).encode('utf-8'))
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+    def _dispatch(self, method):
+        standin = self.standin
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        form = {}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        host = self.headers.get("X-Standin-Host", "www.instagram.com")
+
+        if parts.path == STATS_PATH:
+            self._send_json(200, standin.stats())
+            return
+        if host == MEDIA_HOST:
+            self._media(parts.path, query, head_only=method == "HEAD")
+            return
+
+        if standin.config.latency_ms:
+            time.sleep(standin.config.latency_ms / 1000)
+        if standin.should_throttle():
+            size = self._send_json(429, {"message": "Please wait a few minutes before you try again.",
+                                         "status": "fail"})
+            standin.count("rate_limited", "api", size)
+            return
+        endpoint, status, body = standin.route(host, method, parts.path, query, form)
+        if endpoint == "home":
+            size = self._send(200, "text/html; charset=utf-8", b"<html></html>",
+                              {"Set-Cookie": "csrftoken=standin; Path=/"})
+        elif isinstance(body, _Profile):
+            blob = {"require": [{"__bbox": {"result": {"data": {"xig_user_by_username": body.polaris_user()}}}}]}
+            html = f'<html><body><script type="application/json">{json.dumps(blob)}</script></body></html>'
+            size = self._send(status, "text/html; charset=utf-8", html.encode('utf-8'))
+        else:
+            size = self._send_json(status, body)
+        standin.count(endpoint, "api", size)
+
+    def _media(self, path, query, head_only):
+        standin = self.standin
+        if standin.config.media_latency_ms:
+            time.sleep(standin.config.media_latency_ms / 1000)
+        if "oe" in query and int(query["oe"], 16) < time.time():
+            sent = self._send(403, "text/plain", b"URL signature expired", None, head_only)
+            standin.count("media_expired", "media", sent)
+            return
+        size = int(query.get("size", standin.config.image_bytes))
+        start = 0
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match and int(match.group(1)) < size:
+            start = int(match.group(1))
+        # תוכן קבוע שנגזר מהנתיב, כך שכל הורדה של אותו קובץ מחזירה אותם בתים
+        pattern = (path.encode('utf-8') + b"\n") * 4
+        body = (pattern * (size // len(pattern) + 1))[start:size]
+        headers = {"Accept-Ranges": "bytes"}
+        if start:
+            headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+        sent = self._send(206 if start else 200, "video/mp4" if path.endswith(".mp4") else "image/jpeg", body,
+                          headers, head_only)
+        standin.count("media_head" if head_only else "media", "media", sent)
+
+
+@contextmanager
+def redirect_instagram(base_url):
+    """
+    מפנה כל בקשה של requests בתהליך הזה ל-hosts של אינסטגרם ול-CDN המדומה אל השרת ב-base_url.
+    ה-URL המקורי נשמר בתשובה, כך שעוגיות, לוגים ומטמון רואים את הכתובות של אינסטגרם.
+    """
+    original_send = requests.adapters.HTTPAdapter.send
+    target = urlsplit(base_url)
+
+    def send(adapter, request, **kwargs):
+        parts = urlsplit(request.url)
+        if parts.hostname not in STANDIN_HOSTS:
+            return original_send(adapter, request, **kwargs)
+        routed = request.copy()
+        routed.url = urlunsplit((target.scheme, target.netloc, parts.path, parts.query, ""))
+        routed.headers["X-Standin-Host"] = parts.hostname
+        response = original_send(adapter, routed, **kwargs)
+        response.request = request
+        response.url = request.url
+        return response
+
+    requests.adapters.HTTPAdapter.send = send
+    try:
+        yield
+    finally:
+        requests.adapters.HTTPAdapter.send = original_send
+
+
+def fetch_stats(base_url):
+    """המונים של שרת מדומה שרץ (גם בתהליך אחר)"""
+    return requests.get(base_url + STATS_PATH, timeout=10).json()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+מאגר מדיה לפי תוכן (content-addressed) המשותף לכל הפרופילים והריצות
+כל קובץ נשמר פעם אחת לפי ה-sha256 שלו (blobs/ab/abcd....jpg), והקבצים בתיקיות הפרופילים הם hardlinks אליו.
+לפני הורדה המאגר בודק:
+- מפתח ה-CDN (נתיב הקובץ ב-URL, שלא משתנה כשהחתימה מתחדשת) - אם כבר ירד, אין בכלל בקשה
+- ה-manifest של הפוסט / פריט הסטורי - אם יש לו כבר blob באותו גודל (Content-Length), ההורדה נעצרת אחרי הכותרות
+כך שתמונת פרופיל, פריט סטורי שעבר להיילייט ותמונות קרוסלה לא נשמרים ולא יורדים שוב בכל סריקה.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+MEDIA_STORE_DIR = ".instaloader_media"
+HASH_CHUNK_SIZE = 1024 * 1024
+# פרמטרים ב-query שמשנים את תוכן הקובץ (גודל / חיתוך); כל השאר (חתימה, תוקף, cache keys) משתנים בין תשובות
+CONTENT_PARAMS = ("stp",)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    extension TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cdn_keys (
+    cdn_key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS manifest (
+    ref TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    cdn_key TEXT,
+    owner TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ref, slot, kind)
+);
+"""
+
+
+def cdn_key(url):
+    """המזהה היציב של קובץ ב-CDN: הנתיב בלי ה-host והחתימה, ועם הפרמטרים שקובעים את התוכן"""
+    parts = urllib.parse.urlparse(url)
+    query = urllib.parse.parse_qs(parts.query)
+    params = [f"{name}={query[name][0]}" for name in CONTENT_PARAMS if name in query]
+    return parts.path + ("?" + "&".join(params) if params else "")
+
+
+def _slot(job):
+    # מיקום הקובץ בתוך הפוסט: שם הקובץ בלי התיקייה (למשל {date}_UTC_2 לתמונה השנייה בקרוסלה)
+    return os.path.basename(job.path)
+
+
+def _link(source, target):
+    """hardlink מהמאגר לתיקיית הפרופיל; בין מערכות קבצים שונות - העתקה"""
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class MediaStore:
+    """
+    המאגר ב-root: blobs/ ועוד index.db (SQLite) עם ה-blobs, מפתחות ה-CDN וה-manifest
+    (ref = shortcode של פוסט או ID של פריט סטורי -> blob לכל קובץ).
+    חיבור SQLite נפרד לכל thread, כך שכל ה-workers של MediaPipeline וכמה תהליכים יכולים להשתמש בו יחד.
+    """
+
+    def __init__(self, root=MEDIA_STORE_DIR):
+        self.root = root
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return self._local.db
+
+    def blob_path(self, sha256, extension):
+        return os.path.join(self.root, "blobs", sha256[:2], f"{sha256}.{extension}")
+
+    def _blob(self, sha256):
+        row = self._db().execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            return None
+        path = self.blob_path(row["sha256"], row["extension"])
+        # blob שנמחק מהדיסק לא נחשב ידוע - הקובץ יורד מחדש
+        return (path, row["size"]) if os.path.isfile(path) else None
+
+    # --- לפני ההורדה ---
+
+    def lookup(self, job):
+        """(נתיב ה-blob, גודל) אם הקובץ ב-URL הזה כבר במאגר; None - צריך להוריד"""
+        row = self._db().execute("SELECT sha256 FROM cdn_keys WHERE cdn_key = ?", (cdn_key(job.url),)).fetchone()
+        if row is None:
+            return None
+        blob = self._blob(row["sha256"])
+        if blob is not None:
+            self._remember(job, row["sha256"], blob[1])
+        return blob
+
+    def match_size(self, job, size):
+        """
+        בדיקה לפי גודל אחרי כותרות התשובה: ל-ref ולמיקום הזה כבר יש blob בדיוק בגודל הזה
+        (אותו פוסט שה-CDN הגיש מנתיב אחר). None - להמשיך בהורדה.
+        """
+        if not job.ref or not size:
+            return None
+        row = self._db().execute("SELECT sha256 FROM manifest WHERE ref = ? AND slot = ? AND kind = ? AND size = ?",
+                                 (str(job.ref), _slot(job), job.kind, size)).fetchone()
+        if row is None:
+            return None
+        blob = self._blob(row["sha256"])
+        if blob is not None:
+            self._remember(job, row["sha256"], size)
+        return blob
+
+    def materialize(self, blob_path, filename):
+        """יוצר את הקובץ בתיקיית הפרופיל מתוך ה-blob, בלי להעתיק תוכן"""
+        _link(blob_path, filename)
+
+    # --- אחרי ההורדה ---
+
+    def add(self, job, filename):
+        """מכניס קובץ שירד למאגר (או מחליף אותו ב-link ל-blob זהה שכבר קיים); מחזיר את ה-sha256"""
+        digest = hashlib.sha256()
+        size = 0
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        extension = os.path.splitext(filename)[1].lstrip('.') or "bin"
+        path = self.blob_path(sha256, extension)
+        existing = self._blob(sha256)
+        if existing is not None:
+            # אותו תוכן מ-URL אחר: הקובץ שירד מוחלף ב-link, כך שנשאר עותק אחד בדיסק
+            if not os.path.samefile(existing[0], filename):
+                os.remove(filename)
+                _link(existing[0], filename)
+        else:
+            _link(filename, path)
+            self._db().execute("INSERT OR REPLACE INTO blobs (sha256, size, extension, created_at) VALUES (?, ?, ?, ?)",
+                               (sha256, size, extension, time.time()))
+        self._remember(job, sha256, size)
+        return sha256
+
+    def _remember(self, job, sha256, size):
+        db = self._db()
+        db.execute("INSERT OR REPLACE INTO cdn_keys (cdn_key, sha256) VALUES (?, ?)", (cdn_key(job.url), sha256))
+        if job.ref:
+            db.execute("INSERT OR REPLACE INTO manifest (ref, slot, kind, sha256, size, cdn_key, owner, updated_at) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (str(job.ref), _slot(job), job.kind, sha256, size, cdn_key(job.url), job.owner, time.time()))
+
+    # --- שאילתות ---
+
+    def manifest(self, ref):
+        """הקבצים של shortcode / ID של פריט סטורי: [{slot, kind, sha256, size, path}]"""
+        rows = self._db().execute("SELECT m.slot, m.kind, m.sha256, m.size, b.extension FROM manifest m "
+                                  "JOIN blobs b ON b.sha256 = m.sha256 WHERE m.ref = ? ORDER BY m.slot, m.kind",
+                                  (str(ref),)).fetchall()
+        return [{"slot": row["slot"], "kind": row["kind"], "sha256": row["sha256"], "size": row["size"],
+                 "path": self.blob_path(row["sha256"], row["extension"])} for row in rows]
+
+    def stats(self):
+        db = self._db()
+        blobs, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        refs = db.execute("SELECT COUNT(DISTINCT ref) FROM manifest").fetchone()[0]
+        return {"blobs": blobs, "bytes": size, "refs": refs}
+
+    def close(self):
+        if hasattr(self._local, "db"):
+            self._local.db.close()
+            del self._local.db
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+poller לסטוריז של כל הפרופילים שבמעקב, בלי סריקת פרופיל מלאה
+סטוריז נעלמים אחרי 24 שעות, ולכן הם נאספים במחזורים קבועים: בקשת GraphQL אחת לכל קבוצה של עד 50 משתמשים,
+ועוד בקשת reels_media אחת לכל קבוצה (הכתובות באיכות המלאה של האייפון) - רק לבעלי סטורי שהתעדכן מאז המחזור הקודם.
+פריטים שכבר נאספו נשמרים במצב הפולר ולא יורדים שוב.
+"""
+
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import instaloader
+
+from .checkpoint import write_json_atomic
+from .media import MediaPipeline, storyitem_media_jobs
+from .stream import RecordStream, iter_records, list_record_files, run_records_path, story_item_info
+
+STORIES_STATE = "stories_state.json"
+# כמו ב-Instaloader.get_stories
+USERIDS_PER_QUERY = 50
+STORIES_QUERY_HASH = "303a4ae99711322310f25250d988f3b7"
+POLL_INTERVAL = 15 * 60.0
+# פריט סטורי נשמר ב"נאספו" יומיים מרגע הפרסום - מעבר לזה הוא כבר לא יחזור מה-API
+SEEN_RETENTION = timedelta(hours=48)
+
+
+def _chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def _userid_from_scans(output_dir):
+    """ה-userid מרשומת הפרופיל של סריקה קודמת, אם יש כזו"""
+    for path in reversed(list_record_files(output_dir)):
+        for record in iter_records(path):
+            if record.get("type") == "profile" and record.get("userid"):
+                return int(record["userid"])
+            break
+    return None
+
+
+class StoriesPoller:
+    """
+    sessions - SessionPool עם לפחות חשבון מחובר אחד (סטוריז זמינים רק עם התחברות).
+    הפלט נכתב לתיקיית הפרופיל הרגילה: {output_root}/{username}/stories למדיה,
+    ו-records/stories_{מחזור}.jsonl לרשומות story_item (נספרות בסיכום של הפרופיל כמו בסריקה מלאה).
+    sink - RecordSink שמקבל גם את רשומות הסטוריז.
+    schedule - RefreshScheduler: כל מחזור בודק רק את הפרופילים שהגיע זמנם לפי קצב הסטוריז שלהם ובתוך התקציב לשעה.
+    profile_cache - ProfileCache: userid של פרופילים חדשים בלי בקשה, ומעקב אחרי שינויי שם לפי בעל הסטורי.
+    """
+
+    def __init__(self, sessions, output_root, state_file=None, media=None, batch_size=USERIDS_PER_QUERY, sink=None,
+                 schedule=None, profile_cache=None):
+        self.sessions = sessions
+        self.output_root = output_root
+        self.state_file = state_file or os.path.join(output_root, STORIES_STATE)
+        self.media = media
+        self.batch_size = batch_size
+        self.sink = sink
+        self.schedule = schedule
+        self.profile_cache = profile_cache
+        os.makedirs(output_root, exist_ok=True)
+        self.state = {"users": {}, "latest_reel": {}, "seen": {}, "last_poll": None}
+        if os.path.isfile(self.state_file):
+            with open(self.state_file, encoding='utf-8') as f:
+                self.state.update(json.load(f))
+
+    def save(self):
+        write_json_atomic(self.state_file, self.state)
+
+    def track(self, usernames):
+        """מוסיף פרופילים למעקב; userid נלקח ממטמון הפרופילים או מסריקה קודמת, ורק אם אין - מבקשה אחת לפרופיל"""
+        missing = [username for username in usernames if username not in self.state["users"]]
+        if not missing:
+            return 0
+        lease = None
+        added = 0
+        try:
+            for username in missing:
+                userid = self.profile_cache.userid(username) if self.profile_cache is not None else None
+                if userid is None:
+                    userid = _userid_from_scans(os.path.join(self.output_root, username))
+                if userid is None:
+                    if lease is None:
+                        lease = self.sessions.acquire()
+                    try:
+                        if self.profile_cache is not None:
+                            userid = self.profile_cache.profile(lease.loader.context, username).userid
+                        else:
+                            userid = instaloader.Profile.from_username(lease.loader.context, username).userid
+                    except instaloader.exceptions.ProfileNotExistsException:
+                        print(f"⚠️  הפרופיל @{username} לא נמצא - לא נכנס למעקב", flush=True)
+                        continue
+                self.state["users"][username] = userid
+                added += 1
+        finally:
+            if lease is not None:
+                self.sessions.release(lease)
+            self.save()
+        return added
+
+    def _fetch_iphone_structs(self, context, stories):
+        """בקשת reels_media אחת לכל הסטוריז של הקבוצה, במקום בקשה לכל בעל סטורי בתוך get_items()"""
+        if not context.iphone_support:
+            return 0
+        try:
+            data = context.get_iphone_json("api/v1/feed/reels_media/",
+                                           {"reel_ids": ",".join(str(story.owner_id) for story in stories)})
+            reels = data.get("reels", {})
+        except instaloader.exceptions.ConnectionException as e:
+            print(f"⚠️  לא ניתן לטעון כתובות איכות מלאה לסטוריז: {str(e)}", flush=True)
+            reels = {}
+        for story in stories:
+            # מבנה ריק ולא None - אחרת get_items() יבקש אותו שוב לכל בעל סטורי
+            story._iphone_struct_ = reels.get(str(story.owner_id)) or {"items": []}
+        return 1
+
+    def poll(self):
+        """מחזור איסוף אחד על כל הפרופילים שבמעקב; מחזיר סטטיסטיקות של המחזור"""
+        started = time.monotonic()
+        cycle_id = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        usernames = {int(userid): username for username, userid in self.state["users"].items()}
+        due = None
+        if self.schedule is not None:
+            due = self.schedule.due(list(self.state["users"]), "stories")
+            due_names = {entry["username"] for entry in due}
+            usernames = {userid: username for userid, username in usernames.items() if username in due_names}
+        stats = {"cycle": cycle_id, "profiles": len(usernames), "requests": 0, "reels": 0, "reels_updated": 0,
+                 "new_items": 0, "media_files_queued": 0, "failed_items": 0, "errors": 0}
+        streams = {}
+        # פריטים שנאספו במחזור הזה ו-latest_reel_media של כל בעל סטורי - נרשמים רק אחרי שההורדות שלהם הצליחו
+        collected, reels = {}, {}
+        own_media = self.media is None
+        media = MediaPipeline() if own_media else self.media
+        errors_before = len(media.errors)
+        lease = self.sessions.acquire()
+        error = None
+        try:
+            if not lease.loader.context.is_logged_in:
+                raise instaloader.exceptions.LoginRequiredException("איסוף סטוריז דורש חשבון מחובר")
+            context = lease.loader.context
+            for chunk in _chunks(sorted(usernames), self.batch_size):
+                data = context.graphql_query(STORIES_QUERY_HASH, {"reel_ids": chunk, "precomposed_overlay": False})
+                stats["requests"] += 1
+                stories = [instaloader.Story(context, node) for node in data["data"]["reels_media"]]
+                stats["reels"] += len(stories)
+                # סטורי שהפריט האחרון שלו לא השתנה מאז המחזור הקודם - אין בו שום דבר חדש
+                updated = [story for story in stories
+                           if story._node["latest_reel_media"] > self.state["latest_reel"].get(str(story.owner_id), 0)]
+                stats["reels_updated"] += len(updated)
+                if updated:
+                    stats["requests"] += self._fetch_iphone_structs(context, updated)
+                if self.profile_cache is not None:
+                    for story in stories:
+                        self.profile_cache.observe(story.owner_id, story.owner_username)
+                for story in updated:
+                    # התיקייה נשארת לפי השם שבמעקב גם אחרי שינוי שם, כדי שההיסטוריה לא תתפצל
+                    username = usernames.get(story.owner_id) or story.owner_username
+                    self._collect(story, username, cycle_id, streams, media, stats, collected)
+                    reels[str(story.owner_id)] = story._node["latest_reel_media"]
+            if due:
+                self.schedule.mark_checked(due)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.sessions.release(lease, error)
+            for stream in streams.values():
+                stream.finalize()
+            if own_media:
+                media.close()
+            else:
+                for username in {entry[1] for entry in collected.values()}:
+                    media.wait(username)
+            self._confirm(collected, reels, media.errors[errors_before:], stats)
+            self._prune_seen()
+            self.state["last_poll"] = datetime.now().isoformat()
+            self.save()
+        stats["duration_sec"] = round(time.monotonic() - started, 2)
+        return stats
+
+    def _collect(self, story, username, cycle_id, streams, media, stats, collected):
+        output_dir = os.path.join(self.output_root, username)
+        for item in story.get_items():
+            item_id = str(item.mediaid)
+            if item_id in self.state["seen"]:
+                continue
+            try:
+                jobs = storyitem_media_jobs(item, os.path.join(output_dir, "stories"), username)
+                media.submit_all(jobs)
+                if username not in streams:
+                    streams[username] = RecordStream(run_records_path(output_dir, f"stories_{cycle_id}"),
+                                                     sink=self.sink)
+                streams[username].write({"type": "story_item", "username": username, **story_item_info(item),
+                                         "media": [job.describe() for job in jobs]})
+                collected[item_id] = (str(story.owner_id), username, (item.date_utc + SEEN_RETENTION).timestamp(),
+                                      {job.filename for job in jobs})
+                stats["new_items"] += 1
+                stats["media_files_queued"] += len(jobs)
+            except Exception as e:
+                stats["errors"] += 1
+                collected[item_id] = (str(story.owner_id), username, None, None)
+                print(f"[@{username}] ⚠️  שגיאה בהורדת פריט סטורי: {str(e)}", flush=True)
+
+    def _confirm(self, collected, reels, errors, stats):
+        """
+        פריט נרשם ב-seen רק אם כל הקבצים שלו ירדו; פריט שהורדה שלו נכשלה ינוסה שוב במחזור הבא
+        (סטורי נעלם אחרי 24 שעות), ולכן גם latest_reel של הבעלים שלו לא מתקדם.
+        """
+        failed_files = {error["file"] for error in errors}
+        retry_owners = set()
+        for item_id, (owner_id, username, expires, files) in collected.items():
+            if files is None:
+                retry_owners.add(owner_id)
+            elif files & failed_files:
+                retry_owners.add(owner_id)
+                stats["failed_items"] += 1
+                print(f"[@{username}] ⚠️  הורדת פריט סטורי {item_id} נכשלה, ינוסה שוב במחזור הבא", flush=True)
+            else:
+                self.state["seen"][item_id] = expires
+        for owner_id, latest in reels.items():
+            if owner_id not in retry_owners:
+                self.state["latest_reel"][owner_id] = latest
+
+    def _prune_seen(self):
+        now = time.time()
+        self.state["seen"] = {item_id: expires for item_id, expires in self.state["seen"].items() if expires > now}
+
+    def run(self, interval=POLL_INTERVAL, cycles=None, stop_event=None):
+        """
+        מחזורי איסוף בלוח זמנים קבוע: מחזור מתחיל כל interval שניות מתחילת המחזור הקודם (לא מסופו).
+        cycles - מספר מחזורים (None - עד stop_event או Ctrl+C). שגיאת חיבור במחזור לא עוצרת את הלולאה.
+        """
+        completed = 0
+        next_run = time.monotonic()
+        while cycles is None or completed < cycles:
+            try:
+                stats = self.poll()
+                print(f"📱 מחזור {stats['cycle']}: {stats['new_items']} פריטים חדשים מ-{stats['reels_updated']}/"
+                      f"{stats['profiles']} פרופילים | 📡 {stats['requests']} בקשות | {stats['duration_sec']} שניות",
+                      flush=True)
+            except instaloader.exceptions.ConnectionException as e:
+                print(f"⚠️  מחזור הסטוריז נכשל: {str(e)}", flush=True)
+            completed += 1
+            if cycles is not None and completed >= cycles:
+                break
+            next_run += interval
+            delay = max(0.0, next_run - time.monotonic())
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    break
+            else:
+                time.sleep(delay)
+        return completed
+
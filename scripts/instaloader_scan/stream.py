@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+כתיבה זורמת של רשומות הסריקה - שורת JSON לכל פוסט, פריט סטורי ופריט היילייט, ברגע שהם נאספים
+הקובץ נכתב כ-.part ומקבל את שמו הסופי רק בסיום הריצה; ריצה שנקטעה ממשיכה לכתוב לאותו .part.
+profile_data.json הוא סיכום קטן שנבנה מהרשומות במעבר זורם אחד.
+"""
+
+import glob
+import gzip
+import io
+import json
+import os
+import zlib
+from collections import Counter
+from datetime import datetime
+
+from .checkpoint import write_json_atomic
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+RECORDS_DIR = "records"
+PART_SUFFIX = ".part"
+TOP_TAGS = 20
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise RuntimeError("דחיסת zstd דורשת את החבילה zstandard: pip3 install zstandard")
+
+
+def _compression_for(path):
+    if path.endswith(PART_SUFFIX):
+        path = path[:-len(PART_SUFFIX)]
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+class RecordStream:
+    """
+    כותב רשומות JSONL, עם דחיסת gzip/zstd אופציונלית.
+    כל רשומה נשטפת לדיסק מיד, כך שקריסה מאבדת לכל היותר את הרשומה האחרונה.
+    פתיחה חוזרת של אותו נתיב מוסיפה לסוף ה-.part (gzip ו-zstd תומכים בשרשור frames), אחרי שהשורה החתוכה
+    של ריצה שקרסה באמצע כתיבה נחתכת ממנו - אחרת הרשומה הבאה הייתה נדבקת אליה באמצע הקובץ.
+    sink (Sink) מקבל כל רשומה יחד עם המיקום שלה בקובץ, ל-checkpoint של המסד.
+    """
+
+    def __init__(self, path, compression=None, sink=None):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"דחיסה לא נתמכת: {compression}")
+        if compression == "zstd":
+            _require_zstd()
+        self.path = path
+        self.part_path = path + PART_SUFFIX
+        self.compression = compression
+        self.records_written = 0
+        self.sink = sink
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.isfile(self.part_path):
+            _repair_part(self.part_path, compression)
+        # מיקום הרשומות ב-sink ממשיך ממה שכבר כתוב ב-.part של ריצה שנקטעה
+        self._position = sum(1 for _ in iter_records(self.part_path)) if sink and os.path.isfile(self.part_path) else 0
+
+        self._raw = open(self.part_path, 'ab')
+        if compression == "gzip":
+            self._file = gzip.GzipFile(fileobj=self._raw, mode='ab')
+        elif compression == "zstd":
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._file = self._raw
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        self._file.write(line.encode('utf-8'))
+        if self.compression == "zstd":
+            self._file.flush(zstandard.FLUSH_BLOCK)
+        else:
+            self._file.flush()
+        self._raw.flush()
+        self.records_written += 1
+        if self.sink is not None:
+            self._position += 1
+            self.sink.write(record, self.path, self._position)
+
+    def close(self):
+        """סוגר בלי לסיים - ה-.part נשאר להמשך הריצה"""
+        if self._file is not self._raw:
+            self._file.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+    def finalize(self):
+        """סוגר ומעביר את ה-.part לשם הסופי בפעולה אטומית אחת"""
+        self.close()
+        os.replace(self.part_path, self.path)
+        if self.sink is not None:
+            self.sink.flush()
+        return self.path
+
+
+def _repair_part(path, compression):
+    """
+    מחזיר .part של ריצה שנקטעה לסוף הרשומה השלמה האחרונה. בלי דחיסה - חיתוך אחרי ה-\n האחרון;
+    עם דחיסה ה-frame האחרון לא נסגר בקריסה, אז התוכן שנשטף לדיסק נכתב מחדש כ-frame שלם אחד.
+    """
+    if compression is None:
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - 65536)
+                f.seek(start)
+                found = f.read(pos - start).rfind(b"\n")
+                if found != -1:
+                    pos = start + found + 1
+                    break
+                pos = start
+            if pos != end:
+                f.truncate(pos)
+        return
+    with open(path, 'rb') as f:
+        data, complete = _decompress_frames(f.read(), compression)
+    keep = data[:data.rfind(b"\n") + 1]
+    if complete and len(keep) == len(data):
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as raw:
+        if compression == "gzip":
+            with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                f.write(keep)
+        else:
+            raw.write(zstandard.ZstdCompressor().compress(keep))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+
+
+def _decompress_frames(data, compression):
+    """כל מה שאפשר לפענח מ-frames משורשרים, כולל frame אחרון שלא נסגר: (תוכן, האם כל ה-frames שלמים)"""
+    errors = (zlib.error, zstandard.ZstdError) if zstandard else (zlib.error,)
+
+    def _decompressor():
+        if compression == "gzip":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    done = []
+    while data:
+        decompressor, frame, offset = _decompressor(), [], 0
+        while offset < len(data) and not decompressor.eof:
+            try:
+                frame.append(decompressor.decompress(data[offset:offset + 65536]))
+            except errors:
+                # בתים פגומים: מפענחים את הבלוק שוב בית אחר בית, עד הבית הפגום
+                decompressor = _decompressor()
+                frame = [decompressor.decompress(data[:offset])]
+                for index in range(offset, len(data)):
+                    try:
+                        frame.append(decompressor.decompress(data[index:index + 1]))
+                    except errors:
+                        break
+                return b"".join(done + frame), False
+            offset += 65536
+        done.extend(frame)
+        if not decompressor.eof:
+            return b"".join(done), False
+        data = decompressor.unused_data + data[offset:]
+    return b"".join(done), True
+
+
+def iter_records(path):
+    """קורא רשומות מקובץ JSONL (דחוס או לא), כולל קובץ .part שעדיין נכתב"""
+    compression = _compression_for(path)
+    if compression == "zstd":
+        _require_zstd()
+        with open(path, 'rb') as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            yield from _iter_lines(io.TextIOWrapper(reader, encoding='utf-8'))
+    elif compression == "gzip":
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            yield from _iter_lines(f)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from _iter_lines(f)
+
+
+def _iter_lines(f):
+    try:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # שורה חתוכה אחרי קריסה - מדלגים עליה ולא על כל מה שאחריה
+                continue
+    except EOFError:
+        # frame אחרון שלא נסגר בקובץ דחוס
+        return
+
+
+def story_item_info(item):
+    """metadata של פריט סטורי או היילייט"""
+    return {
+        "id": item.mediaid,
+        "shortcode": item.shortcode,
+        "date": item.date_local.isoformat(),
+        "typename": item.typename,
+        "is_video": item.is_video,
+        "url": item.url,
+        "caption": item.caption,
+    }
+
+
+def run_records_path(output_dir, run_id, compression=None):
+    return os.path.join(output_dir, RECORDS_DIR, f"{run_id}.jsonl{COMPRESSION_SUFFIXES[compression]}")
+
+
+def list_record_files(output_dir):
+    """קבצי הרשומות הסופיים של כל הריצות, מהישנה לחדשה"""
+    return sorted(path for path in glob.glob(os.path.join(output_dir, RECORDS_DIR, "*.jsonl*"))
+                  if not path.endswith(PART_SUFFIX))
+
+
+def build_summary(record_files):
+    """
+    מעבר זורם אחד על הרשומות: ספירות לפי סוג, טווח תאריכים, סכומי מעורבות והאשטאגים/אזכורים מובילים.
+    פוסט שמופיע בכמה ריצות נספר פעם אחת, לפי הרשומה החדשה ביותר.
+    """
+    latest_posts = {}
+    seen_items = {"story_item": set(), "highlight_item": set()}
+    for path in reversed(record_files):
+        for record in iter_records(path):
+            record_type = record.get("type")
+            if record_type == "post":
+                latest_posts.setdefault(record["shortcode"], {
+                    "date": record.get("date"),
+                    "likes": record.get("likes") or 0,
+                    "comments_count": record.get("comments_count") or 0,
+                    "is_video": bool(record.get("is_video")),
+                    "caption_hashtags": record.get("caption_hashtags") or [],
+                    "caption_mentions": record.get("caption_mentions") or [],
+                })
+            elif record_type in seen_items:
+                seen_items[record_type].add(record.get("id"))
+
+    hashtags = Counter()
+    mentions = Counter()
+    for post in latest_posts.values():
+        hashtags.update(post["caption_hashtags"])
+        mentions.update(post["caption_mentions"])
+    dates = sorted(post["date"] for post in latest_posts.values() if post["date"])
+    return {
+        "posts": len(latest_posts),
+        "videos": sum(1 for post in latest_posts.values() if post["is_video"]),
+        "story_items": len(seen_items["story_item"]),
+        "highlight_items": len(seen_items["highlight_item"]),
+        "newest_post_date": dates[-1] if dates else None,
+        "oldest_post_date": dates[0] if dates else None,
+        "total_likes": sum(post["likes"] for post in latest_posts.values()),
+        "total_comments": sum(post["comments_count"] for post in latest_posts.values()),
+        "top_hashtags": hashtags.most_common(TOP_TAGS),
+        "top_mentions": mentions.most_common(TOP_TAGS),
+    }
+
+
+def write_summary(output_dir, profile_data, stats, record_files=None):
+    """כותב את profile_data.json כמסמך סיכום שנבנה מקבצי הרשומות"""
+    record_files = list_record_files(output_dir) if record_files is None else record_files
+    summary = build_summary(record_files)
+    output_file = os.path.join(output_dir, "profile_data.json")
+    write_json_atomic(output_file, {
+        "profile": profile_data,
+        "summary": summary,
+        "stats": stats,
+        "record_files": [os.path.relpath(path, output_dir) for path in record_files],
+        "scan_date": datetime.now().isoformat(),
+    }, indent=2)
+    return output_file
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+אינדקס הפוך של האשטאגים ואזכורים בכל הפרופילים שנסרקו: תג -> (פרופיל, shortcode, תאריך)
+האינדקס מתעדכן בזמן הסריקה - הוא מקבל את הרשומות כמו sink - כך ששאלה כמו
+"מי מהמשפיענים הזכיר את @brand ב-90 הימים האחרונים" היא שאילתה אחת על index.db ולא מעבר על כל קבצי ה-JSON.
+תגים מהביו נרשמים עם shortcode ריק ותאריך הסריקה שבה נראו.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+from .sink import Sink
+from .stream import iter_records, list_record_files
+
+TAG_INDEX_FILE = ".tag_index.db"
+KINDS = {"#": "hashtag", "@": "mention"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    kind TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    username TEXT NOT NULL,
+    shortcode TEXT NOT NULL,
+    date TEXT,
+    source TEXT NOT NULL,
+    PRIMARY KEY (kind, tag, username, shortcode)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_by_date ON tags (kind, tag, date);
+CREATE INDEX IF NOT EXISTS tags_by_post ON tags (username, shortcode);
+"""
+
+
+def parse_tag(value, default_kind="hashtag"):
+    """'#summer' -> ('hashtag', 'summer'), '@brand' -> ('mention', 'brand'); בלי תחילית - default_kind"""
+    value = value.strip()
+    kind = KINDS.get(value[:1])
+    if kind is not None:
+        value = value[1:]
+    return kind or default_kind, value.lower()
+
+
+def format_tag(kind, tag):
+    return ("#" if kind == "hashtag" else "@") + tag
+
+
+def _timestamp(value):
+    """תאריך לשמירה ולהשוואה: ISO ב-UTC בלי אזור זמן (date - תחילת היום)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec='seconds')
+
+
+def days_ago(days):
+    """since ל-N הימים האחרונים"""
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def _post_tags(record):
+    return ([("hashtag", tag) for tag in record.get("caption_hashtags") or []] +
+            [("mention", tag) for tag in record.get("caption_mentions") or []])
+
+
+def _bio_tags(record):
+    return ([("hashtag", tag) for tag in record.get("bio_hashtags") or []] +
+            [("mention", tag) for tag in record.get("bio_mentions") or []])
+
+
+class TagIndex(Sink):
+    """
+    index.db (SQLite) בתיקיית הפלט של כל הסריקות. מחבר ל-RecordStream כמו RecordSink (write / flush / close),
+    וכל רשומת post או profile מחליפה את התגים של אותו פוסט / ביו - כיתוב שנערך מוריד גם תגים שנמחקו ממנו.
+    חיבור SQLite נפרד לכל thread, כמו ב-MediaStore, כך שכל ה-workers כותבים אליו יחד.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(int)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+
+    def _db(self):
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return self._local.db
+
+    # --- עדכון ---
+
+    def write(self, record, source=None, position=None):
+        """מעדכן את האינדקס מרשומה אחת (post / profile); שאר הסוגים לא מכילים תגים ומדולגים"""
+        record_type = record.get("type")
+        username = record.get("username")
+        if record_type == "post":
+            self._replace(username, record["shortcode"], _post_tags(record), _timestamp(record.get("date")), "caption")
+        elif record_type == "profile":
+            self._replace(username, "", _bio_tags(record), _timestamp(datetime.now(timezone.utc)), "bio")
+
+    def _replace(self, username, shortcode, tags, at, source):
+        rows = {(kind, tag.lower()) for kind, tag in tags if tag}
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM tags WHERE username = ? AND shortcode = ?", (username, shortcode))
+            db.executemany("INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?, ?, ?)",
+                           [(kind, tag, username, shortcode, at, source) for kind, tag in rows])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._stats["posts" if source == "caption" else "profiles"] += 1
+            self._stats["tags"] += len(rows)
+
+    def flush(self):
+        """כל רשומה נכתבת בטרנזקציה משלה - אין מה לשטוף"""
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        if hasattr(self._local, "db"):
+            self._local.db.close()
+            del self._local.db
+
+    # --- שאילתות ---
+
+    @staticmethod
+    def _range(since, until, usernames, column="date"):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(_timestamp(until))
+        if usernames:
+            usernames = list(usernames)
+            clauses.append(f"username IN ({','.join('?' * len(usernames))})")
+            params.extend(usernames)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def posts(self, *tags, since=None, until=None, usernames=None, include_bio=False):
+        """
+        הפוסטים שיש בהם את כל התגים ('#tag' / '@user'), מהחדש לישן: [{username, shortcode, date}].
+        since / until - datetime, date או מחרוזת ISO (until לא כולל); usernames - רק הפרופילים האלה.
+        """
+        if not tags:
+            return []
+        where, params = self._range(since, until, usernames)
+        if not include_bio:
+            where += " AND source = 'caption'"
+        # פוסט שמופיע פעם אחת לכל תג מבוקש מכיל את כולם
+        matches = " OR ".join("(kind = ? AND tag = ?)" for _ in tags)
+        keys = [value for tag in tags for value in parse_tag(tag)]
+        rows = self._db().execute(
+            f"SELECT username, shortcode, MAX(date) FROM tags WHERE ({matches}){where} "
+            f"GROUP BY username, shortcode HAVING COUNT(*) = ? ORDER BY MAX(date) DESC",
+            keys + params + [len(set(parse_tag(tag) for tag in tags))]).fetchall()
+        return [{"username": username, "shortcode": shortcode, "date": at} for username, shortcode, at in rows]
+
+    def profiles(self, tag, since=None, until=None, include_bio=True):
+        """אילו פרופילים השתמשו בתג: {username: {posts, last_date, in_bio}}, מהאחרון שהשתמש בו"""
+        kind, value = parse_tag(tag)
+        where, params = self._range(since, until, None)
+        if not include_bio:
+            where += " AND source = 'caption'"
+        rows = self._db().execute(
+            f"SELECT username, SUM(source = 'caption'), MAX(date), MAX(source = 'bio') FROM tags "
+            f"WHERE kind = ? AND tag = ?{where} GROUP BY username ORDER BY MAX(date) DESC",
+            [kind, value] + params).fetchall()
+        return {username: {"posts": posts, "last_date": last, "in_bio": bool(in_bio)}
+                for username, posts, last, in_bio in rows}
+
+    def related(self, tag, since=None, until=None, limit=20):
+        """התגים שמופיעים הכי הרבה יחד עם tag באותם פוסטים: [(tag, פוסטים משותפים)]"""
+        kind, value = parse_tag(tag)
+        where, params = self._range(since, until, None, "base.date")
+        rows = self._db().execute(
+            f"SELECT other.kind, other.tag, COUNT(*) FROM tags AS base JOIN tags AS other "
+            f"ON other.username = base.username AND other.shortcode = base.shortcode "
+            f"WHERE base.kind = ? AND base.tag = ? AND base.source = 'caption'{where} "
+            f"AND NOT (other.kind = base.kind AND other.tag = base.tag) "
+            f"GROUP BY other.kind, other.tag ORDER BY COUNT(*) DESC, other.tag LIMIT ?",
+            [kind, value] + params + [limit]).fetchall()
+        return [(format_tag(other_kind, other_tag), count) for other_kind, other_tag, count in rows]
+
+    def top(self, kind="hashtag", since=None, until=None, usernames=None, limit=20):
+        """התגים הנפוצים ביותר בטווח: [(tag, פוסטים, פרופילים)]"""
+        where, params = self._range(since, until, usernames)
+        rows = self._db().execute(
+            f"SELECT tag, COUNT(*), COUNT(DISTINCT username) FROM tags WHERE kind = ? AND source = 'caption'{where} "
+            f"GROUP BY tag ORDER BY COUNT(*) DESC, tag LIMIT ?", [kind] + params + [limit]).fetchall()
+        return [(format_tag(kind, tag), posts, profiles) for tag, posts, profiles in rows]
+
+
+def index_records(index, output_dirs):
+    """
+    בונה את האינדקס מקבצי הרשומות הקיימים (פרופילים שנסרקו לפני שהאינדקס היה קיים).
+    הקבצים עוברים מהישן לחדש, כך שהרשומה האחרונה של כל פוסט קובעת את התגים שלו. מחזיר כמה רשומות נקראו.
+    """
+    records = 0
+    for output_dir in output_dirs:
+        for path in list_record_files(output_dir):
+            for record in iter_records(path):
+                if record.get("type") in ("post", "profile"):
+                    index.write(record)
+                    records += 1
+    return records
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+worker שרץ ברקע ומושך משימות סריקה מ-JobQueue
+ה-contexts של instaloader נבנים ומתחברים פעם אחת ונשארים חמים בין משימות (אותו SessionPool, אותו MediaPipeline),
+כך שכל סריקה חוסכת את ה-import, בניית ה-Instaloader וטעינת ה-session. אין שום קלט מהמשתמש.
+להגדלת קצב: עוד threads בתהליך, או עוד תהליכי worker על אותו קובץ תור.
+"""
+
+import dataclasses
+import os
+import threading
+
+from .engine import scan_with_sessions
+from .jobs import LEASE_SECONDS, new_worker_id
+from .media import MediaPipeline
+from .metrics import MetricsRecorder
+from .ratecontrol import RATE_STATE_FILE
+from .scan import ScanOptions
+from .sessions import SessionPool
+from .sink import combine_sinks
+
+POLL_INTERVAL = 5.0
+# סטטוסים של סריקה שכדאי לנסות שוב מאוחר יותר
+RETRY_STATUSES = ("connection_error", "error")
+
+
+def _media_delta(before, after):
+    return {key: value - before.get(key, 0) for key, value in after.items()}
+
+
+class ScanWorker:
+    """
+    queue - JobQueue; output_root - תיקיית הפלט (תיקייה לכל פרופיל, כמו ב-run_batch).
+    threads - כמה משימות רצות במקביל בתהליך הזה.
+    options של משימה (JSON) דורסים את שדות ScanOptions שניתנו ל-worker.
+    media_store - MediaStore משותף למדיה של כל המשימות; postprocess - PostProcessor לקבצים שירדו.
+    sink - RecordSink שמקבל את הרשומות של כל המשימות; tag_index - TagIndex שמתעדכן מהן.
+    profile_cache - ProfileCache משותף לכל המשימות; rag - RagPreprocessor שמכין chunks מהפוסטים שלהן.
+    """
+
+    def __init__(self, queue, output_root, accounts=(), options=None, threads=1, media_workers=8, media_queue=64,
+                 rate_state_file=RATE_STATE_FILE, cache=None, lease_seconds=LEASE_SECONDS,
+                 poll_interval=POLL_INTERVAL, worker_id=None, metrics_file=None, media_store=None,
+                 postprocess=None, sink=None, tag_index=None, profile_cache=None, rag=None):
+        self.queue = queue
+        self.output_root = output_root
+        self.options = options or ScanOptions()
+        self.threads = threads
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or new_worker_id()
+        self.stop_event = threading.Event()
+        self.sink = combine_sinks(sink, tag_index, rag)
+        self.profile_cache = profile_cache
+        os.makedirs(output_root, exist_ok=True)
+        self.sessions = SessionPool(list(accounts), rate_state_file, cache)
+        self.media = MediaPipeline(workers=media_workers, max_queue=media_queue, store=media_store,
+                                   postprocess=postprocess)
+        self.metrics = MetricsRecorder(metrics_file or os.path.join(output_root, f"metrics_{self.worker_id}.jsonl"))
+        self._lock = threading.Lock()
+        self._current = {}
+        self._done = 0
+        self._failed = 0
+
+    def stop(self):
+        """עצירה מסודרת: הסריקות הנוכחיות נעצרות אחרי הפוסט הנוכחי וחוזרות לתור עם checkpoint"""
+        self.stop_event.set()
+
+    def _job_options(self, job):
+        fields = {field.name for field in dataclasses.fields(ScanOptions)}
+        overrides = {key: value for key, value in (job.get("options") or {}).items() if key in fields}
+        return dataclasses.replace(self.options, **overrides)
+
+    def _heartbeat(self, status="running"):
+        with self._lock:
+            current = {job_id: username for job_id, username in self._current.items()}
+            done, failed = self._done, self._failed
+        self.queue.extend(list(current), self.worker_id, self.lease_seconds)
+        self.queue.heartbeat(self.worker_id, status, list(current.values()), done, failed)
+
+    def _heartbeat_loop(self):
+        # מחדש את ה-lease בתדירות גבוהה מספיק כדי שלא יפוג באמצע סריקה ארוכה
+        while not self.stop_event.wait(min(self.lease_seconds / 3, 60)):
+            self._heartbeat()
+
+    def run_job(self, job):
+        username = job["username"]
+        with self._lock:
+            self._current[job["id"]] = username
+        print(f"📋 משימה #{job['id']}: @{username} (ניסיון {job['attempts']}/{job['max_attempts']})", flush=True)
+        media_before = self.media.stats(username)
+        try:
+            entry = scan_with_sessions(self.sessions, username, os.path.join(self.output_root, username),
+                                       self._job_options(job), self.stop_event, self.media, self.metrics, self.sink,
+                                       self.profile_cache)
+            # המשימה מסתיימת רק כשכל המדיה שלה ירדה
+            self.media.wait(username)
+            entry["media"] = _media_delta(media_before, self.media.stats(username))
+            if entry["status"] == "ok":
+                self.queue.complete(job["id"], self.worker_id, entry)
+            elif entry["status"] == "interrupted":
+                self.queue.release(job["id"], self.worker_id)
+            else:
+                self.queue.fail(job["id"], self.worker_id, entry.get("error"),
+                                retry=entry["status"] in RETRY_STATUSES, result=entry)
+            with self._lock:
+                if entry["status"] == "ok":
+                    self._done += 1
+                elif entry["status"] != "interrupted":
+                    self._failed += 1
+            return entry
+        finally:
+            with self._lock:
+                self._current.pop(job["id"], None)
+
+    def _loop(self, max_jobs, until_empty):
+        handled = 0
+        while not self.stop_event.is_set() and (max_jobs is None or handled < max_jobs):
+            try:
+                job = self.queue.claim(self.worker_id, self.lease_seconds)
+                if job is None:
+                    if until_empty and not self.queue.has_pending():
+                        break
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+            except Exception as e:
+                # התור לא זמין (coordinator שנפל) - ה-thread מחכה ומנסה שוב במקום למות בשקט
+                print(f"⚠️  משיכת משימה מהתור נכשלה ({str(e)}); ינסה שוב", flush=True)
+                self.stop_event.wait(self.poll_interval)
+                continue
+            try:
+                self.run_job(job)
+            except Exception as e:
+                # המשימה נשארת running עד שה-lease שלה פג, ואז חוזרת לתור
+                with self._lock:
+                    self._failed += 1
+                print(f"⚠️  משימה #{job['id']} (@{job['username']}) נכשלה: {str(e)}", flush=True)
+            handled += 1
+
+    def run(self, max_jobs=None, until_empty=False):
+        """
+        מושך ומריץ משימות עד stop(). max_jobs - מקסימום משימות לכל thread;
+        until_empty - לצאת כשאין יותר משימות ממתינות או רצות בתור.
+        """
+        print(f"🤖 worker {self.worker_id} מתחיל ({self.threads} threads, חשבונות: "
+              f"{', '.join(self.sessions.usernames())})", flush=True)
+        self._heartbeat("idle")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._loop, args=(max_jobs, until_empty), name=f"job-{index}")
+                   for index in range(self.threads)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                # join עם timeout כדי ש-Ctrl+C יגיע ל-thread הראשי
+                while thread.is_alive():
+                    thread.join(1.0)
+        except KeyboardInterrupt:
+            print("\n⚠️  עוצר את ה-worker ומחזיר משימות פתוחות לתור...", flush=True)
+            self.stop()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.stop_event.set()
+            heartbeat.join()
+            self.media.close()
+            self.sessions.close()
+            self.metrics.close()
+            if self.sink is not None:
+                self.sink.close()
+            self._heartbeat("stopped")
+        return {"worker": self.worker_id, "done": self._done, "failed": self._failed}
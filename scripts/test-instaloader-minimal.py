@@ -6,23 +6,22 @@
 
 import instaloader
 import json
-import time
+
+from instaloader_scan.ratecontrol import RATE_STATE_FILE, rate_stats, shared_rate_controller
 
 PROFILE_NAME = "miranbuzaglo"
 
 def main():
     print("🔍 מנסה לקרוא מידע בסיסי על הפרופיל...")
     
-    # יצירת instance פשוט עם rate limiting נמוך
+    # קצב הבקשות נקבע לפי תקציב משותף עם שאר הסקריפטים שרצים על המכונה, במקום המתנה קבועה
     L = instaloader.Instaloader(
         quiet=False,
         user_agent='Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15',
-        max_connection_attempts=1,
+        max_connection_attempts=3,
+        rate_controller=shared_rate_controller("anonymous", RATE_STATE_FILE),
     )
     
-    # המתנה קצרה לפני הבקשה
-    time.sleep(3)
-    
     try:
         print(f"📱 מנסה לטעון פרופיל {PROFILE_NAME}...")
         profile = instaloader.Profile.from_username(L.context, PROFILE_NAME)
@@ -101,6 +100,10 @@ def main():
         print(f"❌ שגיאה: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        rate = rate_stats("anonymous")
+        print(f"\n📡 בקשות: {rate.get('requests', 0)} | ⏳ המתנה: {rate.get('wait_seconds', 0)} שניות | "
+              f"🚦 חסימות: {rate.get('throttle_events', 0)}")
 
 if __name__ == "__main__":
     main()
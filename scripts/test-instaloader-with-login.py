@@ -13,11 +13,13 @@
 """
 
 import instaloader
-import json
-from datetime import datetime
-import os
 import sys
 import getpass
+from datetime import datetime
+
+from instaloader_scan.comments import collect_comments, new_comment_stats
+from instaloader_scan.ratecontrol import RATE_STATE_FILE, rate_stats, shared_rate_controller
+from instaloader_scan.stream import RecordStream, run_records_path, write_summary
 
 # שם הפרופיל לסריקה
 PROFILE_NAME = "miranbuzaglo"
@@ -40,6 +42,11 @@ def login_to_instagram(L, username=None):
     except Exception as e:
         print(f"⚠️  לא ניתן לטעון session: {str(e)}")
     
+    # בלי טרמינל (cron, pipe) אין מי שיקליד סיסמה - לא חוסמים על stdin
+    if not sys.stdin.isatty():
+        print("⚠️  אין טרמינל אינטראקטיבי - מדלג על התחברות עם סיסמה")
+        return False
+
     # בקשת התחברות חדשה
     if not username:
         username = input("👤 שם משתמש באינסטגרם: ")
@@ -88,18 +95,25 @@ def main():
         download_videos=True,
         download_video_thumbnails=True,
         download_geotags=True,
-        download_comments=True,
+        # התגובות נשמרות ברשומות; download_comments היה שולף את כל התגובות של כל פוסט
+        download_comments=False,
         save_metadata=True,
         compress_json=False,
         post_metadata_txt_pattern='',
         max_connection_attempts=3,
         dirname_pattern=OUTPUT_DIR,
         request_timeout=300,
+        # תקציב בקשות לפי החשבון שמתחברים אליו, משותף עם שאר הסריקות שרצות על המכונה
+        rate_controller=shared_rate_controller(None, RATE_STATE_FILE),
     )
     
     # שאלה האם להתחבר
     print("ℹ️  לסריקה מלאה (כולל סטוריז והיילייטס) נדרשת התחברות")
-    login_choice = input("האם ברצונך להתחבר? (y/n): ").lower()
+    if sys.stdin.isatty():
+        login_choice = input("האם ברצונך להתחבר? (y/n): ").lower()
+    else:
+        print("💡 להרצה לא אינטראקטיבית עם כמה חשבונות: python3 scripts/instaloader-scan.py --login USER")
+        login_choice = 'n'
     
     if login_choice == 'y':
         username = input("👤 שם משתמש באינסטגרם (או Enter לדלג): ").strip()
@@ -136,6 +150,11 @@ def main():
             profile_data["bio_mentions"] = profile.biography_mentions
         if profile.biography_hashtags:
             profile_data["bio_hashtags"] = profile.biography_hashtags
+
+        # כל פוסט / פריט סטורי / פריט היילייט נכתב לקובץ הרשומות ברגע שהוא נאסף
+        # קובץ רשומות חדש לכל ריצה, כמו בסריקה הרגילה - ריצה שקרסה לא נדבקת לריצה הבאה ולא דורסת ריצה קודמת
+        records = RecordStream(run_records_path(OUTPUT_DIR, datetime.now().strftime("%Y%m%dT%H%M%S%f")))
+        records.write({"type": "profile", **profile_data})
             
         print(f"\n✅ פרופיל נטען בהצלחה!")
         print(f"👤 שם: {profile.full_name}")
@@ -169,6 +188,8 @@ def main():
                         for item in story.get_items():
                             try:
                                 L.download_storyitem(item, f"{OUTPUT_DIR}/stories")
+                                records.write({"type": "story_item", "id": item.mediaid,
+                                               "date": item.date_local.isoformat(), "is_video": item.is_video})
                                 stories_downloaded += 1
                                 print(f"    ✓ הורד פריט סטורי #{stories_downloaded}")
                             except Exception as e:
@@ -194,6 +215,9 @@ def main():
                     for item in highlight.get_items():
                         try:
                             L.download_storyitem(item, f"{OUTPUT_DIR}/highlights/{highlight.title}")
+                            records.write({"type": "highlight_item", "id": item.mediaid,
+                                           "highlight_title": highlight.title,
+                                           "date": item.date_local.isoformat(), "is_video": item.is_video})
                             highlights_downloaded += 1
                             print(f"    ✓ הורד פריט #{highlights_downloaded}")
                         except Exception as e:
@@ -211,8 +235,8 @@ def main():
         # הורדת פוסטים
         print(f"\n📸 מוריד פוסטים (מקסימום {MAX_POSTS})...")
         print("ℹ️  זה עשוי לקחת זמן...\n")
-        posts_data = []
         post_count = 0
+        comment_stats = new_comment_stats()
         
         for post in profile.get_posts():
             if post_count >= MAX_POSTS:
@@ -241,31 +265,18 @@ def main():
                     "location": post.location.name if post.location else None,
                 }
                 
-                # הורדת תגובות
-                comments_list = []
-                comment_count = 0
-                
+                # תגובות מתוך נתוני הפוסט; get_comments() רק אם אין מספיק
                 try:
-                    for comment in post.get_comments():
-                        if comment_count >= MAX_COMMENTS_PER_POST:
-                            break
-                        
-                        comments_list.append({
-                            "id": comment.id,
-                            "owner": comment.owner.username,
-                            "text": comment.text,
-                            "created_at": comment.created_at_utc.isoformat(),
-                            "likes": comment.likes_count if hasattr(comment, 'likes_count') else 0,
-                        })
-                        comment_count += 1
-                    
-                    if comment_count > 0:
-                        print(f"     ✓ {comment_count} תגובות")
+                    comments_list = collect_comments(post, MAX_COMMENTS_PER_POST, comment_stats,
+                                                     logged_in=L.context.is_logged_in)
+                    if comments_list:
+                        print(f"     ✓ {len(comments_list)} תגובות")
                 except Exception as e:
+                    comments_list = []
                     print(f"     ⚠️  שגיאה בתגובות: {str(e)}")
                 
                 post_info["comments"] = comments_list
-                posts_data.append(post_info)
+                records.write({"type": "post", **post_info})
                 
             except Exception as e:
                 print(f"     ⚠️  שגיאה: {str(e)}")
@@ -276,25 +287,18 @@ def main():
         
         print(f"\n✅ הורדו {post_count} פוסטים")
         
-        # שמירת כל הנתונים לקובץ JSON
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        output_file = f"{OUTPUT_DIR}/profile_data.json"
-        
-        full_data = {
-            "profile": profile_data,
-            "posts": posts_data,
-            "stats": {
-                "total_posts_scanned": post_count,
-                "stories_downloaded": stories_downloaded,
-                "highlights_downloaded": highlights_downloaded,
-            },
-            "scan_date": datetime.now().isoformat(),
+        # סגירת קובץ הרשומות ובניית profile_data.json כסיכום שלו
+        records_file = records.finalize()
+        stats = {
+            "total_posts_scanned": post_count,
+            "stories_downloaded": stories_downloaded,
+            "highlights_downloaded": highlights_downloaded,
+            "comments": comment_stats,
         }
+        output_file = write_summary(OUTPUT_DIR, profile_data, stats, [records_file])
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(full_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n💾 כל הנתונים נשמרו ב: {output_file}")
+        print(f"\n💾 הרשומות נשמרו ב: {records_file}")
+        print(f"💾 סיכום נשמר ב: {output_file}")
         
         # סיכום
         print("\n" + "="*60)
@@ -305,10 +309,15 @@ def main():
         print(f"   עוקבים: {profile.followers:,}")
         print(f"\n✅ תמונת פרופיל: הורדה")
         print(f"✅ פוסטים: {post_count}")
+        print(f"💬 בקשות תגובות שנחסכו: {comment_stats['requests_saved']}")
+        rate = rate_stats(None)
+        print(f"📡 בקשות: {rate.get('requests', 0)} | ⏳ המתנה: {rate.get('wait_seconds', 0)} שניות | "
+              f"🚦 חסימות: {rate.get('throttle_events', 0)}")
         print(f"✅ סטוריז: {stories_downloaded} פריטים")
         print(f"✅ היילייטס: {highlights_downloaded} פריטים")
         print(f"\n📁 מיקום קבצים: {OUTPUT_DIR}/")
-        print(f"📄 קובץ נתונים: {output_file}")
+        print(f"📄 קובץ רשומות: {records_file}")
+        print(f"📄 קובץ סיכום: {output_file}")
         print("="*60)
         
         # המלצות
@@ -318,14 +327,19 @@ def main():
         print("\n2. לסריקה מלאה מהטרמינל:")
         print(f"   instaloader --login YOUR_USERNAME --stories --highlights --comments {PROFILE_NAME}")
         print("\n3. ה-session נשמר, אז בפעם הבאה לא תצטרך להתחבר שוב")
+        print("\n4. לסריקה של כמה פרופילים במקביל:")
+        print("   python3 scripts/instaloader-scan.py influencers.txt --workers 4 --login YOUR_USERNAME")
         
     except instaloader.exceptions.ProfileNotExistsException:
         print(f"❌ שגיאה: הפרופיל '{PROFILE_NAME}' לא קיים")
         sys.exit(1)
     except instaloader.exceptions.ConnectionException as e:
         print(f"❌ שגיאת חיבור: {str(e)}")
+        rate = rate_stats(None)
+        print(f"📡 בקשות: {rate.get('requests', 0)} | ⏳ המתנה: {rate.get('wait_seconds', 0)} שניות | "
+              f"🚦 חסימות: {rate.get('throttle_events', 0)} {rate.get('throttle_reasons', {})}")
         print("💡 ייתכן שאינסטגרם חסם את הבקשה. המלצות:")
-        print("   - נסה שוב בעוד כמה דקות")
+        print("   - הסריקה כבר האטה וחיכתה אחרי כל חסימה; הרצה חוזרת תמשיך מאותו תקציב")
         print("   - השתמש בהתחברות")
         print("   - ודא שיש לך חיבור אינטרנט יציב")
         sys.exit(1)
@@ -335,7 +349,7 @@ def main():
         sys.exit(1)
     except KeyboardInterrupt:
         print("\n\n⚠️  הסריקה הופסקה על ידי המשתמש")
-        print("💡 ניתן להמשיך מאוחר יותר עם --fast-update")
+        print("💡 לסריקה שממשיכה מאותה נקודה השתמש ב-scripts/instaloader-scan.py (שומר checkpoint לכל פרופיל)")
         sys.exit(0)
     except Exception as e:
         print(f"❌ שגיאה לא צפויה: {str(e)}")
@@ -13,10 +13,11 @@
 """
 
 import instaloader
-import json
-from datetime import datetime
-import os
 import sys
+from datetime import datetime
+
+from instaloader_scan.comments import collect_comments, new_comment_stats
+from instaloader_scan.stream import RecordStream, run_records_path, write_summary
 
 # שם הפרופיל לסריקה
 PROFILE_NAME = "miranbuzaglo"
@@ -34,7 +35,8 @@ def main():
         download_videos=True,
         download_video_thumbnails=True,
         download_geotags=True,
-        download_comments=True,
+        # התגובות נשמרות ברשומות; download_comments היה שולף את כל התגובות של כל פוסט
+        download_comments=False,
         save_metadata=True,
         compress_json=False,
         post_metadata_txt_pattern='',
@@ -67,6 +69,11 @@ def main():
             profile_data["bio_mentions"] = profile.biography_mentions
         if profile.biography_hashtags:
             profile_data["bio_hashtags"] = profile.biography_hashtags
+
+        # כל פוסט / פריט סטורי / פריט היילייט נכתב לקובץ הרשומות ברגע שהוא נאסף
+        # קובץ רשומות חדש לכל ריצה, כמו בסריקה הרגילה - ריצה שקרסה לא נדבקת לריצה הבאה ולא דורסת ריצה קודמת
+        records = RecordStream(run_records_path(OUTPUT_DIR, datetime.now().strftime("%Y%m%dT%H%M%S%f")))
+        records.write({"type": "profile", **profile_data})
             
         print(f"\n✅ פרופיל נטען בהצלחה!")
         print(f"👤 שם: {profile.full_name}")
@@ -90,6 +97,8 @@ def main():
                     print(f"  📌 מצאתי סטורי עם {story.itemcount} פריטים")
                     for item in story.get_items():
                         L.download_storyitem(item, f"{OUTPUT_DIR}/stories")
+                        records.write({"type": "story_item", "id": item.mediaid,
+                                       "date": item.date_local.isoformat(), "is_video": item.is_video})
                         print(f"    ✓ הורד פריט סטורי")
             else:
                 print("⚠️  אין סטוריז פומביים זמינים (או שנדרשת התחברות)")
@@ -107,6 +116,8 @@ def main():
                 print(f"  📌 היילייט: {highlight.title} ({highlight.itemcount} פריטים)")
                 for item in highlight.get_items():
                     L.download_storyitem(item, f"{OUTPUT_DIR}/highlights/{highlight.title}")
+                    records.write({"type": "highlight_item", "id": item.mediaid, "highlight_title": highlight.title,
+                                   "date": item.date_local.isoformat(), "is_video": item.is_video})
                     print(f"    ✓ הורד פריט מהיילייט")
             
             if highlight_count == 0:
@@ -119,8 +130,8 @@ def main():
         
         # הורדת פוסטים
         print(f"\n📸 מוריד פוסטים (מקסימום {MAX_POSTS})...")
-        posts_data = []
         post_count = 0
+        comment_stats = new_comment_stats()
         
         for post in profile.get_posts():
             if post_count >= MAX_POSTS:
@@ -150,31 +161,17 @@ def main():
                 "location": post.location.name if post.location else None,
             }
             
-            # הורדת תגובות (עד 3 ראשונות)
-            print(f"     💬 מוריד עד {MAX_COMMENTS_PER_POST} תגובות...")
-            comments_list = []
-            comment_count = 0
-            
+            # תגובות מתוך נתוני הפוסט; get_comments() רק אם אין מספיק
             try:
-                for comment in post.get_comments():
-                    if comment_count >= MAX_COMMENTS_PER_POST:
-                        break
-                    
-                    comments_list.append({
-                        "id": comment.id,
-                        "owner": comment.owner.username,
-                        "text": comment.text,
-                        "created_at": comment.created_at_utc.isoformat(),
-                        "likes": comment.likes_count if hasattr(comment, 'likes_count') else 0,
-                    })
-                    comment_count += 1
-                
-                print(f"     ✓ הורדו {comment_count} תגובות")
+                comments_list = collect_comments(post, MAX_COMMENTS_PER_POST, comment_stats,
+                                                 logged_in=L.context.is_logged_in)
+                print(f"     ✓ {len(comments_list)} תגובות")
             except Exception as e:
+                comments_list = []
                 print(f"     ⚠️  שגיאה בהורדת תגובות: {str(e)}")
             
             post_info["comments"] = comments_list
-            posts_data.append(post_info)
+            records.write({"type": "post", **post_info})
             
             # הצגת התקדמות
             if post_count % 10 == 0:
@@ -182,20 +179,12 @@ def main():
         
         print(f"\n✅ הורדו {post_count} פוסטים")
         
-        # שמירת כל הנתונים לקובץ JSON
-        output_file = f"{OUTPUT_DIR}/profile_data.json"
-        full_data = {
-            "profile": profile_data,
-            "posts": posts_data,
-            "scan_date": datetime.now().isoformat(),
-            "total_posts_scanned": post_count,
-        }
-        
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(full_data, f, ensure_ascii=False, indent=2)
+        # סגירת קובץ הרשומות ובניית profile_data.json כסיכום שלו
+        records_file = records.finalize()
+        output_file = write_summary(OUTPUT_DIR, profile_data, {"total_posts_scanned": post_count, "comments": comment_stats}, [records_file])
         
-        print(f"\n💾 כל הנתונים נשמרו ב: {output_file}")
+        print(f"\n💾 הרשומות נשמרו ב: {records_file}")
+        print(f"💾 סיכום נשמר ב: {output_file}")
         
         # סיכום
         print("\n" + "="*60)
@@ -204,6 +193,7 @@ def main():
         print(f"✅ פרופיל: {profile.username} ({profile.full_name})")
         print(f"✅ תמונת פרופיל: הורדה")
         print(f"✅ פוסטים: {post_count}")
+        print(f"💬 בקשות תגובות שנחסכו: {comment_stats['requests_saved']}")
         print(f"✅ נתוני JSON: נשמרו")
         print(f"📁 מיקום קבצים: {OUTPUT_DIR}/")
         print("="*60)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""הבדיקות מייבאות את instaloader_scan כמו סקריפטי ה-CLI, מתיקיית scripts"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instaloader_scan.bench import BENCH_ACCOUNT, BENCH_SESSION, _UnthrottledRateController, start_standin  # noqa: E402
+from instaloader_scan.loader import build_loader  # noqa: E402
+from instaloader_scan.standin import StandinConfig, redirect_instagram  # noqa: E402
+
+STANDIN_CONFIG = StandinConfig(posts=20, stories=2, highlights=2, highlight_items=3, preview_comments=1,
+                               image_bytes=1024, video_bytes=4096)
+
+
+@pytest.fixture(scope="session")
+def standin():
+    """שרת מדומה אחד לכל הבדיקות; כל הבקשות לאינסטגרם בתהליך מופנות אליו"""
+    process, url = start_standin(STANDIN_CONFIG)
+    with redirect_instagram(url):
+        yield url
+    process.terminate()
+    process.join()
+
+
+def _loader(logged_in):
+    L = build_loader(rate_controller=_UnthrottledRateController)
+    L.context.sleep = False
+    if logged_in:
+        L.context.load_session(BENCH_ACCOUNT, BENCH_SESSION)
+    return L
+
+
+@pytest.fixture
+def loader(standin):
+    """Instaloader אנונימי מול השרת המדומה, בלי המתנות"""
+    L = _loader(logged_in=False)
+    yield L
+    L.close()
+
+
+@pytest.fixture
+def logged_in_loader(standin):
+    """Instaloader מחובר (סטוריז והיילייטס) מול השרת המדומה"""
+    L = _loader(logged_in=True)
+    yield L
+    L.close()
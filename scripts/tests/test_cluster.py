@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+coordinator עם שני nodes אמיתיים (ScanWorker מעל RemoteQueue / RemoteSink) מול השרת המדומה (standin.py):
+node שנעלם באמצע משימה מוצא מהטבעת והמשימות שלו עוברות לאחרים, ורשומות שלא הגיעו ל-coordinator נשלחות שוב.
+"""
+
+import glob
+import os
+import threading
+
+import pytest
+
+import instaloader_scan.sessions as sessions_module
+from instaloader_scan.bench import _UnthrottledRateController
+from instaloader_scan.cluster import CoordinatorServer, HashRing, MergedStore, RemoteQueue, RemoteSink, \
+    ShardCoordinator
+from instaloader_scan.jobs import JobQueue, job_bucket
+from instaloader_scan.scan import ScanOptions
+from instaloader_scan.stream import RecordStream, iter_records, run_records_path
+from instaloader_scan.worker import ScanWorker
+
+NODES = ("node-a", "node-b")
+LOST_NODE = "node-c"
+NODE_TIMEOUT = 4.0
+LEASE_SECONDS = 3.0
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    server = CoordinatorServer(ShardCoordinator(queue, node_timeout=NODE_TIMEOUT),
+                               MergedStore(str(tmp_path / "merged")), host="127.0.0.1", port=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fast_loaders(monkeypatch):
+    """בלי תקציבי הבקשות ובלי ההמתנה האקראית של instaloader - השרת המדומה לא מגביל"""
+    build_loader = sessions_module.build_loader
+
+    def unthrottled(rate_controller=None, quiet=True):
+        L = build_loader(rate_controller=_UnthrottledRateController, quiet=quiet)
+        L.context.sleep = False
+        return L
+
+    monkeypatch.setattr(sessions_module, "build_loader", unthrottled)
+
+
+def _usernames():
+    """פרופילים שמתחלקים בין שלושת ה-nodes, כך שלכל אחד (גם זה שייעלם) יש לפחות אחד"""
+    ring = HashRing(NODES + (LOST_NODE,))
+    usernames, owners = [], set()
+    for index in range(200):
+        username = f"creator_{index}"
+        usernames.append(username)
+        owners.add(ring.bucket_owner(job_bucket(username)))
+        if len(usernames) >= 6 and owners == set(ring.nodes):
+            return usernames
+    raise AssertionError("לא נמצאה חלוקה שמגיעה לכל ה-nodes")
+
+
+def test_lost_node_jobs_move_to_the_other_nodes(coordinator, standin, fast_loaders, tmp_path):
+    queue = coordinator.coordinator.queue
+    usernames = _usernames()
+    assert queue.enqueue(usernames) == len(usernames)
+
+    # node-c נרשם, לוקח משימה ונעלם בלי heartbeat נוסף
+    lost = RemoteQueue(coordinator.url)
+    for node in NODES + (LOST_NODE,):
+        lost.heartbeat(node, "idle", [])
+    stranded = lost.claim(LOST_NODE)
+    assert stranded is not None
+
+    workers = [ScanWorker(RemoteQueue(coordinator.url), str(tmp_path / node), worker_id=node,
+                          options=ScanOptions(incremental=False, metadata_only=True, max_posts=8),
+                          rate_state_file=str(tmp_path / f"rate_{node}.json"), lease_seconds=LEASE_SECONDS,
+                          poll_interval=0.2, media_workers=2, sink=RemoteSink(coordinator.url, node, batch_size=5))
+               for node in NODES]
+    for worker in workers:
+        worker.queue.attach(worker.sessions)
+    threads = [threading.Thread(target=worker.run, kwargs={"until_empty": True}) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(120)
+    assert not any(thread.is_alive() for thread in threads)
+
+    jobs = {job["username"]: job for job in queue.jobs(limit=-1)}
+    assert {job["status"] for job in jobs.values()} == {"done"}
+    assert {job["worker"] for job in jobs.values()} <= set(NODES)
+    # המשימה שנתקעה על node-c חזרה לתור בלי לספור ניסיון
+    assert jobs[stranded["username"]]["attempts"] == 1
+    nodes = {node["id"]: node for node in coordinator.coordinator.nodes()}
+    assert nodes[LOST_NODE]["status"] == "lost"
+
+    for username in usernames:
+        node = jobs[username]["worker"]
+        [local] = glob.glob(str(tmp_path / node / username / "records" / "*.jsonl"))
+        [merged] = glob.glob(str(tmp_path / "merged" / username / "records" / f"*-{node}.jsonl"))
+        assert list(iter_records(merged)) == list(iter_records(local))
+        assert os.path.isfile(str(tmp_path / "merged" / username / "profile_data.json"))
+
+
+def test_records_after_a_gap_are_resent_from_the_local_file(coordinator, tmp_path):
+    class LossySink(RemoteSink):
+        """מאבד את מה שנכתב בזמן drop - כמו node שקרס לפני שהאצווה נשלחה"""
+        drop = False
+
+        def write(self, record, source=None, position=None):
+            if not self.drop:
+                super().write(record, source, position)
+
+    sink = LossySink(coordinator.url, "node-a", batch_size=2)
+    stream = RecordStream(run_records_path(str(tmp_path / "node-a" / "alpha"), "run1", "gzip"), "gzip", sink)
+    for index in range(1, 3):
+        stream.write({"type": "post", "index": index})
+    sink.drop = True
+    for index in range(3, 6):
+        stream.write({"type": "post", "index": index})
+    sink.drop = False
+    stream.write({"type": "post", "index": 6})
+    # 6 עוד ממתינה באצווה; השליחה שלה מגלה ש-3-5 חסרות ל-coordinator
+    sink.flush()
+
+    store = coordinator.store
+    assert store.stats()["gaps"] == 1
+    assert sink.stats()["resent"] == 4
+    [merged] = glob.glob(str(tmp_path / "merged" / "alpha" / "records" / "run1-node-a.jsonl.part"))
+    assert [record["index"] for record in iter_records(merged)] == list(range(1, 7))
+
+    # רשומה עם פער נדחית ולא נכתבת
+    assert store.write("node-a", {"type": "post", "index": 9}, stream.path, 9) == (None, 6)
+    stream.finalize()
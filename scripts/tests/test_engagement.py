@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""EngagementLog: רק שינויים נרשמים, וריצה שקרסה באמצע שורה לא מסתירה את התצפיות שאחריה"""
+
+import os
+
+from instaloader_scan.engagement import ENGAGEMENT_LOG, EngagementLog, growth, load_series
+
+
+def test_only_changes_are_logged(tmp_path):
+    log = EngagementLog(str(tmp_path))
+    assert log.observe("p1", 10, 1) is not None
+    assert log.observe("p1", 10, 1) is None
+    assert log.observe("p1", 15, 2) is not None
+    log.close()
+
+    log = EngagementLog(str(tmp_path))
+    assert log.observe("p1", 15, 2) is None
+    log.close()
+    points = load_series(str(tmp_path))["p1"]
+    assert [point["likes"] for point in points] == [10, 15]
+    assert growth(points)["likes"] == 5
+
+
+def test_torn_line_after_crash_is_cut_before_appending(tmp_path):
+    log = EngagementLog(str(tmp_path))
+    log.observe("p1", 10, 1)
+    log.observe("p2", 20, 2)
+    # קריסה: בלי close (האינדקס לא נשמר) ובאמצע כתיבת שורה
+    log._file.write('{"shortcode": "p3", "at": "2026-')
+    log._file.flush()
+
+    log = EngagementLog(str(tmp_path))
+    # השורות השלמות שאחרי האינדקס נקראו מחדש - מונים שלא השתנו לא נרשמים שוב
+    assert log.observe("p1", 10, 1) is None
+    assert log.observe("p2", 25, 2) is not None
+    assert log.observe("p3", 30, 3) is not None
+    log.close()
+
+    with open(os.path.join(str(tmp_path), ENGAGEMENT_LOG), encoding='utf-8') as f:
+        assert all(line.startswith('{"shortcode"') for line in f)
+    series = load_series(str(tmp_path))
+    assert {shortcode: [point["likes"] for point in points] for shortcode, points in series.items()} == \
+        {"p1": [10], "p2": [20, 25], "p3": [30]}
+
+    log = EngagementLog(str(tmp_path))
+    assert log.latest == {"p1": (10, 1, None), "p2": (25, 2, None), "p3": (30, 3, None)}
+    log.close()
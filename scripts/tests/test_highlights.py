@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""סנכרון היילייטס מול השרת המדומה: רק פריטים חדשים יורדים, ופריט שההורדה שלו נכשלה ברקע ינוסה שוב"""
+
+import instaloader
+import pytest
+
+from conftest import STANDIN_CONFIG
+from instaloader_scan.highlights import HighlightIndex, sync_highlights
+from instaloader_scan.media import MediaPipeline, MediaUnavailable
+from instaloader_scan.stream import RecordStream, iter_records, run_records_path
+
+USERNAME = "test_creator"
+ITEMS = STANDIN_CONFIG.highlights * STANDIN_CONFIG.highlight_items
+
+
+@pytest.fixture
+def sync(logged_in_loader, tmp_path):
+    """מריץ סנכרון אחד עם MediaPipeline משלו; מחזיר (stats, שגיאות, רשומות highlight_item)"""
+    output_dir = str(tmp_path / USERNAME)
+    profile = instaloader.Profile.from_username(logged_in_loader.context, USERNAME)
+    runs = []
+
+    def run(fail=lambda job: False):
+        media = MediaPipeline(workers=2)
+        download = media._download
+
+        def flaky(job):
+            if fail(job):
+                raise MediaUnavailable("403")
+            return download(job)
+
+        media._download = flaky
+        errors = []
+        stream = RecordStream(run_records_path(output_dir, f"run{len(runs)}"))
+        try:
+            stats, _ = sync_highlights(logged_in_loader, profile, USERNAME, output_dir, media, stream, errors.append)
+        finally:
+            media.close()
+        runs.append(stream.finalize())
+        return stats, errors, [record for record in iter_records(runs[-1]) if record["type"] == "highlight_item"]
+
+    run.output_dir = output_dir
+    return run
+
+
+def test_only_new_items_are_synced(sync):
+    stats, errors, records = sync()
+    assert stats["new_items"] == len(records) == ITEMS and not errors
+    stats, _, records = sync()
+    assert stats["new_items"] == 0 and records == []
+
+
+def test_failed_background_download_is_retried(sync):
+    failed_ids = set()
+
+    def fail_first_item(job):
+        # הפריט הראשון שמגיע ל-worker נכשל, אחרי ש-submit כבר הצליח
+        if not failed_ids or job.ref in failed_ids:
+            failed_ids.add(job.ref)
+            return True
+        return False
+
+    stats, errors, records = sync(fail_first_item)
+    assert len(records) == ITEMS and len(errors) == 1
+    index = HighlightIndex(sync.output_dir)
+    synced = {item_id for entry in index.highlights.values() for item_id in entry["item_ids"]}
+    assert len(synced) == ITEMS - 1 and not synced & failed_ids
+    assert any(entry["marker"] is None for entry in index.highlights.values())
+
+    stats, errors, records = sync()
+    assert stats["new_items"] == 1 and {str(record["id"]) for record in records} == failed_ids
+    stats, _, _ = sync()
+    assert stats["new_items"] == 0
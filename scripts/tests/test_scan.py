@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+סריקת פרופיל מול השרת המדומה: המשך מ-checkpoint, עצירה בפוסט מוכר, פוסט שנכשל שלא הופך למוכר,
+קריסה בין השם הסופי של קובץ הרשומות לסגירת הריצה, וסריקה מדורגת שנעצרת כשתקציב הבקשות נגמר
+"""
+
+import json
+import os
+from collections import Counter
+
+import pytest
+
+import instaloader_scan.scan as scan_module
+from instaloader_scan.checkpoint import CHECKPOINT_FILE, CheckpointStore
+from instaloader_scan.scan import TIERS_FILE, ScanInterrupted, ScanOptions, scan_profile
+from instaloader_scan.stream import iter_records, list_record_files, run_records_path
+
+USERNAME = "test_creator"
+
+
+class StopAfter:
+    """stop_event שנדלק אחרי count בדיקות - עצירה באמצע הסריקה אחרי count פוסטים"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def is_set(self):
+        self.count -= 1
+        return self.count < 0
+
+
+def _options(**overrides):
+    return ScanOptions(**{"max_posts": 10, "metadata_only": True, **overrides})
+
+
+def _post_shortcodes(output_dir):
+    return [record["shortcode"] for path in list_record_files(output_dir) for record in iter_records(path)
+            if record.get("type") == "post"]
+
+
+def test_interrupted_scan_resumes_from_checkpoint(loader, tmp_path):
+    output_dir = str(tmp_path / USERNAME)
+    with pytest.raises(ScanInterrupted):
+        scan_profile(loader, USERNAME, output_dir, _options(), stop_event=StopAfter(4))
+    run = CheckpointStore(output_dir).run
+    assert run["posts_done"] == 4 and len(run["captured"]) == 4
+    # הריצה לא הסתיימה - הרשומות עדיין ב-.part, ואף פוסט לא "מוכר"
+    assert list_record_files(output_dir) == []
+    assert CheckpointStore(output_dir).known_shortcodes == set()
+
+    result = scan_profile(loader, USERNAME, output_dir, _options())
+    assert result["stats"]["resumed"] and result["stats"]["total_posts_scanned"] == 10
+    shortcodes = _post_shortcodes(output_dir)
+    assert len(shortcodes) == 10 and Counter(shortcodes).most_common(1)[0][1] == 1
+    checkpoint = CheckpointStore(output_dir)
+    assert checkpoint.run is None and checkpoint.known_shortcodes == set(shortcodes)
+
+
+def test_rescan_stops_at_first_known_post(loader, tmp_path):
+    output_dir = str(tmp_path / USERNAME)
+    scan_profile(loader, USERNAME, output_dir, _options())
+    shortcodes = _post_shortcodes(output_dir)
+
+    result = scan_profile(loader, USERNAME, output_dir, _options())
+    assert result["stats"]["stopped_at_known_post"] and result["stats"]["total_posts_scanned"] == 0
+
+    # שני הפוסטים החדשים ביותר "עוד לא נאספו" - כמו פוסטים שעלו מאז הסריקה הקודמת
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    data["known_shortcodes"] = sorted(set(data["known_shortcodes"]) - set(shortcodes[:2]))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    result = scan_profile(loader, USERNAME, output_dir, _options())
+    assert result["stats"]["stopped_at_known_post"] and result["stats"]["total_posts_scanned"] == 2
+    assert _post_shortcodes(output_dir)[-2:] == shortcodes[:2]
+
+
+def test_failed_post_is_not_marked_known(loader, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / USERNAME)
+    post_info = scan_module._post_info
+    failed = {}
+
+    def fail_first(post, resolve=True):
+        if not failed:
+            failed["shortcode"] = post.shortcode
+            raise RuntimeError("תקלה בפוסט")
+        return post_info(post, resolve)
+
+    monkeypatch.setattr(scan_module, "_post_info", fail_first)
+    scan_profile(loader, USERNAME, output_dir, _options())
+    monkeypatch.undo()
+    assert failed["shortcode"] not in _post_shortcodes(output_dir)
+    assert failed["shortcode"] not in CheckpointStore(output_dir).known_shortcodes
+
+    # הסריקה הבאה אוספת את הפוסט שנכשל ועוצרת בפוסט המוכר שאחריו
+    result = scan_profile(loader, USERNAME, output_dir, _options())
+    assert result["stats"]["total_posts_scanned"] == 1 and result["stats"]["stopped_at_known_post"]
+    assert failed["shortcode"] in CheckpointStore(output_dir).known_shortcodes
+
+
+def test_crash_between_finalize_and_complete_keeps_records(loader, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / USERNAME)
+
+    def crash(self):
+        raise RuntimeError("קריסה אחרי finalize")
+
+    monkeypatch.setattr(CheckpointStore, "complete_run", crash)
+    with pytest.raises(RuntimeError):
+        scan_profile(loader, USERNAME, output_dir, _options())
+    monkeypatch.undo()
+    [records_file] = list_record_files(output_dir)
+    assert CheckpointStore(output_dir).run is not None
+
+    # הריצה הבאה סוגרת את זו שכבר קיבלה שם סופי במקום להמשיך אותה לתוך אותו קובץ
+    result = scan_profile(loader, USERNAME, output_dir, _options())
+    assert result["stats"]["stopped_at_known_post"] and result["stats"]["total_posts_scanned"] == 0
+    assert records_file in list_record_files(output_dir)
+    assert len(set(_post_shortcodes(output_dir))) == len(_post_shortcodes(output_dir)) == 10
+
+
+def test_tiered_scan_completes_every_tier_within_budget(loader, tmp_path):
+    output_dir = str(tmp_path / USERNAME)
+    published = []
+    result = scan_profile(loader, USERNAME, output_dir, _options(max_posts=20, request_budget=1000),
+                          on_tier=lambda username, tier, state: published.append(tier))
+    assert published == result["stats"]["tiers"] == ["profile", "recent_posts", "highlights", "history"]
+    assert result["stats"]["stopped"] is None and result["stats"]["total_posts_scanned"] == 20
+    assert CheckpointStore(output_dir).run is None and len(_post_shortcodes(output_dir)) == 20
+
+
+@pytest.mark.parametrize("request_budget", [1, 3])
+def test_tiered_scan_stops_on_request_budget_and_next_run_resumes(loader, tmp_path, request_budget):
+    output_dir = str(tmp_path / USERNAME)
+    result = scan_profile(loader, USERNAME, output_dir, _options(max_posts=20, request_budget=request_budget))
+    stats = result["stats"]
+    assert stats["stopped"] == "requests" and stats["tiers"] == ["profile"]
+    assert stats["budget"]["requests"] >= request_budget
+    with open(os.path.join(output_dir, TIERS_FILE), encoding='utf-8') as f:
+        assert json.load(f)["stopped"] == "requests"
+
+    # הרשומות נשארות ב-.part והריצה פתוחה - אף פוסט עוד לא "מוכר"
+    run = CheckpointStore(output_dir).run
+    assert run is not None and run["posts_done"] == stats["total_posts_scanned"] < 20
+    assert result["records_file"].endswith(".part") and os.path.isfile(result["records_file"])
+    assert list_record_files(output_dir) == [] and CheckpointStore(output_dir).known_shortcodes == set()
+
+    # הריצה הבאה ממשיכה לתוך אותו קובץ ומשלימה את הזנב
+    result = scan_profile(loader, USERNAME, output_dir, _options(max_posts=20))
+    assert result["records_file"] == run_records_path(output_dir, run["run_id"], run["compression"])
+    shortcodes = _post_shortcodes(output_dir)
+    assert len(shortcodes) == len(set(shortcodes)) == 20
+    assert CheckpointStore(output_dir).run is None
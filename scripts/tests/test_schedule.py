@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+לוח הרענון: מתיחת המרווחים כשהביקוש עובר את התקציב לשעה, ובחירת הבדיקות שהגיע זמנן -
+מהמאחרת ביותר, עד מה שנשאר מהתקציב בשעה האחרונה
+"""
+
+import time
+from datetime import datetime
+
+import pytest
+
+from instaloader_scan.schedule import MAX_INTERVAL_HOURS, POSTS_PER_PAGE, RefreshScheduler, check_cost
+from instaloader_scan.stream import RecordStream, run_records_path
+
+HOUR = 3600
+
+
+def _write_posts(output_root, username, ages_hours, now):
+    """קובץ רשומות סגור עם פוסט לכל גיל (בשעות לפני now)"""
+    stream = RecordStream(run_records_path(str(output_root / username), "run1"))
+    for index, age in enumerate(ages_hours):
+        stream.write({"type": "post", "shortcode": f"{username}_{index}",
+                      "date": datetime.fromtimestamp(now - age * HOUR).isoformat()})
+    stream.finalize()
+
+
+def _hourly(output_root, username, now):
+    # 12 פוסטים, אחד בכל שעה - מרווח של שעה
+    _write_posts(output_root, username, [index + 0.5 for index in range(12)], now)
+
+
+def _quiet(output_root, username, now):
+    # פוסט אחד לפני חודשיים - המרווח המקסימלי
+    _write_posts(output_root, username, [60 * 24], now)
+
+
+def _posts(entries):
+    return {entry["username"]: entry for entry in entries if entry["content_type"] == "posts"}
+
+
+def test_intervals_stretch_to_fit_the_hourly_budget(tmp_path):
+    now = time.time()
+    usernames = [f"hourly_{index}" for index in range(10)]
+    for username in usernames:
+        _hourly(tmp_path, username, now)
+    _quiet(tmp_path, "quiet", now)
+
+    entries, stretch, demand = RefreshScheduler(str(tmp_path), hourly_budget=1000).plan(usernames + ["quiet"], now)
+    assert stretch == 1.0
+    assert _posts(entries)["hourly_0"]["interval_hours"] == pytest.approx(1.0)
+
+    # 10 בדיקות פוסטים בשעה עולות 30 בקשות; תקציב של 15 מכפיל את המרווחים
+    entries, stretch, demand = RefreshScheduler(str(tmp_path), hourly_budget=15,
+                                                path=str(tmp_path / "tight.db")).plan(usernames + ["quiet"], now)
+    assert stretch == pytest.approx(2.0, abs=0.01) and demand <= 15
+    posts = _posts(entries)
+    assert all(posts[username]["interval_hours"] == pytest.approx(2.0, abs=0.01) for username in usernames)
+    # מרווח שכבר במקסימום לא נמתח מעבר לו
+    assert posts["quiet"]["interval_hours"] == MAX_INTERVAL_HOURS["posts"]
+
+
+def test_due_picks_the_most_overdue_checks_within_the_remaining_budget(tmp_path):
+    now = time.time()
+    for username in ("hourly_a", "hourly_b"):
+        _hourly(tmp_path, username, now)
+    _quiet(tmp_path, "quiet", now)
+    usernames = ["hourly_a", "hourly_b", "quiet"]
+    scheduler = RefreshScheduler(str(tmp_path), hourly_budget=8)
+    posts = _posts(scheduler.plan(usernames, now)[0])
+    assert all(entry["cost"] == check_cost("posts", entry) == 3 for entry in posts.values())
+
+    # hourly_b מאחר בשעתיים, hourly_a בחצי שעה; quiet נבדק לפני חצי שעה - לא הגיע זמנו, והעלות שלו בתקציב
+    scheduler.mark_checked([posts["hourly_a"]], now - 1.5 * HOUR)
+    scheduler.mark_checked([posts["hourly_b"]], now - 3 * HOUR)
+    scheduler.mark_checked([posts["quiet"]], now - 0.5 * HOUR)
+    assert scheduler.spent(now) == 3
+
+    due = scheduler.due(usernames, "posts", now)
+    assert [entry["username"] for entry in due] == ["hourly_b"]
+    assert due[0]["max_posts"] > POSTS_PER_PAGE
+
+    # אחרי שעה בלי בדיקות כל התקציב פנוי, ושתי הבדיקות יוצאות מהמאחרת ביותר
+    later = now + HOUR
+    due = scheduler.due(usernames, "posts", later)
+    assert [entry["username"] for entry in due] == ["hourly_b", "hourly_a"]
+    scheduler.close()
+
+
+def test_first_full_scan_goes_alone_only_when_the_hour_is_empty(tmp_path):
+    now = time.time()
+    _hourly(tmp_path, "hourly_a", now)
+    scheduler = RefreshScheduler(str(tmp_path), hourly_budget=8)
+    # פרופיל שעוד לא נסרק עולה סריקה מלאה - יותר מכל התקציב, ולכן יוצא רק כשהשעה האחרונה ריקה, ובלי max_posts
+    due = scheduler.due(["newcomer"], "posts", now)
+    assert [(entry["username"], entry["max_posts"]) for entry in due] == [("newcomer", None)]
+    assert due[0]["cost"] > 8
+
+    scheduler.mark_checked([_posts(scheduler.plan(["hourly_a"], now)[0])["hourly_a"]], now - 0.5 * HOUR)
+    assert scheduler.due(["newcomer"], "posts", now) == []
+    assert [entry["username"] for entry in scheduler.due(["newcomer"], "posts", now + HOUR)] == ["newcomer"]
+    scheduler.close()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+מאגר ה-sessions: חסימה נזקפת רק ל-lease שהבקשה שלו נחסמה, גם כשכמה סריקות של אותו חשבון רצות במקביל
+ה-controller של החשבון משותף לכל ה-threads, ולכן ההפרש במונה הכללי שלו היה נזקף לכל lease שהיה פתוח באותו זמן.
+"""
+
+import threading
+
+import instaloader
+
+from instaloader_scan.bench import BENCH_SESSION
+from instaloader_scan.loader import build_loader
+from instaloader_scan.sessions import SessionPool
+
+ACCOUNT = "throttle_test"
+
+
+def test_throttle_is_counted_only_on_the_lease_that_hit_it(tmp_path, monkeypatch):
+    def fake_get_json(self, path, params, host='www.instagram.com', session=None, *args, **kwargs):
+        # בלי רשת: בקשת "throttled" מתנהגת כמו 429 שחזר לבקשה הזו
+        if path == "throttled":
+            self._rate_controller.handle_429("other")
+        return {}
+
+    monkeypatch.setattr(instaloader.InstaloaderContext, "get_json", fake_get_json)
+    session_file = str(tmp_path / "session")
+    L = build_loader()
+    L.context.load_session(ACCOUNT, BENCH_SESSION)
+    L.save_session_to_file(session_file)
+    L.close()
+
+    pool = SessionPool([(ACCOUNT, session_file)], rate_state_file=str(tmp_path / "rate.json"))
+    acquired = threading.Barrier(2)
+    requested = threading.Barrier(2)
+
+    def scan(path):
+        lease = pool.acquire()
+        acquired.wait(10)
+        lease.loader.context.get_json(path, {})
+        requested.wait(10)
+        pool.release(lease)
+
+    threads = [threading.Thread(target=scan, args=(path,)) for path in ("throttled", "ok")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    pool.close()
+
+    [account] = pool.report()
+    assert account["scans"] == 2 and account["recent_throttles"] == 1
+    assert account["rate"]["throttle_events"] == 1
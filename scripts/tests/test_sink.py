@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+PostgresSink מול מסד אמיתי: שליחה חוזרת של אותן רשומות לא משנה את הטבלאות, ו-load_records ממשיך מה-checkpoint.
+רצות רק כש-DATABASE_URL מצביע על Postgres זמין; כל בדיקה עובדת בסכמה זמנית משלה.
+"""
+
+import os
+import uuid
+
+import pytest
+
+from instaloader_scan.sink import DB_URL_ENV, PostgresSink, load_records
+from instaloader_scan.stream import RecordStream, run_records_path
+
+psycopg = pytest.importorskip("psycopg")
+pytest.importorskip("psycopg_pool")
+
+TABLE_NAMES = ("ig_profiles", "ig_posts", "ig_comments")
+
+
+@pytest.fixture
+def db_url():
+    url = os.environ.get(DB_URL_ENV)
+    if not url:
+        pytest.skip(f"{DB_URL_ENV} לא מוגדר")
+    try:
+        conn = psycopg.connect(url, autocommit=True, connect_timeout=5)
+    except psycopg.OperationalError as e:
+        pytest.skip(f"Postgres לא זמין: {str(e)}")
+    schema = f"sink_test_{uuid.uuid4().hex[:12]}"
+    conn.execute(f"CREATE SCHEMA {schema}")
+    try:
+        yield f"{url}{'&' if '?' in url else '?'}options=-csearch_path%3D{schema}"
+    finally:
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+
+
+def _records(count):
+    records = [{"type": "profile", "userid": 42, "username": "alpha", "followers": 100}]
+    for index in range(1, count + 1):
+        records.append({"type": "post", "shortcode": f"post{index}", "username": "alpha", "likes": index,
+                        "caption": f"#{index}", "comments": [{"id": 1000 + index, "owner": "beta", "text": "יפה"}]})
+    return records
+
+
+def _counts(url):
+    with psycopg.connect(url) as conn:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLE_NAMES}
+
+
+def test_resend_is_noop(db_url, tmp_path):
+    records = _records(5)
+    source = str(tmp_path / "alpha" / "records" / "run1.jsonl")
+    for _ in range(2):
+        sink = PostgresSink(db_url, batch_size=4)
+        for position, record in enumerate(records, start=1):
+            sink.write(record, source, position)
+        sink.close()
+        assert sink.stats().get("failed_batches", 0) == 0
+        assert _counts(db_url) == {"ig_profiles": 1, "ig_posts": 5, "ig_comments": 5}
+    sink = PostgresSink(db_url)
+    assert sink.checkpoint(source) == len(records)
+    sink.close()
+
+
+def test_load_records_resumes_from_checkpoint(db_url, tmp_path):
+    records = _records(6)
+    output_dir = str(tmp_path / "alpha")
+    stream = RecordStream(run_records_path(output_dir, "run1"))
+    for record in records:
+        stream.write(record)
+    path = stream.finalize()
+
+    # סריקה שהמסד נפל באמצעה: רק 3 הרשומות הראשונות נכתבו
+    sink = PostgresSink(db_url)
+    for position, record in enumerate(records[:3], start=1):
+        sink.write(record, path, position)
+    sink.close()
+    assert _counts(db_url)["ig_posts"] == 2
+
+    sink = PostgresSink(db_url)
+    assert load_records(sink, [output_dir]) == len(records) - 3
+    assert sink.checkpoint(path) == len(records)
+    # כבר מעודכן - אין מה לשלוח
+    assert load_records(sink, [output_dir]) == 0
+    sink.close()
+    assert _counts(db_url) == {"ig_profiles": 1, "ig_posts": 6, "ig_comments": 6}